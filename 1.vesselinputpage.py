@@ -1,8 +1,23 @@
 import streamlit as st
 import datetime
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from streamlit import session_state as ss
 
+from bunker_prices import DEFAULT_CSV, DEFAULT_FUEL_GRADE, BunkerPrices, cost_claims, normalize_prices
+from emissions import DEFAULT_EUA_PRICE, cii_ratings, ets_exposure
+from monitoring import MONITORING_WINDOWS
+from speed_consumption import refit_fleet, warranted_consumption_at
+from uncertainty import DEFAULT_CONFIDENCE, DEFAULT_RESAMPLES, bootstrap_intervals, summary_with_intervals
+from voyage_calculations import SUMMARY_METRICS, steaming_span_check, summary_table
+from voyage_index import TIMESTAMP_COLUMN, VoyageIndex, exclusion_windows
+from voyage_jobs import VoyageJob
+from voyage_queue import CalculationJobs, SQLiteQueue
+from voyage_store import VoyageStore
+
 # Set page config
 st.set_page_config(
     page_title="Charterparty Performance Analysis",
@@ -43,6 +58,42 @@ if 'weather_definitions' not in ss:
     ss.weather_definitions = {}
 if 'current_page' not in ss:
     ss.current_page = 'vessel_input'
+if 'report_figures' not in ss:
+    ss.report_figures = {}
+if 'queued_jobs' not in ss:
+    ss.queued_jobs = {}
+
+# Voyages saved in past sessions, shared by all the sessions of the app
+@st.cache_resource
+def get_voyage_store():
+    return VoyageStore()
+
+store = get_voyage_store()
+
+# Bunker prices, kept in memory until their CSV file or table changes
+@st.cache_resource
+def get_bunker_prices():
+    return BunkerPrices(DEFAULT_CSV or store)
+
+# Threads processing the uploaded files in the background, shared by all the sessions of the app
+@st.cache_resource
+def get_job_executor():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix='voyage-job')
+
+# Identifies an upload & the inputs of its calculation: the background job restarts when any of them changes
+def calculation_key(uploaded_file, *inputs):
+    file_digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    inputs_digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+    return file_digest, inputs_digest
+
+# Queue of the calculations run by the workers of voyage_queue.py, outside of the app
+@st.cache_resource
+def get_calculation_jobs():
+    return CalculationJobs(SQLiteQueue())
+
+# Keep the charts rendered on the analysis pages, by title, to embed them in the PDF report
+def keep_report_figure(title, fig):
+    ss.report_figures[title] = fig
 
 # Custom navigation buttons
 def nav_buttons():
@@ -50,19 +101,19 @@ def nav_buttons():
     with cols[0]:
         if st.button("📄 Vessel Input", use_container_width=True):
             ss.current_page = 'vessel_input'
-            st.experimental_rerun()
+            st.rerun()
     with cols[1]:
         if st.button("🧮 Calculations", use_container_width=True):
             ss.current_page = 'calculations'
-            st.experimental_rerun()
+            st.rerun()
     with cols[2]:
         if st.button("🌊 Weather Analysis", use_container_width=True):
             ss.current_page = 'weather_analysis'
-            st.experimental_rerun()
+            st.rerun()
     with cols[3]:
         if st.button("📊 Graphs & Analytics", use_container_width=True):
             ss.current_page = 'graphs'
-            st.experimental_rerun()
+            st.rerun()
     st.markdown("---")
 
 # Main app header
@@ -73,6 +124,27 @@ nav_buttons()
 if ss.current_page == 'vessel_input':
     st.markdown("<h2 class='sub-header'>Vessel and Voyage Details</h2>", unsafe_allow_html=True)
     
+    # Reload a voyage saved in a past session
+    saved_voyages = store.list_voyages()
+    if not saved_voyages.empty:
+        with st.expander("Saved Voyages"):
+            labels = [f"{row.vessel} ({row.imo}) - Voyage {row.voyage_no}" for row in saved_voyages.itertuples()]
+            selected = st.selectbox("Saved Voyage", range(len(labels)), format_func=labels.__getitem__)
+            if st.button("Load Voyage"):
+                row = saved_voyages.iloc[selected]
+                voyage = store.load_voyage(row['imo'], row['voyage_no'])
+                ss.vessel_data = voyage['vessel_data']
+                ss.voyage_data = voyage['voyage_data']
+                ss.cp_data = voyage['cp_data']
+                ss.weather_definitions = voyage['weather_definitions']
+                ss.exclusion_periods = voyage['exclusion_periods']
+                ss.pop('calculation_job', None)
+                if 'calculation_results' in voyage:
+                    ss.calculation_results = voyage['calculation_results']
+                else:
+                    ss.pop('calculation_results', None)
+                st.rerun()
+    
     # Create tabs for different sections
     tabs = st.tabs(["Vessel Details", "Voyage Details", "CP Details", "Exclusion Periods", "Weather Definitions"])
     
@@ -141,6 +213,19 @@ if ss.current_page == 'vessel_input':
                                                              min_value=0.0, value=ss.cp_data.get('fuel_tolerance_percent', 5.0), step=0.1)
             ss.cp_data['speed_tolerance_knots'] = st.number_input("Speed Tolerance (knots)", 
                                                             min_value=0.0, value=ss.cp_data.get('speed_tolerance_knots', 0.5), step=0.1)
+        
+        # Warranties of the grades reported separately (e.g. me_vlsfo_consumed), 0 when the CP does not warrant the grade
+        st.subheader("Warranted Consumption per Fuel Grade (MT/day)")
+        grade_warranties = ss.cp_data.get('fuel_grade_warranties') or {}
+        for grade, col in zip(('hsfo', 'vlsfo', 'mgo'), st.columns(3)):
+            with col:
+                warranty = st.number_input(grade.upper(), min_value=0.0, value=float(grade_warranties.get(grade, 0.0)),
+                                           step=0.1, key=f"fuel_grade_warranty_{grade}")
+            if warranty > 0:
+                grade_warranties[grade] = warranty
+            else:
+                grade_warranties.pop(grade, None)
+        ss.cp_data['fuel_grade_warranties'] = grade_warranties
     
     # Tab 4: Exclusion Periods
     with tabs[3]:
@@ -183,7 +268,7 @@ if ss.current_page == 'vessel_input':
                     st.write(f"**Reason:** {period['reason']}")
                     if st.button(f"Remove Period {i+1}"):
                         ss.exclusion_periods.pop(i)
-                        st.experimental_rerun()
+                        st.rerun()
     
     # Tab 5: Weather Definitions
     with tabs[4]:
@@ -235,3 +320,11 @@ if ss.current_page == 'vessel_input':
         # Save weather definitions
         if st.button("Save Weather Definitions"):
             st.success("Weather definitions saved successfully!")
+    
+    # Save the voyage for later sessions
+    if st.button("Save Voyage"):
+        try:
+            store.save_voyage(ss.vessel_data, ss.voyage_data, ss.cp_data, ss.weather_definitions, ss.exclusion_periods)
+            st.success("Voyage saved successfully!")
+        except ValueError as e:
+            st.error(str(e))
@@ -3,212 +3,175 @@ elif ss.current_page == 'calculations':
     
     # Upload data file
     st.header("Upload Voyage Data")
-    uploaded_file = st.file_uploader("Upload XLS or CSV file with voyage data", type=["xlsx", "xls", "csv"])
+    uploaded_file = st.file_uploader("Upload XLS or CSV file with voyage data", type=["xlsx", "xls", "csv"],
+                                     help="Noon reports, or auto-logged samples with a date, speed_over_ground, "
+                                          "me_fuel_rate (MT/day) and weather columns, resampled noon to noon.")
+    
+    # Large files, or many of them, can be computed by the workers instead of the app
+    if uploaded_file is not None and st.button("Submit to Worker Queue"):
+        job_id = get_calculation_jobs().submit_upload(
+            uploaded_file.name, uploaded_file.getvalue(), vessel_data=ss.vessel_data, voyage_data=ss.voyage_data,
+            cp_data=ss.cp_data, weather_definitions=ss.weather_definitions, exclusion_periods=ss.exclusion_periods,
+            quarantine=ss.get('quarantine_anomalies', False))
+        ss.queued_jobs[job_id] = f"{ss.vessel_data.get('name', '')} - Voyage {ss.voyage_data.get('voyage_no', '')} ({uploaded_file.name})"
+        st.success("Calculation submitted to the worker queue.")
+    
+    if ss.queued_jobs:
+        with st.expander("Queued Calculations"):
+            jobs = get_calculation_jobs()
+            for job_id, label in ss.queued_jobs.items():
+                st.write(f"**{label}:** {jobs.status(job_id)}")
+    
+    # Noon reports failing the sanity checks are flagged, and left out of the figures if quarantined
+    quarantine = st.checkbox("Quarantine anomalous noon reports", key='quarantine_anomalies')
     
     if uploaded_file is not None:
-        try:
-            # Read the uploaded file
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+        # A new file, or new inputs, start a background job, which the reruns of the page then follow
+        upload_key = calculation_key(uploaded_file, ss.vessel_data, ss.voyage_data, ss.cp_data,
+                                     ss.weather_definitions, ss.exclusion_periods, quarantine)
+        if ss.get('calculation_job') is None or ss.calculation_job_upload != upload_key:
+            ss.calculation_job = VoyageJob(get_job_executor(), uploaded_file.name, uploaded_file.getvalue(),
+                                           ss.vessel_data, ss.voyage_data, ss.cp_data, ss.weather_definitions,
+                                           ss.exclusion_periods, quarantine)
+            ss.calculation_job_upload = upload_key
+            ss.calculation_job_saved = False
+        job = ss.calculation_job
+        
+        if not job.done():
+            st.progress(job.progress, text=job.stage)
+            time.sleep(0.5)
+            st.rerun()
+        elif job.error() is not None:
+            st.error(f"Error processing file: {str(job.error())}")
+        else:
+            outcome = job.outcome()
+            ss.calculation_results = outcome['results']
+            summary = ss.calculation_results['summary']
             
             # Display the uploaded data
             st.subheader("Uploaded Data")
-            st.dataframe(df)
+            st.dataframe(outcome['raw_df'])
             
-            # Filter relevant rows based on the uploaded data
-            if 'event_type' in df.columns:
-                df = df[df['event_type'].isin(['NOON AT SEA', 'COSP', 'EOSP'])]
-                
-                # Process data
-                # Ensure numeric types for calculations
-                df['distance_travelled_actual'] = pd.to_numeric(df['distance_travelled_actual'], errors='coerce')
-                df['steaming_time_hrs'] = pd.to_numeric(df['steaming_time_hrs'], errors='coerce')
-                df['me_fuel_consumed'] = pd.to_numeric(df['me_fuel_consumed'], errors='coerce')
-                
-                # Apply weather definitions to categorize days
-                if 'weather_definitions' in ss and 'beaufort_number' in df.columns and 'significant_wave_height' in df.columns:
-                    df['day_status'] = df.apply(
-                        lambda row: 'GOOD WEATHER DAY' 
-                        if (row['beaufort_number'] <= ss.weather_definitions.get('max_beaufort', 5) and 
-                            row['significant_wave_height'] <= ss.weather_definitions.get('max_wave_height', 2.0))
-                        else 'BAD WEATHER DAY', 
-                        axis=1
-                    )
-                
-                # =========================
-                # Total Metrics
-                # =========================
-                total_distance = df['distance_travelled_actual'].sum()
-                total_time = df['steaming_time_hrs'].sum()
-                total_fuel = df['me_fuel_consumed'].sum()
-                voyage_avg_speed = total_distance / total_time if total_time else 0
-                
-                # =========================
-                # Good and Bad Weather Segmentation
-                # =========================
-                good_days = df[df['day_status'] == 'GOOD WEATHER DAY']
-                bad_days = df[df['day_status'] == 'BAD WEATHER DAY']
-                
-                # Good Weather Metrics
-                good_distance = good_days['distance_travelled_actual'].sum()
-                good_time = good_days['steaming_time_hrs'].sum()
-                good_fuel = good_days['me_fuel_consumed'].sum()
-                good_speed = good_distance / good_time if good_time else 0
-                good_fo_hr = good_fuel / good_time if good_time else 0
-                good_fo_day = good_fo_hr * 24
-                
-                # Bad Weather Metrics
-                bad_distance = bad_days['distance_travelled_actual'].sum()
-                bad_time = bad_days['steaming_time_hrs'].sum()
-                bad_fuel = bad_days['me_fuel_consumed'].sum()
-                bad_speed = bad_distance / bad_time if bad_time else 0
-                
-                # Get CP parameters from session state
-                warranted_speed = ss.cp_data.get('warranted_speed', 13.0)
-                warranted_consumption = ss.cp_data.get('warranted_consumption', 19.9)
-                fuel_tolerance_percent = ss.cp_data.get('fuel_tolerance_percent', 5.0)
-                speed_tolerance_knots = ss.cp_data.get('speed_tolerance_knots', 0.5)
-                
-                # =========================
-                # Warranted Calculations
-                # =========================
-                fuel_tolerance_mt = warranted_consumption * (fuel_tolerance_percent / 100)
-                warranted_plus_tol = warranted_consumption + fuel_tolerance_mt
-                warranted_minus_tol = warranted_consumption - fuel_tolerance_mt
-                
-                # Entire Voyage Consumption Using Good Weather Consumption
-                entire_voyage_good_weather_based = (total_distance / good_speed) * (good_fo_day / 24) if good_speed else 0
-                
-                # Maximum and Minimum Warranted Fuel
-                adjusted_speed = good_speed
-                if good_speed > warranted_speed + speed_tolerance_knots:
-                    adjusted_speed = warranted_speed + speed_tolerance_knots
-                elif good_speed < warranted_speed - speed_tolerance_knots:
-                    adjusted_speed = warranted_speed - speed_tolerance_knots
-                
-                max_warranted_cons = (total_distance / adjusted_speed) * (warranted_plus_tol / 24)
-                min_warranted_cons = (total_distance / adjusted_speed) * (warranted_minus_tol / 24)
-                
-                # Overconsumption and Saving
-                fuel_overconsumption = (entire_voyage_good_weather_based - max_warranted_cons) if entire_voyage_good_weather_based > max_warranted_cons else 0
-                fuel_saving = (min_warranted_cons - entire_voyage_good_weather_based) if entire_voyage_good_weather_based < min_warranted_cons else 0
-                
-                # Time Estimates
-                time_at_good_spd = total_distance / adjusted_speed
-                max_time = total_distance / (warranted_speed - speed_tolerance_knots)
-                min_time = total_distance / (warranted_speed + speed_tolerance_knots)
-                time_gained = (max_time - time_at_good_spd) if time_at_good_spd < max_time else 0
-                time_lost = (time_at_good_spd - min_time) if time_at_good_spd > min_time else 0
-                
-                # Create summary dataframe
-                summary = pd.DataFrame({
-                    "Metric": [
-                        "Total Distance (nm)",
-                        "Total Steaming Time (hrs)",
-                        "Voyage Avg Speed (knots)",
-                        "Good Wx Distance (nm)",
-                        "Good Wx Time (hrs)",
-                        "Good Wx Speed (knots)",
-                        "Good Wx FO Cons (MT)",
-                        "Good Wx FO Rate (MT/hr)",
-                        "Good Wx FO Rate (MT/day)",
-                        "Bad Wx Distance (nm)",
-                        "Bad Wx Time (hrs)",
-                        "Bad Wx FO Cons (MT)",
-                        "Bad Wx Speed (knots)",
-                        "Total ME Fuel (MT)",
-                        "Entire Voyage Cons (MT) via Good Wx Perf",
-                        "Max Warranted FO (MT)",
-                        "Min Warranted FO (MT)",
-                        "Fuel Overconsumption (MT)",
-                        "Fuel Saving (MT)",
-                        "Time @ Good Wx Speed (hrs)",
-                        "Max Time @ Warranted Spd (hrs)",
-                        "Min Time @ Warranted Spd (hrs)",
-                        "Time Gained (hrs)",
-                        "Time Lost (hrs)"
-                    ],
-                    "Value": [
-                        total_distance,
-                        total_time,
-                        round(voyage_avg_speed, 2),
-                        good_distance,
-                        good_time,
-                        round(good_speed, 2),
-                        round(good_fuel, 2),
-                        round(good_fo_hr, 3),
-                        round(good_fo_day, 3),
-                        bad_distance,
-                        bad_time,
-                        round(bad_fuel, 2),
-                        round(bad_speed, 2),
-                        round(total_fuel, 2),
-                        round(entire_voyage_good_weather_based, 2),
-                        round(max_warranted_cons, 2),
-                        round(min_warranted_cons, 2),
-                        round(fuel_overconsumption, 2),
-                        round(fuel_saving, 2),
-                        round(time_at_good_spd, 2),
-                        round(max_time, 2),
-                        round(min_time, 2),
-                        round(time_gained, 2),
-                        round(time_lost, 2)
-                    ]
-                })
-                
-                # Store results in session state
-                ss.calculation_results = {
-                    'df': df,
-                    'summary': summary,
-                    'total_distance': total_distance,
-                    'total_time': total_time,
-                    'voyage_avg_speed': voyage_avg_speed,
-                    'good_distance': good_distance,
-                    'good_time': good_time,
-                    'good_speed': good_speed,
-                    'good_fuel': good_fuel,
-                    'good_fo_hr': good_fo_hr,
-                    'good_fo_day': good_fo_day,
-                    'bad_distance': bad_distance,
-                    'bad_time': bad_time,
-                    'bad_fuel': bad_fuel,
-                    'bad_speed': bad_speed,
-                    'total_fuel': total_fuel,
-                    'entire_voyage_good_weather_based': entire_voyage_good_weather_based,
-                    'max_warranted_cons': max_warranted_cons,
-                    'min_warranted_cons': min_warranted_cons,
-                    'fuel_overconsumption': fuel_overconsumption,
-                    'fuel_saving': fuel_saving,
-                    'time_at_good_spd': time_at_good_spd,
-                    'max_time': max_time,
-                    'min_time': min_time,
-                    'time_gained': time_gained,
-                    'time_lost': time_lost
-                }
-                
-                # Display results
-                st.subheader("Calculation Results")
-                st.dataframe(summary.set_index("Metric"))
-                
-                # Export options
-                import io
-                buffer = io.BytesIO()
-                summary.to_excel(buffer, index=False, engine='xlsxwriter')
-                buffer.seek(0)
-                st.download_button(
-                    label="Download Results as Excel",
-                    data=buffer,
-                    file_name="voyage_performance_report.xlsx",
-                    mime="application/vnd.ms-excel"
-                )
-                
+            # Save the voyage & its results once, to reload them in later sessions
+            if ss.vessel_data.get('imo') and ss.voyage_data.get('voyage_no'):
+                if not ss.calculation_job_saved:
+                    store.save_voyage(ss.vessel_data, ss.voyage_data, ss.cp_data, ss.weather_definitions,
+                                      ss.exclusion_periods, ss.calculation_results)
+                    ss.calculation_job_saved = True
             else:
-                st.error("The uploaded file does not contain the required columns. Please check your data format.")
-        
-        except Exception as e:
-            st.error(f"Error processing file: {str(e)}")
+                st.info("Enter the IMO number and the voyage number on the Vessel Input page to save these results.")
+            
+            # Noon reports failing the sanity checks, and steaming time not matching the COSP to EOSP dates
+            anomalies = ss.calculation_results['df'].dropna(subset=['anomaly'])
+            if not anomalies.empty:
+                st.warning(f"{len(anomalies)} noon reports look anomalous"
+                           f"{' and are left out of the figures' if quarantine else ''}.")
+                st.dataframe(anomalies)
+            span = steaming_span_check(ss.calculation_results['df'], ss.voyage_data)
+            if span is not None:
+                st.warning(f"The noon reports add up to {span[0]:.1f} steaming hours, "
+                           f"but COSP to EOSP spans {span[1]:.1f} hours.")
+            
+            # Display results
+            st.subheader("Calculation Results")
+            st.dataframe(summary.set_index("Metric"))
+            
+            # Files covering several passages are also computed leg by leg, from COSP to EOSP
+            if len(ss.calculation_results['legs']) > 1:
+                st.subheader("Voyage Legs")
+                st.dataframe(ss.calculation_results['legs'].set_index('leg')[[key for _, key, _ in SUMMARY_METRICS]])
+            
+            # Noon reports with the consumption of each consumer & fuel grade
+            if not ss.calculation_results['consumption'].empty:
+                st.subheader("Consumption per Consumer & Fuel Grade")
+                st.dataframe(ss.calculation_results['consumption'])
+                st.subheader("Fuel Grade Performance")
+                st.dataframe(ss.calculation_results['fuel_grades'].set_index("Fuel Grade"))
+            
+            # Export options
+            st.download_button(
+                label="Download Results as Excel",
+                data=outcome['excel'],
+                file_name="voyage_performance_report.xlsx",
+                mime="application/vnd.ms-excel"
+            )
+    elif 'calculation_results' in ss:
+        # Results of a saved voyage, or of a file uploaded before
+        st.subheader("Calculation Results")
+        st.dataframe(ss.calculation_results['summary'].set_index("Metric"))
+        if not ss.calculation_results.get('fuel_grades', pd.DataFrame()).empty:
+            st.subheader("Fuel Grade Performance")
+            st.dataframe(ss.calculation_results['fuel_grades'].set_index("Fuel Grade"))
     else:
         st.info("Please upload a file to perform calculations.")
+    
+    # Confidence intervals of the good weather figures, by resampling the good weather reports
+    if 'calculation_results' in ss and st.checkbox("Show confidence intervals of the good weather figures"):
+        st.header("Uncertainty")
+        col1, col2 = st.columns(2)
+        with col1:
+            resamples = st.number_input("Bootstrap Resamples", min_value=100, max_value=100000, value=DEFAULT_RESAMPLES,
+                                        step=1000)
+        with col2:
+            confidence = st.slider("Confidence Level (%)", min_value=80, max_value=99, value=int(DEFAULT_CONFIDENCE * 100))
+        # A fixed seed keeps the intervals stable across the reruns of the page
+        intervals = bootstrap_intervals(ss.calculation_results['df'], ss.cp_data, int(resamples), confidence / 100, seed=0)
+        summary = summary_with_intervals(ss.calculation_results['summary'], intervals)
+        st.dataframe(summary.dropna(subset=["Lower"]).set_index("Metric"))
+        good_reports = (ss.calculation_results['df']['day_status'] == 'GOOD WEATHER DAY').sum()
+        st.caption(f"Resampled from {good_reports} good weather noon reports.")
+    
+    # What-if analysis over time windows, answered from the prefix sums of the noon reports
+    if 'calculation_results' in ss and TIMESTAMP_COLUMN in ss.calculation_results['df'].columns:
+        if 'index' not in ss.calculation_results:
+            ss.calculation_results['index'] = VoyageIndex(ss.calculation_results['df'])
+        index = ss.calculation_results['index']
+        
+        if len(index.timestamps):
+            st.header("What-if Analysis")
+            first_day = pd.Timestamp(index.timestamps[0]).date()
+            last_day = pd.Timestamp(index.timestamps[-1]).date()
+            col1, col2 = st.columns(2)
+            with col1:
+                window_start = st.date_input("From", first_day, min_value=first_day, max_value=last_day)
+            with col2:
+                window_end = st.date_input("To", last_day, min_value=first_day, max_value=last_day)
+            
+            # Exclusion periods can be toggled to see their effect, the results above include every noon report
+            if ss.exclusion_periods:
+                st.caption("The exclusion periods ticked below are left out of the what-if figures only.")
+            excluded_windows = []
+            for i, (period, window) in enumerate(zip(ss.exclusion_periods, exclusion_windows(ss.exclusion_periods))):
+                if st.checkbox(f"Exclude {period['start_date']} {period['start_time']} to {period['end_date']} {period['end_time']} ({period['reason']})",
+                               value=False, key=f"what_if_exclusion_{i}"):
+                    excluded_windows.append(window)
+            
+            what_if = index.metrics(ss.cp_data, pd.Timestamp(window_start),
+                                    pd.Timestamp(window_end) + pd.Timedelta(days=1) - pd.Timedelta(1), excluded_windows)
+            st.dataframe(summary_table(what_if).set_index("Metric"))
+    
+    # Warranted consumption scaled to the actual good weather speed, along the fitted curves of the vessel
+    if 'calculation_results' in ss and ss.vessel_data.get('imo'):
+        st.header("Speed-Consumption Curve")
+        models = store.speed_models(str(ss.vessel_data['imo']))
+        if models.empty:
+            st.info("No speed-consumption curve fitted for this vessel yet.")
+        else:
+            st.dataframe(models.set_index("condition"))
+            good_speed = ss.calculation_results['good_speed']
+            tolerance = ss.cp_data.get('fuel_tolerance_percent', 5.0) / 100
+            warranted = warranted_consumption_at(good_speed, ss.cp_data, models['exponent'])
+            curve_bounds = pd.DataFrame({
+                "Condition": models['condition'],
+                "Warranted FO @ Good Wx Speed (MT/day)": warranted,
+                "Upper Bound (MT/day)": warranted * (1 + tolerance),
+                "Lower Bound (MT/day)": warranted * (1 - tolerance),
+                "Good Wx FO Rate (MT/day)": ss.calculation_results['good_fo_day'],
+            })
+            st.write(f"Good weather speed: {good_speed:.2f} knots")
+            st.dataframe(curve_bounds.set_index("Condition").round(3))
+        if st.button("Refit Fleet Curves"):
+            with st.spinner("Fitting the speed-consumption curves of the saved voyages..."):
+                refit_fleet(store)
+            st.rerun()
 
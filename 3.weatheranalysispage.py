@@ -47,6 +47,7 @@ elif ss.current_page == 'weather_analysis':
                     ax.set_ylabel('Frequency')
                     ax.grid(True, alpha=0.3)
                     st.pyplot(fig)
+                    keep_report_figure('Distribution of Beaufort Scale Numbers', fig)
             
             with col2:
                 if 'significant_wave_height' in df.columns:
@@ -64,6 +65,7 @@ elif ss.current_page == 'weather_analysis':
                     ax.set_ylabel('Frequency')
                     ax.grid(True, alpha=0.3)
                     st.pyplot(fig)
+                    keep_report_figure('Distribution of Significant Wave Heights', fig)
             
             # Good/Bad Weather Analysis
             if 'beaufort_number' in df.columns and 'significant_wave_height' in df.columns and 'weather_definitions' in ss:
@@ -93,6 +95,7 @@ elif ss.current_page == 'weather_analysis':
                     ax.pie(weather_counts, labels=weather_counts.index, autopct='%1.1f%%', startangle=90, colors=['#4CAF50', '#F44336'])
                     ax.axis('equal')
                     st.pyplot(fig)
+                    keep_report_figure('Good vs. Bad Weather Days', fig)
                 
                 with col2:
                     if 'date' in df.columns:
@@ -111,6 +114,7 @@ elif ss.current_page == 'weather_analysis':
                         plt.grid(True, alpha=0.3)
                         plt.tight_layout()
                         st.pyplot(fig)
+                        keep_report_figure('Weather Status Over Time', fig)
             
             # Store weather data in session state
             ss.weather_data = df
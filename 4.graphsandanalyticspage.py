@@ -36,6 +36,7 @@ elif ss.current_page == 'graphs':
                 ax.set_ylabel('Speed (knots)')
                 ax.grid(True, alpha=0.3)
                 st.pyplot(fig)
+                keep_report_figure('Vessel Speed vs. Beaufort Scale', fig)
                 
                 # Correlation coefficient
                 corr = df[[speed_col, 'beaufort_number']].corr().iloc[0, 1]
@@ -66,6 +67,7 @@ elif ss.current_page == 'graphs':
                 ax.set_ylabel('Speed (knots)')
                 ax.grid(True, alpha=0.3)
                 st.pyplot(fig)
+                keep_report_figure('Vessel Speed vs. Significant Wave Height', fig)
                 
                 # Correlation coefficient
                 corr = df[[speed_col, 'significant_wave_height']].corr().iloc[0, 1]
@@ -109,6 +111,7 @@ elif ss.current_page == 'graphs':
                 plt.grid(True, alpha=0.3)
                 plt.tight_layout()
                 st.pyplot(fig)
+                keep_report_figure('Actual Speed vs. Warranted Speed', fig)
             
             # Speed statistics
             st.write("**Speed Statistics:**")
@@ -163,18 +166,21 @@ elif ss.current_page == 'graphs':
             
             with col2:
                 st.subheader("⛽ Fuel Performance")
+                # Bunker price at the departure port, on the COSP date
+                bunker_cost = get_bunker_prices().price(ss.voyage_data.get('from_port'), DEFAULT_FUEL_GRADE,
+                                                        ss.voyage_data.get('cosp_date'))
                 if fuel_saving > 0:
                     st.success(f"Fuel Saved: {fuel_saving:.2f} MT")
-                    # Assuming average bunker cost of $500 per MT
-                    bunker_cost = 500
-                    st.write(f"Estimated savings: ${(fuel_saving * bunker_cost):,.2f}")
+                    if bunker_cost is not None:
+                        st.write(f"Estimated savings: ${(fuel_saving * bunker_cost):,.2f} at ${bunker_cost:,.2f}/MT")
                 elif fuel_overconsumption > 0:
                     st.error(f"Fuel Overconsumed: {fuel_overconsumption:.2f} MT")
-                    # Assuming average bunker cost of $500 per MT
-                    bunker_cost = 500
-                    st.write(f"Estimated additional cost: ${(fuel_overconsumption * bunker_cost):,.2f}")
+                    if bunker_cost is not None:
+                        st.write(f"Estimated additional cost: ${(fuel_overconsumption * bunker_cost):,.2f} at ${bunker_cost:,.2f}/MT")
                 else:
                     st.info("The vessel's fuel consumption is within the allowed range.")
+                if bunker_cost is None:
+                    st.caption(f"No {DEFAULT_FUEL_GRADE} price quoted on or before the COSP date: import bunker prices below.")
             
             with col3:
                 st.subheader("🚢 Speed Performance")
@@ -189,3 +195,135 @@ elif ss.current_page == 'graphs':
                     st.error(f"Good Weather Speed: {good_wx_speed:.2f} knots\n\n{abs(speed_diff):.2f} knots slower than warranted ({warranted_speed} knots)")
     else:
         st.info("No data available for analysis. Please complete the calculations first or upload weather data.")
+    
+    # Fleet Dashboard, read from the aggregates of the saved voyages
+    vessel_totals = store.vessel_aggregates()
+    if not vessel_totals.empty:
+        st.header("Fleet Dashboard")
+        
+        # Fuel overconsumption per vessel
+        st.subheader("Fuel Overconsumption per Vessel")
+        top_vessels = vessel_totals.head(20)
+        fig, ax = plt.subplots(figsize=(12, 6))
+        ax.bar(top_vessels['vessel'].fillna(top_vessels['imo']), top_vessels['fuel_overconsumption'], color='tab:red')
+        ax.set_title(f'Fuel Overconsumption per Vessel (top {len(top_vessels)} of {len(vessel_totals)})')
+        ax.set_ylabel('Overconsumption (MT)')
+        ax.tick_params(axis='x', rotation=45)
+        ax.grid(True, axis='y', alpha=0.3)
+        plt.tight_layout()
+        st.pyplot(fig)
+        
+        # Time lost per charterer
+        st.subheader("Time Lost per Charterer")
+        charterer_totals = store.charterer_aggregates().head(20)
+        fig, ax = plt.subplots(figsize=(12, 6))
+        ax.bar(charterer_totals['charterer'].replace('', 'Unknown'), charterer_totals['time_lost'], color='tab:orange')
+        ax.set_title('Time Lost per Charterer')
+        ax.set_ylabel('Time Lost (hrs)')
+        ax.tick_params(axis='x', rotation=45)
+        ax.grid(True, axis='y', alpha=0.3)
+        plt.tight_layout()
+        st.pyplot(fig)
+        
+        # Good weather speed trends, of the fleet and of the selected vessels
+        st.subheader("Good Weather Speed Trends")
+        selected_imos = st.multiselect("Vessels", vessel_totals['imo'].tolist(),
+                                       format_func=dict(zip(vessel_totals['imo'], vessel_totals['vessel'])).get)
+        fig, ax = plt.subplots(figsize=(12, 6))
+        fleet_trend = store.good_speed_trend()
+        ax.plot(fleet_trend['month'], fleet_trend['good_speed'], marker='o', color='black', label='Fleet')
+        if selected_imos:
+            for imo, trend in store.good_speed_trend(selected_imos).groupby('imo'):
+                ax.plot(trend['month'], trend['good_speed'], marker='.', label=trend['vessel'].iloc[0] or imo)
+        ax.set_title('Good Weather Speed per Month of COSP')
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Speed (knots)')
+        ax.tick_params(axis='x', rotation=45)
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
+        st.pyplot(fig)
+        
+        # Cost of the fuel deviations, every voyage priced at its departure port & COSP date in one as-of join
+        claims = cost_claims(get_bunker_prices(), store.voyage_claims())
+        if claims['price'].notna().any():
+            st.subheader("Fuel Overconsumption Cost per Charterer")
+            charterer_costs = claims.groupby(claims['charterer'].fillna('Unknown').replace('', 'Unknown'))[
+                ['overconsumption_cost', 'saving_value']].sum().sort_values('overconsumption_cost', ascending=False).head(20)
+            fig, ax = plt.subplots(figsize=(12, 6))
+            ax.bar(charterer_costs.index, charterer_costs['overconsumption_cost'], color='tab:red', label='Overconsumption')
+            ax.bar(charterer_costs.index, -charterer_costs['saving_value'], color='tab:green', label='Saving')
+            ax.set_title('Fuel Deviation Cost per Charterer')
+            ax.set_ylabel('Cost (USD)')
+            ax.tick_params(axis='x', rotation=45)
+            ax.legend()
+            ax.grid(True, axis='y', alpha=0.3)
+            plt.tight_layout()
+            st.pyplot(fig)
+            unpriced = claims['price'].isna().sum()
+            if unpriced:
+                st.caption(f"{unpriced} voyages without a bunker price quoted before their COSP date are not costed.")
+        
+        # Rolling good weather performance of a vessel, read from the precomputed windows
+        st.subheader("Rolling Performance Monitoring")
+        col1, col2 = st.columns(2)
+        with col1:
+            monitored_imo = st.selectbox("Vessel", vessel_totals['imo'].tolist(),
+                                         format_func=dict(zip(vessel_totals['imo'], vessel_totals['vessel'])).get,
+                                         key="monitored_vessel")
+        with col2:
+            monitoring_windows = st.multiselect("Windows (days)", MONITORING_WINDOWS, default=MONITORING_WINDOWS)
+        if monitoring_windows:
+            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), sharex=True)
+            for window in monitoring_windows:
+                rolling = store.rolling_performance(monitored_imo, window)
+                ax1.plot(rolling['day'], rolling['good_speed'], label=f'{window} days')
+                ax2.plot(rolling['day'], rolling['good_fo_day'], label=f'{window} days')
+            ax1.axhline(y=ss.cp_data.get('warranted_speed', 13.0), color='gray', linestyle='--', label='Warranted')
+            ax2.axhline(y=ss.cp_data.get('warranted_consumption', 19.9), color='gray', linestyle='--', label='Warranted')
+            ax1.set_title('Rolling Good Weather Speed')
+            ax1.set_ylabel('Speed (knots)')
+            ax2.set_title('Rolling Good Weather FO Consumption')
+            ax2.set_ylabel('FO (MT/day)')
+            ax2.tick_params(axis='x', rotation=45)
+            for ax in (ax1, ax2):
+                ax.legend()
+                ax.grid(True, alpha=0.3)
+            plt.tight_layout()
+            st.pyplot(fig)
+        
+        # Emissions of the fleet, from the CO2 of the saved voyages
+        st.subheader("Carbon Intensity (CII) per Vessel & Year")
+        cii = cii_ratings(store.yearly_emissions())
+        st.dataframe(cii[['vessel', 'imo', 'year', 'type', 'voyages', 'co2_emissions', 'attained_cii', 'required_cii',
+                          'cii_rating']].set_index(['vessel', 'year']).round(3))
+        st.caption("Attained CII of the sea passages in the store (g CO2 per t of capacity & nm), not of the whole year.")
+        
+        st.subheader("EU ETS Exposure")
+        eua_price = st.number_input("EU Allowance Price (EUR / t CO2)", min_value=0.0, value=DEFAULT_EUA_PRICE, step=1.0)
+        exposure = ets_exposure(store.voyage_emissions(), eua_price)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("CO2 Covered (t)", f"{exposure['ets_co2'].sum():,.1f}")
+        with col2:
+            st.metric("Allowances Cost (EUR)", f"{exposure['ets_cost'].sum():,.0f}")
+        covered = exposure[exposure['ets_co2'] > 0]
+        if not covered.empty:
+            st.dataframe(covered[['vessel', 'voyage_no', 'from_port', 'to_port', 'cosp_date', 'co2_emissions',
+                                  'ets_coverage', 'ets_co2', 'ets_cost']].set_index(['vessel', 'voyage_no']).round(2))
+        else:
+            st.caption("No saved voyage to or from an EU/EEA port: ports are matched by their UN/LOCODE (e.g. NLRTM).")
+    
+    # Bunker prices of the fuel costs, by port, grade and date
+    if not DEFAULT_CSV:
+        with st.expander("Bunker Prices"):
+            prices_file = st.file_uploader("Upload bunker prices (CSV with port, fuel_grade, date and price in USD/MT)",
+                                           type=["csv"], key="bunker_prices_file")
+            if prices_file is not None and st.button("Import Bunker Prices"):
+                try:
+                    prices = normalize_prices(pd.read_csv(prices_file))
+                    store.save_bunker_prices(prices)
+                    st.success(f"{len(prices)} bunker prices imported")
+                except ValueError as e:
+                    st.error(str(e))
+            st.dataframe(get_bunker_prices().table())
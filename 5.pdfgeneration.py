@@ -3,6 +3,24 @@ import base64
 from fpdf import FPDF
 import io
 import matplotlib.pyplot as plt
+from xml.etree.ElementTree import ParseError
+
+# Charts are embedded as vector graphics, or as downscaled raster images if their SVG cannot be parsed
+def add_report_figure(pdf, fig):
+    svg_buffer = io.BytesIO()
+    fig.savefig(svg_buffer, format='svg')
+    try:
+        pdf.image(svg_buffer.getvalue(), w=pdf.epw)
+    except (ParseError, ValueError):
+        # fpdf raises ValueError on SVG it cannot render
+        png_buffer = io.BytesIO()
+        fig.savefig(png_buffer, format='png', dpi=300)
+        oversized_images = pdf.oversized_images
+        pdf.oversized_images = "DOWNSCALE"
+        try:
+            pdf.image(png_buffer.getvalue(), w=pdf.epw)
+        finally:
+            pdf.oversized_images = oversized_images
 
 # Create a button for PDF generation in sidebar
 st.sidebar.markdown("---")
@@ -95,9 +113,22 @@ if st.sidebar.button("Generate PDF Report"):
             for index, row in summary.iterrows():
                 pdf.cell(100, 10, str(row['Metric']), 1, 0)
                 pdf.cell(80, 10, str(round(row['Value'], 2) if isinstance(row['Value'], (int, float)) else row['Value']), 1, 1)
+        
+        # Section 6: Charts from the Weather Analysis and Graphs & Analytics pages
+        if ss.get('report_figures'):
+            pdf.add_page()
+            pdf.set_font('Arial', 'B', 14)
+            pdf.cell(0, 10, "6. Charts", ln=True)
+            pdf.ln(5)
+            
+            for title, fig in ss.report_figures.items():
+                pdf.set_font('Arial', 'B', 12)
+                pdf.cell(0, 10, title, ln=True)
+                add_report_figure(pdf, fig)
+                pdf.ln(5)
                 
         # Create download link for PDF
-        html = create_download_link(pdf.output(dest="S").encode("latin-1"), f"{vessel_name}_Voyage_{voyage_no}_Report")
+        html = create_download_link(bytes(pdf.output()), f"{vessel_name}_Voyage_{voyage_no}_Report")
         st.sidebar.markdown(html, unsafe_allow_html=True)
         
         st.sidebar.success("PDF generated successfully!")
@@ -0,0 +1,139 @@
+"""
+Bunker prices by port, fuel grade and date, to cost the fuel over/under-consumption of voyages.
+
+The prices are read from a CSV file (port, fuel_grade, date, price in USD/MT)
+or from the bunker_prices table of the voyage store. They are kept in memory,
+sorted for the as-of join, and read again only when their source changes.
+Claims are costed at the latest price quoted at their port, for their grade, on
+or before their date, falling back to the latest price of the grade at any port:
+one merge_asof prices all the voyages of the fleet at once.
+
+    python bunker_prices.py import prices.csv      # loads a CSV file into the voyage store
+    python bunker_prices.py cost                   # costs the fuel deviations of all the saved voyages
+
+The app reads the prices of the store, or of the CSV file set in the
+CP_BUNKER_PRICES environment variable.
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from voyage_calculations import DEFAULT_FUEL_GRADE
+
+PRICE_COLUMNS = ['port', 'fuel_grade', 'date', 'price']
+
+# CSV file of the prices, instead of the voyage store
+DEFAULT_CSV = os.environ.get('CP_BUNKER_PRICES')
+
+
+def price_key(values):
+    """Ports & grades are matched in upper case"""
+    return values.astype('string').str.strip().str.upper().fillna('')
+
+
+def normalize_prices(prices):
+    """Prices with upper case ports & grades, valid dates and numeric prices, sorted by date for merge_asof"""
+    missing_columns = set(PRICE_COLUMNS) - set(prices.columns)
+    if missing_columns:
+        raise ValueError(f"Missing bunker price columns: {', '.join(sorted(missing_columns))}")
+    prices = pd.DataFrame({
+        'port': price_key(prices['port']),
+        'fuel_grade': price_key(prices['fuel_grade']),
+        'date': pd.to_datetime(prices['date'], errors='coerce').astype('datetime64[ns]'),
+        'price': pd.to_numeric(prices['price'], errors='coerce'),
+    })
+    return prices.dropna().sort_values('date', kind='stable').reset_index(drop=True)
+
+
+class BunkerPrices:
+    """
+    The bunker prices of a CSV file or of a VoyageStore, cached until the source changes:
+    the modification time & size of the file, or the data version of the database.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.version = None
+        self.prices = None
+
+    def _source_version(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            stat = os.stat(self.source)
+            return stat.st_mtime_ns, stat.st_size
+        # Commits of other connections change the data version, those of the store's own its total changes
+        connection = self.source.connection
+        with self.source.lock:
+            return connection.execute("PRAGMA data_version").fetchone()[0], connection.total_changes
+
+    def table(self):
+        """The current prices, read again if their source changed since the last call"""
+        version = self._source_version()
+        if version != self.version:
+            if isinstance(self.source, (str, os.PathLike)):
+                prices = pd.read_csv(self.source)
+            else:
+                prices = self.source.bunker_prices()
+            self.prices, self.version = normalize_prices(prices), version
+        return self.prices
+
+    def price_claims(self, claims):
+        """
+        Adds the 'price' (USD/MT) of every claim of `claims`, a DataFrame with a port, a fuel_grade (that
+        of the ME fuel, DEFAULT_FUEL_GRADE, if absent) and a date per row. Claims without any price quoted get NaN.
+        """
+        prices = self.table()
+        keys = pd.DataFrame({
+            'port': price_key(claims['port']),
+            'fuel_grade': price_key(claims['fuel_grade'] if 'fuel_grade' in claims.columns
+                                    else pd.Series(DEFAULT_FUEL_GRADE, index=claims.index)),
+            'date': pd.to_datetime(claims['date'], errors='coerce').astype('datetime64[ns]'),
+            'row': range(len(claims)),
+        })
+        # merge_asof requires sorted dates without NaT, claims without a date are left unpriced
+        dated = keys.dropna(subset=['date']).sort_values('date', kind='stable')
+        by_port = pd.merge_asof(dated, prices, on='date', by=['port', 'fuel_grade'], direction='backward')
+        by_grade = pd.merge_asof(dated, prices.drop(columns='port'), on='date', by='fuel_grade', direction='backward')
+        price = pd.Series(by_port['price'].fillna(by_grade['price']).to_numpy(), index=dated['row'].to_numpy())
+        return claims.assign(price=price.reindex(range(len(claims))).to_numpy())
+
+    def price(self, port, fuel_grade, date):
+        """The price of a single claim, or None if no price is quoted"""
+        price = self.price_claims(pd.DataFrame({'port': [port], 'fuel_grade': [fuel_grade], 'date': [date]}))['price'][0]
+        return None if pd.isna(price) else float(price)
+
+
+def cost_claims(prices, claims):
+    """Prices the fuel over/under-consumption of voyage claims (cf. VoyageStore.voyage_claims()), in USD"""
+    claims = prices.price_claims(claims)
+    claims['overconsumption_cost'] = claims['fuel_overconsumption'] * claims['price']
+    claims['saving_value'] = claims['fuel_saving'] * claims['price']
+    return claims
+
+
+def main(argv=None):
+    from voyage_store import DEFAULT_PATH, VoyageStore
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=DEFAULT_PATH, help=f"voyage store, {DEFAULT_PATH} by default")
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_command = commands.add_parser('import', help="load a CSV file of bunker prices into the store")
+    import_command.add_argument('csv', help="CSV file with port, fuel_grade, date & price (USD/MT) columns")
+    cost_command = commands.add_parser('cost', help="cost the fuel deviations of the saved voyages")
+    cost_command.add_argument('--prices', default=DEFAULT_CSV, help="CSV file of bunker prices, instead of those of the store")
+    args = parser.parse_args(argv)
+
+    store = VoyageStore(args.store)
+    if args.command == 'import':
+        prices = normalize_prices(pd.read_csv(args.csv))
+        store.save_bunker_prices(prices)
+        print(f"{len(prices)} bunker prices imported")
+    else:
+        claims = cost_claims(BunkerPrices(args.prices or store), store.voyage_claims())
+        print(claims.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
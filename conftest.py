@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def make_noon_reports():
+    """Builds the noon reports of a random passage: a COSP, a report a day, and an EOSP"""
+    def make_noon_reports(days=60, seed=0, imo='9300001', start='2024-05-01 12:00'):
+        rng = np.random.default_rng(seed)
+        event_type = np.where(rng.random(days) < 0.05, 'IN PORT', 'NOON AT SEA').astype(object)
+        event_type[0], event_type[-1] = 'COSP', 'EOSP'
+        return pd.DataFrame({
+            'imo': imo,
+            'date': pd.date_range(start, periods=days, freq='D'),
+            'event_type': event_type,
+            'distance_travelled_actual': rng.uniform(250, 330, days),
+            'steaming_time_hrs': 24.0,
+            'me_fuel_consumed': rng.uniform(17, 23, days),
+            'beaufort_number': rng.integers(1, 8, days),
+            'significant_wave_height': rng.choice([0.5, 1.0, 1.5, 2.0, 2.5, 3.0], days),
+        })
+    return make_noon_reports
+
+
+@pytest.fixture
+def weather_definitions():
+    return {'max_beaufort': 4, 'max_wave_height': 2.0}
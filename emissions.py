@@ -0,0 +1,132 @@
+"""
+CO2, CII and EU ETS figures of the fleet, from the results of the voyage calculations.
+
+The CO2 of every voyage is computed with its CP performance, from the same
+sums of the noon reports (cf. voyage_calculations.performance_metrics()), and
+summed per vessel & year of COSP in the voyage store. This module only turns
+those sums into:
+
+  * the attained CII of every vessel & year, in g CO2 / (capacity t . nm), its
+    required value and its A to E rating (IMO MEPC.353(78) & MEPC.354(78)),
+  * the EU ETS exposure of every voyage: the share of its CO2 covered by the
+    scheme (100 % between two EU/EEA ports, 50 % to or from one), times the
+    phase-in of its year, times the price of an allowance.
+
+Only the sea passages computed here are counted, not the time in port: the CII
+is that of the voyages in the store, not the one reported for the whole year.
+Ports are recognised as EU/EEA by their UN/LOCODE (e.g. NLRTM, DEHAM).
+
+    python emissions.py                     # CII per vessel & year, and EU ETS exposure, of the saved voyages
+    python emissions.py --eua-price 75
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+# CII reference lines per vessel type: (type, minimum DWT, capacity cap, a, c, rating boundaries d1 to d4)
+CII_REFERENCE_LINES = [
+    ('Bulk Carrier', 279000, 279000, 4745, 0.622, (0.86, 0.94, 1.06, 1.18)),
+    ('Bulk Carrier', 0, None, 4745, 0.622, (0.86, 0.94, 1.06, 1.18)),
+    ('Oil Tanker', 0, None, 5247, 0.610, (0.82, 0.93, 1.08, 1.28)),
+    ('Chemical Tanker', 0, None, 5247, 0.610, (0.82, 0.93, 1.08, 1.28)),
+    ('Container Ship', 0, None, 1984, 0.489, (0.83, 0.94, 1.07, 1.19)),
+    ('Gas Carrier', 65000, None, 14405e7, 2.071, (0.81, 0.91, 1.12, 1.44)),
+    ('Gas Carrier', 0, None, 8104, 0.639, (0.85, 0.95, 1.06, 1.25)),
+]
+CII_RATINGS = ['A', 'B', 'C', 'D', 'E']
+
+# Reduction of the required CII below the reference line, per year (%)
+CII_REDUCTION_FACTORS = {2023: 5, 2024: 7, 2025: 9, 2026: 11}
+
+# Share of the CO2 of the covered voyages surrendered as allowances, per year
+ETS_PHASE_IN = {2024: 0.4, 2025: 0.7}
+ETS_FULL_PHASE_IN_YEAR = 2026
+
+# EU member states, Iceland & Norway, by ISO 3166 code (the first two letters of a UN/LOCODE)
+EU_ETS_COUNTRIES = {
+    'AT', 'BE', 'BG', 'CY', 'CZ', 'DE', 'DK', 'EE', 'ES', 'FI', 'FR', 'GR', 'HR', 'HU', 'IE', 'IT', 'LT',
+    'LU', 'LV', 'MT', 'NL', 'PL', 'PT', 'RO', 'SE', 'SI', 'SK', 'IS', 'NO',
+}
+
+# Price of an EU allowance (EUR / t CO2), unless given
+DEFAULT_EUA_PRICE = 70.0
+
+
+def cii_ratings(yearly):
+    """
+    Adds the capacity, attained & required CII, their ratio and the rating of every row of `yearly`
+    (cf. VoyageStore.yearly_emissions()). Vessels of a type without a reference line get NaN.
+    """
+    yearly = yearly.copy()
+    dwt = pd.to_numeric(yearly['dwt'], errors='coerce')
+    capacity = pd.Series(np.nan, index=yearly.index)
+    reference = pd.Series(np.nan, index=yearly.index)
+    boundaries = pd.DataFrame(np.nan, index=yearly.index, columns=['d1', 'd2', 'd3', 'd4'])
+    # The first line matching the type & DWT of a vessel applies
+    matched = pd.Series(False, index=yearly.index)
+    for vessel_type, min_dwt, capacity_cap, a, c, d in CII_REFERENCE_LINES:
+        rows = ~matched & (yearly['type'] == vessel_type) & (dwt >= min_dwt) & (dwt > 0)
+        line_capacity = dwt[rows] if capacity_cap is None else dwt[rows].clip(upper=capacity_cap)
+        capacity[rows] = line_capacity
+        reference[rows] = a * line_capacity ** -c
+        boundaries.loc[rows] = d
+        matched |= rows
+
+    year = pd.to_numeric(yearly['year'], errors='coerce')
+    reduction = year.map(CII_REDUCTION_FACTORS)
+    yearly['capacity'] = capacity
+    yearly['attained_cii'] = (yearly['co2_emissions'] * 1e6 / (capacity * yearly['total_distance'])).where(
+        yearly['total_distance'] > 0)
+    yearly['required_cii'] = reference * (1 - reduction / 100)
+    yearly['cii_ratio'] = yearly['attained_cii'] / yearly['required_cii']
+    ratio = yearly['cii_ratio'].to_numpy()
+    rating = np.select([ratio <= boundaries[column].to_numpy() for column in boundaries.columns], CII_RATINGS[:-1],
+                       default=CII_RATINGS[-1])
+    yearly['cii_rating'] = pd.Series(rating, index=yearly.index).where(yearly['cii_ratio'].notna())
+    return yearly
+
+
+def is_eu_port(ports):
+    """Whether each port, given by its UN/LOCODE, is in the EU or the EEA"""
+    codes = ports.astype('string').str.replace(' ', '').str.upper()
+    return ((codes.str.len() == 5) & codes.str[:2].isin(EU_ETS_COUNTRIES)).fillna(False).astype(bool)
+
+
+def ets_exposure(voyages, eua_price=DEFAULT_EUA_PRICE):
+    """
+    Adds the EU ETS coverage, the CO2 to surrender allowances for and their cost (EUR) of every voyage
+    of `voyages` (cf. VoyageStore.voyage_emissions())
+    """
+    voyages = voyages.copy()
+    from_eu = is_eu_port(voyages['from_port'])
+    to_eu = is_eu_port(voyages['to_port'])
+    year = pd.to_datetime(voyages['cosp_date'], errors='coerce').dt.year
+    phase_in = year.map(ETS_PHASE_IN).mask(year >= ETS_FULL_PHASE_IN_YEAR, 1.0).fillna(0.0)
+    voyages['ets_coverage'] = np.where(from_eu & to_eu, 1.0, np.where(from_eu | to_eu, 0.5, 0.0))
+    voyages['ets_co2'] = voyages['co2_emissions'] * voyages['ets_coverage'] * phase_in
+    voyages['ets_cost'] = voyages['ets_co2'] * eua_price
+    return voyages
+
+
+def main(argv=None):
+    from voyage_store import DEFAULT_PATH, VoyageStore
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=DEFAULT_PATH, help=f"voyage store, {DEFAULT_PATH} by default")
+    parser.add_argument('--eua-price', type=float, default=DEFAULT_EUA_PRICE,
+                        help=f"price of an EU allowance (EUR / t CO2), {DEFAULT_EUA_PRICE} by default")
+    args = parser.parse_args(argv)
+
+    store = VoyageStore(args.store)
+    print(cii_ratings(store.yearly_emissions()).to_string(index=False))
+    print()
+    exposure = ets_exposure(store.voyage_emissions(), args.eua_price)
+    print(exposure[exposure['ets_co2'] > 0].to_string(index=False))
+    print(f"\nEU ETS exposure: {exposure['ets_co2'].sum():,.1f} t CO2, EUR {exposure['ets_cost'].sum():,.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
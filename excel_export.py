@@ -0,0 +1,195 @@
+"""
+Excel export of voyage performance results, for one voyage or a whole fleet.
+
+The workbook is written with xlsxwriter's `constant_memory` mode: every row is
+flushed to a temporary file as soon as the next one is started, so exports of
+thousands of voyages are never held in RAM. Its sheets are:
+
+  * Voyage Summary: one row per voyage, with the metrics of the summary table
+  * Noon Reports: the noon reports used by the calculations, classified as good or bad weather days
+  * Exclusions: the exclusion periods of every voyage
+
+Number formats are created once and set on whole columns, cells are written without a format.
+
+    python excel_export.py fleet_report.xlsx voyages.json
+
+where voyages.json lists the voyages to compute, as the session state of the input page:
+
+    [{"file": "noon_reports/V001.xlsx",
+      "vessel_data": {"name": "...", "imo": "..."},
+      "voyage_data": {"voyage_no": "V001", "from_port": "...", "to_port": "...", "cosp_date": "2024-05-01"},
+      "cp_data": {"charterer": "...", "warranted_speed": 13.0, "warranted_consumption": 19.9},
+      "weather_definitions": {"max_beaufort": 5, "max_wave_height": 2.0},
+      "exclusion_periods": [{"start_date": "2024-05-03", "start_time": "06:00:00",
+                             "end_date": "2024-05-03", "end_time": "18:00:00", "reason": "..."}]}]
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import sys
+
+import pandas as pd
+import xlsxwriter
+
+from voyage_calculations import SUMMARY_METRICS, calculate_voyage, read_noon_reports, summary_value
+
+# Columns of the sheets: (header, width, number format or None)
+VOYAGE_COLUMNS = [
+    ("Vessel", 24, None),
+    ("IMO", 10, None),
+    ("Voyage No", 12, None),
+    ("From Port", 16, None),
+    ("To Port", 16, None),
+    ("COSP Date", 12, 'yyyy-mm-dd'),
+    ("Charterer", 20, None),
+] + [(metric, 14, '#,##0.000' if decimals == 3 else '#,##0.00') for metric, _, decimals in SUMMARY_METRICS]
+
+# Noon report columns exported, the other columns of the uploaded files are left out
+NOON_REPORT_COLUMNS = [
+    ('event_type', 14, None),
+    ('leg', 6, '0'),
+    ('distance_travelled_actual', 12, '#,##0.00'),
+    ('steaming_time_hrs', 12, '#,##0.00'),
+    ('me_fuel_consumed', 12, '#,##0.00'),
+    ('beaufort_number', 10, '0'),
+    ('significant_wave_height', 12, '0.00'),
+    ('day_status', 18, None),
+    ('anomaly', 40, None),
+    ('quarantined', 12, None),
+]
+
+EXCLUSION_COLUMNS = [
+    ("Vessel", 24, None),
+    ("Voyage No", 12, None),
+    ("Start", 17, 'yyyy-mm-dd hh:mm'),
+    ("End", 17, 'yyyy-mm-dd hh:mm'),
+    ("Reason", 40, None),
+]
+
+
+def as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+class StreamedSheet:
+    """A worksheet written row after row, whose columns each have a single number format"""
+
+    def __init__(self, workbook, name, columns):
+        self.worksheet = workbook.add_worksheet(name)
+        header_format = workbook.add_format({'bold': True, 'text_wrap': True, 'valign': 'top'})
+        self.formats = []
+        for col, (header, width, num_format) in enumerate(columns):
+            cell_format = workbook.add_format({'num_format': num_format}) if num_format else None
+            self.worksheet.set_column(col, col, width, cell_format)
+            self.worksheet.write_string(0, col, header, header_format)
+            self.formats.append(cell_format)
+        self.worksheet.freeze_panes(1, 0)
+        self.row = 1
+
+    def write_row(self, values):
+        worksheet, row = self.worksheet, self.row
+        for col, value in enumerate(values):
+            if isinstance(value, str):
+                worksheet.write_string(row, col, value)
+            elif pd.isna(value) or value in (math.inf, -math.inf):
+                # Missing & infinite metrics (e.g. no time tolerance) are left blank
+                continue
+            elif isinstance(value, (datetime.date, datetime.datetime)):
+                # Dates are otherwise given the default date format of the workbook, not the one of the column:
+                worksheet.write_datetime(row, col, value, self.formats[col])
+            elif isinstance(value, bool):
+                worksheet.write_boolean(row, col, value)
+            else:
+                worksheet.write_number(row, col, value)
+        self.row += 1
+
+
+class VoyageWorkbook:
+    """
+    Streams the results of voyages into an Excel workbook.
+
+        with VoyageWorkbook("fleet_report.xlsx") as workbook:
+            for voyage in voyages:
+                workbook.add_voyage(vessel_data, voyage_data, cp_data, exclusion_periods, results)
+
+    `output` is a file path or a binary file object.
+    """
+
+    def __init__(self, output, noon_report_columns=NOON_REPORT_COLUMNS):
+        self.workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        self.noon_report_columns = [column for column, _, _ in noon_report_columns]
+        self.voyages = StreamedSheet(self.workbook, "Voyage Summary", VOYAGE_COLUMNS)
+        self.noon_reports = StreamedSheet(self.workbook, "Noon Reports", [
+            ("Vessel", 24, None),
+            ("Voyage No", 12, None),
+        ] + noon_report_columns)
+        self.exclusions = StreamedSheet(self.workbook, "Exclusions", EXCLUSION_COLUMNS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.workbook.close()
+
+    def add_voyage(self, vessel_data, voyage_data, cp_data, exclusion_periods, results):
+        """Writes a voyage: `results` is the dict returned by voyage_calculations.calculate_voyage()"""
+        vessel_name = vessel_data.get('name', '')
+        voyage_no = voyage_data.get('voyage_no', '')
+        self.voyages.write_row([
+            vessel_name,
+            vessel_data.get('imo', ''),
+            voyage_no,
+            voyage_data.get('from_port', ''),
+            voyage_data.get('to_port', ''),
+            as_date(voyage_data.get('cosp_date')),
+            cp_data.get('charterer', ''),
+        ] + [summary_value(results, key, decimals) for _, key, decimals in SUMMARY_METRICS])
+
+        df = results['df'].reindex(columns=self.noon_report_columns)
+        for noon_report in df.itertuples(index=False, name=None):
+            self.noon_reports.write_row((vessel_name, voyage_no) + noon_report)
+
+        for period in exclusion_periods:
+            self.exclusions.write_row([
+                vessel_name,
+                voyage_no,
+                datetime.datetime.fromisoformat(f"{period['start_date']} {period['start_time']}"),
+                datetime.datetime.fromisoformat(f"{period['end_date']} {period['end_time']}"),
+                period.get('reason', ''),
+            ])
+
+
+def export_manifest(output, manifest_path):
+    """Computes the voyages listed in a JSON manifest, one at a time, and writes them to `output`"""
+    with open(manifest_path) as manifest_file:
+        voyages = json.load(manifest_file)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with VoyageWorkbook(output) as workbook:
+        for voyage in voyages:
+            df = read_noon_reports(os.path.join(base_dir, voyage['file']))
+            cp_data = voyage.get('cp_data', {})
+            results = calculate_voyage(df, cp_data, voyage.get('weather_definitions', {}))
+            workbook.add_voyage(voyage.get('vessel_data', {}), voyage.get('voyage_data', {}), cp_data,
+                                voyage.get('exclusion_periods', []), results)
+    return len(voyages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help="path of the Excel workbook to write")
+    parser.add_argument('manifest', help="JSON list of the voyages to export")
+    args = parser.parse_args(argv)
+    count = export_manifest(args.output, args.manifest)
+    print(f"{count} voyages written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,7 @@
 # * Maintainer:  David Alexander (daveankin@gmail.com) et al since 2017 est. *
 # * Maintainer:  Lucas Cimon et al since 2021 est.                           *
 # ****************************************************************************
+import copy
 import hashlib
 import io
 import logging
@@ -16,18 +17,23 @@ import math
 import os
 import re
 import sys
+import threading
 import types
 import warnings
-from collections import defaultdict
+import zlib
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime, timezone
-from functools import wraps
+from functools import partial, wraps
 from math import isclose
 from numbers import Number
 from os.path import splitext
 from pathlib import Path
 from typing import Callable, Dict, Iterator, NamedTuple, Optional, Union
 
+from fontTools import ttLib
+
 try:
     from cryptography.hazmat.primitives.serialization import pkcs12
     from endesive import signer
@@ -66,7 +72,6 @@ from .drawing import (
     GraphicsStyle,
     PaintedPath,
     Point,
-    Transform,
     convert_to_device_color,
 )
 from .encryption import StandardSecurityHandler
@@ -98,7 +103,15 @@ from .enums import (
     OutputIntentSubType,
 )
 from .errors import FPDFException, FPDFPageFormatException, FPDFUnicodeEncodingException
-from .fonts import CoreFont, CORE_FONTS, FontFace, TextStyle, TitleStyle, TTFFont
+from .fonts import (
+    CoreFont,
+    CORE_FONTS,
+    FontFace,
+    SubsetMap,
+    TextStyle,
+    TitleStyle,
+    TTFFont,
+)
 from .graphics_state import GraphicsStateMixin
 from .html import HTML2FPDF
 from .image_datastructures import (
@@ -109,6 +122,7 @@ from .image_datastructures import (
 )
 from .image_parsing import (
     SUPPORTED_IMAGE_FILTERS,
+    _is_svg,
     get_img_info,
     load_image,
     preload_image,
@@ -124,18 +138,30 @@ from .outline import OutlineSection
 from .output import (
     ZOOM_CONFIGS,
     OutputProducer,
+    PDFHeader,
     PDFPage,
     PDFPageLabel,
+    PDFXrefAndTrailer,
     ResourceCatalog,
     stream_content_for_raster_image,
     PDFICCProfile,
     OutputIntentDictionary,
+    _dimensions_to_mediabox,
 )
 from .recorder import FPDFRecorder
 from .sign import Signature
 from .structure_tree import StructureTreeBuilder
 from .svg import Percent, SVGObject
-from .syntax import DestinationXYZ, PDFArray, PDFDate
+from .syntax import (
+    DestinationXYZ,
+    Name,
+    PDFArray,
+    PDFContentStream,
+    PDFDate,
+    PDFObject,
+)
+from .syntax import create_dictionary_string as pdf_dict
+from .syntax import iobj_ref as pdf_ref
 from .table import Table, draw_box_borders
 from .text_region import TextRegionMixin, TextColumns
 from .transitions import Transition
@@ -157,6 +183,29 @@ PAGE_FORMATS = {
 LOGGER = logging.getLogger(__name__)
 HERE = Path(__file__).resolve().parent
 FPDF_FONT_DIR = HERE / "font"
+# map resolved font file paths to their modification time & parsed font attributes,
+# shared by all FPDF instances when FPDF.SHARED_TTF_FONTS is enabled:
+_TTF_FONTS_CACHE = {}
+# TTFFont attributes that do not depend on the document using the font:
+_SHARED_TTF_FONT_ATTRS = (
+    "type",
+    "ttffile",
+    "scale",
+    "desc",
+    "cw",
+    "cmap",
+    "glyph_ids",
+    "name",
+    "up",
+    "ut",
+    "sp",
+    "ss",
+)
+# default number of threads compressing pages content, cf. FPDF.set_compression():
+DEFAULT_COMPRESSION_WORKERS = min(4, os.cpu_count() or 1)
+# thread pools compressing pages content, shared by all documents, per number of threads:
+_COMPRESSION_EXECUTORS = {}
+_COMPRESSION_EXECUTORS_LOCK = threading.Lock()
 LAYOUT_ALIASES = {
     "default": None,
     "single": PageLayout.SINGLE_PAGE,
@@ -174,6 +223,347 @@ class ToCPlaceholder(NamedTuple):
     reset_page_indices: bool = True
 
 
+class FlushedContentStream(PDFObject):
+    "Reference to a page content stream already written by `StreamingOutputProducer.flush_page()`"
+
+    def __init__(self, obj_id):
+        super().__init__()
+        self.id = obj_id
+
+    def __iadd__(self, data):
+        raise FPDFException(
+            "Content cannot be added to a page already flushed in streaming output mode"
+        )
+
+
+class FlushedContentStreams(PDFArray):
+    """
+    References to the content streams of a page using the {nb} alias, flushed by
+    `StreamingOutputProducer.flush_page()`: its content is split around the alias placeholders,
+    whose own streams are only written by `StreamingOutputProducer.bufferize()`.
+    """
+
+    def __iadd__(self, data):
+        raise FPDFException(
+            "Content cannot be added to a page already flushed in streaming output mode"
+        )
+
+
+class StreamedPDFBuffer:
+    """
+    File-backed replacement of the `OutputProducer` bytearray buffer:
+    only the size & hash of the data written are kept in memory.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.size = 0
+        self.hash = hashlib.new("md5", usedforsecurity=False)  # nosec B324
+
+    def __len__(self):
+        return self.size
+
+    def __iadd__(self, data):
+        self.file.write(data)
+        self.hash.update(data)
+        self.size += len(data)
+        return self
+
+
+def get_compression_executor(workers):
+    "Returns the shared thread pool of `workers` threads, created on first use"
+    with _COMPRESSION_EXECUTORS_LOCK:
+        if workers not in _COMPRESSION_EXECUTORS:
+            _COMPRESSION_EXECUTORS[workers] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="fpdf-compression"
+            )
+        return _COMPRESSION_EXECUTORS[workers]
+
+
+def deflated_content_stream(contents):
+    "Builds a content stream from data already compressed with zlib"
+    cs_obj = PDFContentStream(contents=contents)
+    cs_obj.filter = Name("FlateDecode")
+    return cs_obj
+
+
+class ConcurrentOutputProducer(OutputProducer):
+    """
+    Default output producer of `FPDF.output()`:
+    the page content streams are compressed concurrently on a thread pool, as zlib releases the GIL.
+    The resulting document is identical to the one of a serial compression at the same level.
+    """
+
+    def _build_content_streams(self, page_objs):
+        """
+        Replaces the contents of some pages by content streams,
+        compressed according to `FPDF.set_compression()`
+        """
+        fpdf = self.fpdf
+        if not fpdf.compress:
+            for page_obj in page_objs:
+                page_obj.contents = PDFContentStream(contents=page_obj.contents)
+            return
+        compress = partial(zlib.compress, level=fpdf.compression_level)
+        workers = fpdf.compression_workers or DEFAULT_COMPRESSION_WORKERS
+        if workers == 1 or len(page_objs) < 2:
+            for page_obj in page_objs:
+                page_obj.contents = deflated_content_stream(compress(page_obj.contents))
+            return
+        executor = get_compression_executor(workers)
+        # Bounding the number of pages in progress,
+        # so that their uncompressed contents are released along the way:
+        pending = deque()
+        for page_obj in page_objs:
+            pending.append((page_obj, executor.submit(compress, page_obj.contents)))
+            if len(pending) >= 2 * workers:
+                done_page_obj, future = pending.popleft()
+                done_page_obj.contents = deflated_content_stream(future.result())
+        for page_obj, future in pending:
+            page_obj.contents = deflated_content_stream(future.result())
+
+    def _add_pages(self, _slice=slice(0, None)):
+        fpdf = self.fpdf
+        page_objs = list(self._iter_pages_in_order())[_slice]
+        # Pages already flushed by StreamingOutputProducer do not hold their contents anymore:
+        self._build_content_streams(
+            [
+                page_obj
+                for page_obj in page_objs
+                if not isinstance(
+                    page_obj.contents, (FlushedContentStream, FlushedContentStreams)
+                )
+            ]
+        )
+        for page_obj in page_objs:
+            if fpdf.pdf_version > "1.3":
+                page_obj.group = pdf_dict(
+                    {"/Type": "/Group", "/S": "/Transparency", "/CS": "/DeviceRGB"},
+                    field_join=" ",
+                )
+            if page_obj.dimensions() != fpdf.default_page_dimensions:
+                page_obj.media_box = _dimensions_to_mediabox(page_obj.dimensions())
+            self._add_pdf_obj(page_obj, "pages")
+
+            if not isinstance(
+                page_obj.contents, (FlushedContentStream, FlushedContentStreams)
+            ):
+                self._add_pdf_obj(page_obj.contents, "pages")
+
+        return page_objs
+
+
+class LinearizedConcurrentOutputProducer(
+    LinearizedOutputProducer, ConcurrentOutputProducer
+):
+    """
+    Output producer of `FPDF.output(linearize=True)`:
+    the pages are laid out by `LinearizedOutputProducer`,
+    and their content streams compressed as by `ConcurrentOutputProducer`,
+    at the level set with `FPDF.set_compression()`.
+    """
+
+
+class StreamingOutputProducer(ConcurrentOutputProducer):
+    """
+    Generates the PDF document directly into a file, cf. `FPDF.set_streaming_output()`.
+
+    The content streams of finished pages are written by `flush_page()` while the document is built,
+    and only their offsets are kept in memory.
+    The deferred objects (page tree, resources, outline...) are written by `bufferize()`,
+    as well as the total number of pages rendered by the {nb} alias.
+    """
+
+    def __init__(self, fpdf, file):
+        super().__init__(fpdf)
+        self.buffer = StreamedPDFBuffer(file)
+        # The final PDF version is only known once the document is complete:
+        self._header_version = fpdf.pdf_version
+        self._out(PDFHeader(self._header_version).serialize())
+        # pairs of (object ID, TotalPagesSubstitutionFragment) of the {nb} alias streams not written yet:
+        self._deferred_substitutions = []
+
+    def __deepcopy__(self, memo):
+        # FPDFRecorder snapshots share the same file, as no page is flushed while recording:
+        return self
+
+    def _check_support(self):
+        if self.fpdf._security_handler or self.fpdf._sign_key:
+            raise FPDFException(
+                "Encryption & signature are not supported in streaming output mode"
+            )
+
+    def _write_content_stream(self, obj_id, contents):
+        "Write a content stream, compressed according to `FPDF.set_compression()`"
+        fpdf = self.fpdf
+        if fpdf.compress:
+            cs_obj = deflated_content_stream(
+                zlib.compress(contents, level=fpdf.compression_level)
+            )
+        else:
+            cs_obj = PDFContentStream(contents=contents)
+        cs_obj.id = obj_id
+        self.offsets[obj_id] = len(self.buffer)
+        with self._trace_size("pages"):
+            self._out(cs_obj.serialize())
+        return FlushedContentStream(obj_id)
+
+    def flush_page(self, page_obj):
+        """
+        Write the content stream of a finished page to the file, and release its memory.
+        The content of pages using the {nb} alias is written in several streams,
+        split around the alias placeholders, that are only rendered by `bufferize()`.
+        """
+        self._check_support()
+        substitutions = page_obj.get_text_substitutions()
+        if not substitutions:
+            self._build_content_streams([page_obj])
+            cs_obj = page_obj.contents
+            self.obj_id += 1
+            cs_obj.id = self.obj_id
+            self.offsets[cs_obj.id] = len(self.buffer)
+            with self._trace_size("pages"):
+                self._out(cs_obj.serialize())
+            page_obj.contents = FlushedContentStream(cs_obj.id)
+            return
+        fragments = {
+            frag.get_placeholder_string().encode("latin-1"): frag
+            for frag in substitutions
+        }
+        contents = bytes(page_obj.contents)
+        streams = FlushedContentStreams()
+        start = 0
+        for match in self.fpdf._TEXT_SUBSTITUTION_REGEX.finditer(contents):
+            if match[0] not in fragments:
+                continue
+            if match.start() > start:
+                self.obj_id += 1
+                streams.append(
+                    self._write_content_stream(
+                        self.obj_id, contents[start : match.start()]
+                    )
+                )
+            # The ID of the alias stream is reserved, it is written by bufferize():
+            self.obj_id += 1
+            streams.append(FlushedContentStream(self.obj_id))
+            self._deferred_substitutions.append((self.obj_id, fragments[match[0]]))
+            start = match.end()
+        if start < len(contents):
+            self.obj_id += 1
+            streams.append(self._write_content_stream(self.obj_id, contents[start:]))
+        page_obj.contents = streams
+        substitutions.clear()
+
+    def bufferize(self):
+        fpdf = self.fpdf
+        self._check_support()
+
+        # 1. Setup - Insert all remaining PDF objects
+        #    and assign unique consecutive numeric IDs to all of them
+        pdf_version = fpdf.pdf_version
+        if (
+            fpdf.viewer_preferences
+            and fpdf.viewer_preferences._min_pdf_version > pdf_version
+        ):
+            pdf_version = fpdf.viewer_preferences._min_pdf_version
+        if pdf_version != self._header_version:
+            file = self.buffer.file
+            position = file.tell()
+            file.seek(0)
+            file.write(PDFHeader(pdf_version).serialize().encode("latin-1"))
+            file.seek(position)
+        nb_pages = str(fpdf.pages_count)
+        for obj_id, frag in self._deferred_substitutions:
+            self._write_content_stream(
+                obj_id, frag.render_text_substitution(nb_pages).encode("latin-1")
+            )
+        self._deferred_substitutions.clear()
+        pages_root_obj = self._add_pages_root()
+        catalog_obj = self._add_catalog()
+        page_objs = self._add_pages()
+        sig_annotation_obj = self._add_annotations_as_objects()
+        for embedded_file in fpdf.embedded_files:
+            self._add_pdf_obj(embedded_file, "embedded_files")
+        self._insert_resources(page_objs)
+        struct_tree_root_obj = self._add_structure_tree()
+        outline_dict_obj, outline_items = self._add_document_outline()
+        xmp_metadata_obj = self._add_xmp_metadata()
+        info_obj = self._add_info()
+
+        xref = PDFXrefAndTrailer(self)
+        self.pdf_objs.append(xref)
+
+        # 2. Plumbing - Inject all PDF object references required:
+        pages_root_obj.kids = PDFArray(page_objs)
+        self._finalize_catalog(
+            catalog_obj,
+            pages_root_obj=pages_root_obj,
+            first_page_obj=page_objs[0],
+            sig_annotation_obj=sig_annotation_obj,
+            xmp_metadata_obj=xmp_metadata_obj,
+            struct_tree_root_obj=struct_tree_root_obj,
+            outline_dict_obj=outline_dict_obj,
+        )
+        dests = []
+        for page_obj in page_objs:
+            page_obj.parent = pages_root_obj
+            for annot in page_obj.annots:
+                page_dests = []
+                if annot.dest:
+                    page_dests.append(annot.dest)
+                if annot.a and hasattr(annot.a, "dest"):
+                    page_dests.append(annot.a.dest)
+                for dest in page_dests:
+                    if dest.page_number > len(page_objs):
+                        raise ValueError(
+                            f"Invalid reference to non-existing page {dest.page_number} present on page {page_obj.index()}: "
+                        )
+                dests.extend(page_dests)
+            if not page_obj.annots:
+                # Avoid serializing an empty PDFArray:
+                page_obj.annots = None
+        for outline_item in outline_items:
+            dests.append(outline_item.dest)
+        # Assigning the .page_ref property of all Destination objects:
+        for dest in dests:
+            dest.page_ref = pdf_ref(page_objs[dest.page_number - 1].id)
+        for struct_elem in fpdf.struct_builder.doc_struct_elem.k:
+            struct_elem.pg = page_objs[struct_elem.page_number() - 1]
+        xref.catalog_obj = catalog_obj
+        xref.info_obj = info_obj
+
+        # 3. Serializing - Append all remaining PDF objects to the file:
+        for pdf_obj in self.pdf_objs:
+            if isinstance(pdf_obj, PDFXrefAndTrailer):
+                trace_label = None
+            else:
+                self.offsets[pdf_obj.id] = len(self.buffer)
+                trace_label = self.trace_labels_per_obj_id.get(pdf_obj.id)
+            if trace_label:
+                with self._trace_size(trace_label):
+                    self._out(pdf_obj.serialize())
+            else:
+                self._out(pdf_obj.serialize())
+        self._log_final_sections_sizes()
+        return self.buffer
+
+
+class LayoutPassRecorder(FPDFRecorder):
+    """
+    Records the calls performed during a layout pass, cf. `FPDF.unbreakable(copy_free=True)`,
+    in order to replay them afterwards.
+    Contrary to its parent class, it does not snapshot the FPDF instance, and hence cannot rewind it.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self._calls = []
+
+    def rewind(self):
+        raise FPDFException("LayoutPassRecorder cannot be rewound")
+
+
 # Disabling this check due to the "format" parameter below:
 # pylint: disable=redefined-builtin
 def get_page_format(format, k=None):
@@ -212,6 +602,26 @@ def get_page_format(format, k=None):
         raise FPDFPageFormatException(f"Arguments must be numbers: {args}") from e
 
 
+def get_svg_cache_key(name):
+    """
+    Return the key under which a SVG image passed to `FPDF.image()` is cached:
+    a hash of its content for bytes & io.BytesIO, its path for files.
+    None is returned for raster images.
+    """
+    if isinstance(name, io.BytesIO):
+        name = name.getvalue()
+    if isinstance(name, bytes):
+        name = name.strip()
+        if not _is_svg(name):
+            return None
+        img_hash = hashlib.new("md5", usedforsecurity=False)  # nosec B324
+        img_hash.update(name)
+        return img_hash.hexdigest()
+    if str(name).endswith(".svg"):
+        return str(name)
+    return None
+
+
 def check_page(fn):
     """Decorator to protect drawing methods"""
 
@@ -237,8 +647,16 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
     MARKDOWN_LINK_UNDERLINE = True
     _GS_REGEX = re.compile(r"/(GS\d+) gs")
     _IMG_REGEX = re.compile(r"/I(\d+) Do")
+    # cf. TotalPagesSubstitutionFragment.get_placeholder_string():
+    _TEXT_SUBSTITUTION_REGEX = re.compile(rb"::placeholder:[0-9a-f-]{36}::")
 
     HTML2FPDF_CLASS = HTML2FPDF
+    SHARED_TTF_FONTS = False
+    """
+    Enable this to parse each TTF font file only once per process, instead of once per FPDF instance.
+    The parsed font tables are cached by file path & modification time,
+    while the glyphs subset embedded stays specific to each document.
+    """
 
     def __init__(
         self,
@@ -289,9 +707,18 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         self.links = {}  # array of Destination objects starting at index 1
         self.embedded_files = []  # array of PDFEmbeddedFile
         self.image_cache = ImageCache()
+        # map SVG cache keys to parsed SVG images, cf. get_svg_cache_key():
+        self._svg_cache = {}
+        # map SVG images, dimensions & starting graphics style to their rendered content stream:
+        self._svg_rendering_cache = {}
         self.in_footer = False  # flag set while rendering footer
         # indicates that we are inside an .unbreakable() code block:
         self._in_unbreakable = False
+        # indicates that we are inside an .offset_rendering() code block:
+        self._in_offset_rendering = False
+        # optional StreamingOutputProducer, cf. set_streaming_output():
+        self._streaming_output_producer = None
+        self._streaming_output_owns_file = False
         self._lasth = 0  # height of last cell printed
         self.alias_nb_pages()  # enable alias by default
 
@@ -368,11 +795,16 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         self._page_mode = None
         self.viewer_preferences = None  # optional instance of ViewerPreferences
         self.compress = True  # switch enabling pages content compression
+        self.compression_level = -1  # zlib level of pages content compression
+        # number of threads compressing pages content, None for DEFAULT_COMPRESSION_WORKERS:
+        self.compression_workers = None
         self.pdf_version = "1.3"  # Set default PDF version No.
         self.creation_date = datetime.now(timezone.utc)
         self._security_handler = None
         self._fallback_font_ids = []
         self._fallback_font_exact_match = False
+        # map (character, style) pairs to the result of get_fallback_font():
+        self._fallback_font_per_char = {}
 
         self._current_draw_context = None
         self._drawing_graphics_state_registry = GraphicsStateDictRegistry()
@@ -753,20 +1185,32 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         if self._page_layout in (PageLayout.TWO_PAGE_LEFT, PageLayout.TWO_PAGE_RIGHT):
             self._set_min_pdf_version("1.5")
 
-    def set_compression(self, compress):
+    def set_compression(self, compress, level=-1, workers=None):
         """
         Activates or deactivates page compression.
 
         When activated, the internal representation of each page is compressed
         using the zlib/deflate method (FlateDecode), which leads to a compression ratio
         of about 2 for the resulting document.
+        Pages are compressed concurrently when `FPDF.output()` is called.
 
         Page compression is enabled by default.
 
         Args:
             compress (bool): indicates if compression should be enabled
-        """
+            level (int): zlib compression level, from 0 (none) to 9 (best),
+                -1 being the zlib default, currently equivalent to 6
+            workers (int): number of threads used to compress the pages,
+                1 to compress them serially, None for DEFAULT_COMPRESSION_WORKERS.
+                The thread pools are created on first use, and shared by all documents.
+        """
+        if level not in range(-1, 10):
+            raise ValueError(f"Invalid compression level: {level}")
+        if workers is not None and workers < 1:
+            raise ValueError(f"Invalid number of compression workers: {workers}")
         self.compress = compress
+        self.compression_level = level
+        self.compression_workers = workers
 
     def set_title(self, title):
         """
@@ -925,6 +1369,41 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         """
         self.str_alias_nb_pages = alias
 
+    def set_streaming_output(self, name):
+        """
+        Writes the PDF document directly into a file while it is being built:
+        the content stream of each page is flushed to the file once the page is finished,
+        so that memory usage does not grow with the number of pages.
+        The document is completed by calling `FPDF.output()`, that then returns None.
+
+        This method must be called before adding any page.
+
+        Args:
+            name (str): file path or seekable binary file object where to save the PDF
+
+        Notes
+        -----
+
+        The pages reserved by `FPDF.insert_toc_placeholder()` are kept in memory
+        until `FPDF.output()` is called, as their content is only known at that time.
+        Only the alias defined with `FPDF.alias_nb_pages()` is deferred on the other pages:
+        their content is flushed in several streams, split around the alias.
+        Finished pages cannot be modified anymore, e.g. by setting `FPDF.page`.
+        Encryption and signature are not supported in this mode.
+        """
+        if self.page > 0:
+            raise FPDFException(
+                "set_streaming_output() must be called before adding any page"
+            )
+        if self._streaming_output_producer:
+            raise FPDFException("Streaming output has already been enabled")
+        if isinstance(name, (str, os.PathLike)):
+            file = open(name, "wb")  # pylint: disable=consider-using-with
+            self._streaming_output_owns_file = True
+        else:
+            file = name
+        self._streaming_output_producer = StreamingOutputProducer(self, file)
+
     @check_page
     def set_page_label(
         self,
@@ -1025,6 +1504,7 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         if self.page > 0 and (not self.in_toc_rendering or in_toc_extra_page):
             # Page footer
             self._render_footer()
+            self._flush_finished_page()
 
         current_page_label = (
             None if self.page == 0 else self.pages[self.page].get_page_label()
@@ -1104,6 +1584,41 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
             )
         # END Page header
 
+    def _substitute_text_placeholders(self):
+        "Replaces the placeholders of the {nb} alias, in a single pass per page"
+        nb_pages = str(self.pages_count)
+        for page in self.pages.values():
+            substitutions = page.get_text_substitutions()
+            if not substitutions:
+                continue
+            replacements = {
+                substitution_item.get_placeholder_string().encode(
+                    "latin-1"
+                ): substitution_item.render_text_substitution(nb_pages).encode("latin-1")
+                for substitution_item in substitutions
+            }
+            page.contents = self._TEXT_SUBSTITUTION_REGEX.sub(
+                lambda match: replacements.get(match[0], match[0]), page.contents
+            )
+
+    def _flush_finished_page(self):
+        "In streaming output mode, writes the content stream of the current page, that is finished"
+        producer = self._streaming_output_producer
+        if (
+            not producer
+            or self.in_toc_rendering
+            or self._in_unbreakable
+            or self._in_offset_rendering
+        ):
+            return
+        page_obj = self.pages[self.page]
+        if isinstance(page_obj.contents, FlushedContentStream):
+            return
+        tocp = self.toc_placeholder
+        if tocp and tocp.start_page <= self.page < tocp.start_page + tocp.pages:
+            return  # deferred until the ToC is rendered
+        producer.flush_page(page_obj)
+
     def _render_footer(self):
         self.in_footer = True
         if self.toc_placeholder:
@@ -1339,6 +1854,9 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         else:
             rendered = context.render(*render_args)
 
+        self._out_drawing(rendered)
+
+    def _out_drawing(self, rendered):
         for match in self._GS_REGEX.finditer(rendered):
             self._resource_catalog.add(
                 PDFResourceType.EXT_G_STATE, match.group(1), self.page
@@ -2146,7 +2664,48 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
             )
             return
 
-        self.fonts[fontkey] = TTFFont(self, font_file_path, fontkey, style)
+        if self.SHARED_TTF_FONTS:
+            self.fonts[fontkey] = self._get_shared_ttf_font(
+                font_file_path, fontkey, style
+            )
+        else:
+            self.fonts[fontkey] = TTFFont(self, font_file_path, fontkey, style)
+
+    def _get_shared_ttf_font(self, font_file_path, fontkey, style):
+        "Builds a TTFFont from the font tables parsed once per process, cf. FPDF.SHARED_TTF_FONTS"
+        font_file_path = font_file_path.resolve()
+        mtime = font_file_path.stat().st_mtime_ns
+        cached = _TTF_FONTS_CACHE.get(font_file_path)
+        if cached is None or cached[0] != mtime:
+            probe = ttLib.TTFont(font_file_path, fontNumber=0, lazy=True)
+            try:
+                needs_notdef = "glyf" in probe and ".notdef" not in probe["glyf"]
+            finally:
+                probe.close()
+            if needs_notdef:
+                # TTFFont adds a fallback .notdef glyph to its own fontTools.ttLib.TTFont:
+                return TTFFont(self, font_file_path, fontkey, style)
+            parsed_font = TTFFont(self, font_file_path, fontkey, style)
+            parsed_font.close()
+            cached = _TTF_FONTS_CACHE[font_file_path] = (
+                mtime,
+                {attr: getattr(parsed_font, attr) for attr in _SHARED_TTF_FONT_ATTRS},
+            )
+        font = TTFFont.__new__(TTFFont)
+        for attr, value in cached[1].items():
+            setattr(font, attr, value)
+        # The font descriptor is completed & numbered when the document is output:
+        font.desc = copy.copy(font.desc)
+        font.i = len(self.fonts) + 1
+        font.fontkey = fontkey
+        font.emphasis = TextEmphasis.coerce(style)
+        # The TTFont is subset in place when the document is output, hence it cannot be shared:
+        font.ttfont = ttLib.TTFont(
+            font.ttffile, recalcTimestamp=False, fontNumber=0, lazy=True
+        )
+        font.missing_glyphs = []
+        font.subset = SubsetMap(font)
+        return font
 
     def set_font(self, family=None, style: Union[str, TextEmphasis] = "", size=0):
         """
@@ -2322,6 +2881,7 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
                 )
         self._fallback_font_ids = tuple(fallback_font_ids)
         self._fallback_font_exact_match = exact_match
+        self._fallback_font_per_char = {}
 
     def add_link(self, y=0, x=0, page=-1, zoom="null"):
         """
@@ -3645,7 +4205,9 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         if self.strikethrough:
             prev_font_style += "S"
         styled_txt_frags = tuple(self._parse_chars(text, markdown))
-        if markdown:
+        if markdown and any(
+            frag.font_style != self.font_style for frag in styled_txt_frags
+        ):
             page = self.page
             # We set the current to page to zero so that
             # set_font() does not produce any text object on the stream buffer:
@@ -3675,6 +4237,14 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         This method can be overridden to provide more control than the `select_mode` parameter
         of `FPDF.set_fallback_fonts()` provides.
         """
+        cache_key = (char, style)
+        if cache_key not in self._fallback_font_per_char:
+            self._fallback_font_per_char[cache_key] = self._find_fallback_font(
+                char, style
+            )
+        return self._fallback_font_per_char[cache_key]
+
+    def _find_fallback_font(self, char, style):
         emphasis = TextEmphasis.coerce(style)
         fonts_with_char = [
             font_id
@@ -3693,6 +4263,29 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
             return None
         return fonts_with_char[0]
 
+    def _is_plain_text(self, text, markdown):
+        """
+        Indicates if some ASCII text does not require any fragment split by `FPDF._parse_chars()`:
+        no markdown marker or link, no text substitution alias and no glyph missing from the current font.
+        """
+        if not text.isascii():
+            return False
+        if markdown and (
+            self.MARKDOWN_ESCAPE_CHARACTER in text
+            or "[" in text
+            or self.MARKDOWN_BOLD_MARKER in text
+            or self.MARKDOWN_ITALICS_MARKER in text
+            or self.MARKDOWN_STRIKETHROUGH_MARKER in text
+            or self.MARKDOWN_UNDERLINE_MARKER in text
+        ):
+            return False
+        if self.str_alias_nb_pages and self.str_alias_nb_pages in text:
+            return False
+        if self.is_ttf_font:
+            font_glyphs = self.current_font.cmap
+            return all(char == "\n" or ord(char) in font_glyphs for char in text)
+        return True
+
     def _parse_chars(self, text: str, markdown: bool) -> Iterator[Fragment]:
         "Split text into fragments"
         if not markdown and not self.text_shaping and not self._fallback_font_ids:
@@ -3714,6 +4307,14 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
 
             yield Fragment(text, self._get_current_graphics_state(), self.k)
             return
+        if text and self._is_plain_text(text, markdown):
+            # Fast path, producing the same single fragment as the loop below:
+            gstate = self._get_current_graphics_state()
+            gstate["font_style"] = self.font_style
+            gstate["strikethrough"] = bool(self.strikethrough)
+            gstate["underline"] = bool(self.underline)
+            yield Fragment(text, gstate, self.k)
+            return
         txt_frag, in_bold, in_italics, in_strikethrough, in_underline = (
             [],
             "B" in self.font_style,
@@ -3953,6 +4554,28 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
             # restore writing function:
             del self._out
 
+    @contextmanager
+    def _discarding_layout_pass_changes(self):
+        """
+        Disables writing like `FPDF._disable_writing()`,
+        and also discards the document-level entries added meanwhile:
+        text substitutions, outline sections & structure elements.
+        """
+        page = self.pages[self.page]
+        substitutions_count = len(page.get_text_substitutions())
+        outline_count = len(self._outline)
+        struct_elems = self.struct_builder.doc_struct_elem.k
+        struct_elems_count = len(struct_elems)
+        with self._disable_writing():
+            yield
+        del page.get_text_substitutions()[substitutions_count:]
+        del self._outline[outline_count:]
+        if len(struct_elems) > struct_elems_count:
+            discarded = struct_elems[struct_elems_count:]
+            del struct_elems[struct_elems_count:]
+            for elems in self.struct_builder.struct_tree_root.parent_tree.nums.values():
+                elems[:] = [elem for elem in elems if elem not in discarded]
+
     @check_page
     @support_deprecated_txt_arg
     def multi_cell(
@@ -4501,7 +5124,13 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
                 stacklevel=get_stack_level(),
             )
 
-        name, img, info = preload_image(self.image_cache, name, dims)
+        svg_cache_key = get_svg_cache_key(name)
+        if svg_cache_key in self._svg_cache:
+            name, img, info = self._svg_cache[svg_cache_key]
+        else:
+            name, img, info = preload_image(self.image_cache, name, dims)
+            if svg_cache_key:
+                self._svg_cache[svg_cache_key] = name, img, info
         if isinstance(info, VectorImageInfo):
             return self._vector_image(
                 name, img, info, x, y, w, h, link, title, alt_text, keep_aspect_ratio
@@ -4650,23 +5279,46 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         if not isinstance(x, Number):
             x = self.x_by_align(x, w, h, info, keep_aspect_ratio)
 
-        _, _, path = svg.transform_to_rect_viewport(
-            scale=1, width=w, height=h, ignore_svg_top_attrs=True
+        if self._current_draw_context is not None:
+            raise FPDFException(
+                "cannot create a drawing context while one is already open"
+            )
+        # The SVG paths are converted once per size & starting style,
+        # then translated to the image position:
+        rendering_key = (
+            svg,
+            w,
+            h,
+            self.h,
+            self.draw_color,
+            self.fill_color,
+            self.line_width,
+            tuple(self.dash_pattern.values()),
+            self.allow_images_transparency,
         )
-        path.transform = path.transform @ Transform.translation(x, y)
-
-        old_x, old_y = self.x, self.y
-        try:
-            self.set_xy(0, 0)
-            if title or alt_text:
-                # Alt text of vector graphics does NOT show as tool-tip in viewers, but should
-                # be processed by screen readers.
-                with self._marked_sequence(title=title, alt_text=alt_text):
-                    self.draw_path(path)
-            else:
-                self.draw_path(path)
-        finally:
-            self.set_xy(old_x, old_y)
+        rendered = self._svg_rendering_cache.get(rendering_key)
+        if rendered is None:
+            _, _, path = svg.transform_to_rect_viewport(
+                scale=1, width=w, height=h, ignore_svg_top_attrs=True
+            )
+            context = DrawingContext()
+            context.add_item(path)
+            rendered = context.render(
+                self._drawing_graphics_state_registry,
+                Point(0, 0),
+                self.k,
+                self.h,
+                self._current_graphic_style(),
+            )
+            self._svg_rendering_cache[rendering_key] = rendered
+        rendered = f"q 1 0 0 1 {x * self.k:.2f} {-y * self.k:.2f} cm {rendered} Q"
+        if title or alt_text:
+            # Alt text of vector graphics does NOT show as tool-tip in viewers, but should
+            # be processed by screen readers.
+            with self._marked_sequence(title=title, alt_text=alt_text):
+                self._out_drawing(rendered)
+        else:
+            self._out_drawing(rendered)
         if link:
             self.link(x, y, w, h, link)
 
@@ -5058,8 +5710,12 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         # > The second byte string shall be a changing identifier
         # > based on the file’s contents at the time it was last updated.
         # > When a file is first written, both identifiers shall be set to the same value.
-        id_hash = hashlib.new("md5", usedforsecurity=False)  # nosec B324
-        id_hash.update(buffer)
+        if isinstance(buffer, StreamedPDFBuffer):
+            # The file contents have been hashed while being written:
+            id_hash = buffer.hash.copy()
+        else:
+            id_hash = hashlib.new("md5", usedforsecurity=False)  # nosec B324
+            id_hash.update(buffer)
         if self.creation_date:
             id_hash.update(self.creation_date.strftime("%Y%m%d%H%M%S").encode("utf8"))
         hash_hex = id_hash.hexdigest().upper()
@@ -5289,18 +5945,40 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
             yield
 
     @contextmanager
-    def unbreakable(self):
+    def unbreakable(self, copy_free=False):
         """
         Ensures that all rendering performed in this context appear on a single page
         by performing page break beforehand if need be.
 
+        Args:
+            copy_free (bool): instead of snapshotting the whole document,
+                perform a layout pass with writing disabled to measure the block height,
+                then render the recorded calls. The calls are thus always performed twice.
+
         Notes
         -----
 
-        Using this method means to duplicate the FPDF `bytearray` buffer:
+        Unless `copy_free` is set, using this method means to duplicate the FPDF `bytearray` buffer:
         when generating large PDFs, doubling memory usage may be troublesome.
         """
         prev_page, prev_y = self.page, self.y
+        if copy_free:
+            recorder = LayoutPassRecorder(self)
+            recorder.page_break_triggered = False
+            self._in_unbreakable = True
+            LOGGER.debug("Starting unbreakable block layout pass")
+            with self._discarding_layout_pass_changes():
+                yield recorder
+                final_page, final_y = self.page, self.y
+            y_scroll = final_y - prev_y + (final_page - prev_page) * self.eph
+            if prev_y + y_scroll > self.page_break_trigger or final_page > prev_page:
+                LOGGER.debug("Performing page jump due to unbreakable height")
+                self._perform_page_break()
+                recorder.page_break_triggered = True
+            recorder.replay()
+            self._in_unbreakable = False
+            LOGGER.debug("Ending unbreakable block")
+            return
         recorder = FPDFRecorder(self, accept_page_break=False)
         recorder.page_break_triggered = False
         self._in_unbreakable = True
@@ -5328,6 +6006,7 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         prev_page, prev_y = self.page, self.y
         recorder = FPDFRecorder(self, accept_page_break=False)
         recorder.page_break_triggered = False
+        self._in_offset_rendering = True
         yield recorder
         y_scroll = recorder.y - prev_y + (recorder.page - prev_page) * self.eph
         if prev_y + y_scroll > self.page_break_trigger or recorder.page > prev_page:
@@ -5603,7 +6282,11 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
         table.render()
 
     def output(
-        self, name="", dest="", linearize=False, output_producer_class=OutputProducer
+        self,
+        name="",
+        dest="",
+        linearize=False,
+        output_producer_class=ConcurrentOutputProducer,
     ):
         """
         Output PDF to some destination.
@@ -5612,6 +6295,8 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
 
         By default the bytearray buffer is returned.
         If a `name` is given, the PDF is written to a new file.
+        In streaming output mode, cf. `FPDF.set_streaming_output()`,
+        the PDF is completed in its file and None is returned.
 
         Args:
             name (str): optional File object or file path where to save the PDF under
@@ -5627,6 +6312,13 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
                 DeprecationWarning,
                 stacklevel=get_stack_level(),
             )
+        streaming_producer = self._streaming_output_producer
+        if streaming_producer and (
+            name or linearize or output_producer_class is not ConcurrentOutputProducer
+        ):
+            raise FPDFException(
+                "name, linearize & output_producer_class cannot be used in streaming output mode"
+            )
         # Clear cache of cached functions to free up memory after output
         get_unicode_script.cache_clear()
         # Finish document if necessary:
@@ -5639,20 +6331,18 @@ class FPDF(GraphicsStateMixin, TextRegionMixin):
             if self.toc_placeholder:
                 self._insert_table_of_contents()
             if self.str_alias_nb_pages:
-                for page in self.pages.values():
-                    for substitution_item in page.get_text_substitutions():
-                        page.contents = page.contents.replace(
-                            substitution_item.get_placeholder_string().encode(
-                                "latin-1"
-                            ),
-                            substitution_item.render_text_substitution(
-                                str(self.pages_count)
-                            ).encode("latin-1"),
-                        )
+                self._substitute_text_placeholders()
+            if streaming_producer:
+                self.buffer = streaming_producer.bufferize()
+                if self._streaming_output_owns_file:
+                    streaming_producer.buffer.file.close()
+                return None
             if linearize:
-                output_producer_class = LinearizedOutputProducer
+                output_producer_class = LinearizedConcurrentOutputProducer
             output_producer = output_producer_class(self)
             self.buffer = output_producer.bufferize()
+        if streaming_producer:
+            return None
         if name:
             if isinstance(name, os.PathLike):
                 name.write_bytes(self.buffer)
@@ -0,0 +1,355 @@
+"""
+Benchmarks of the FPDF hot paths used by the PDF report (cf. 5.pdfgeneration.py).
+
+Each case builds a synthetic document sized like a real voyage report
+(about 30 days of noon reports, 7 charts) and times one operation on it.
+
+    python fpdf_benchmarks.py                               # run all cases
+    python fpdf_benchmarks.py cell table                    # run some cases
+    python fpdf_benchmarks.py --save-baseline baseline.json
+    python fpdf_benchmarks.py --baseline baseline.json      # exits with 1 on regression
+    python fpdf_benchmarks.py --profile multi_cell          # cProfile of one case
+
+The `fpdf` package imported is the one the app uses, i.e. the vendored `fpdf2 .py`
+when it is installed as fpdf/fpdf.py.
+"""
+import argparse
+import cProfile
+import gc
+import io
+import json
+import logging
+import pstats
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from fpdf import FPDF
+
+NOON_REPORTS = 30 * 8  # 30 days, one report every 3 hours
+CHARTS = 7  # charts of the weather analysis & graphs pages
+# matplotlib SVG <style> & <metadata> tags are not supported, and ignored:
+logging.getLogger('fpdf.svg').setLevel(logging.ERROR)
+
+COLUMNS = ['Date', 'Time', 'Speed (kn)', 'Distance (nm)', 'HFO (mt)', 'MGO (mt)', 'Wind (BF)', 'Wave (m)']
+
+
+# ==================== SYNTHETIC REPORT DATA ====================
+def noon_report_rows(count=NOON_REPORTS):
+    rng = random.Random(42)
+    rows = []
+    for i in range(count):
+        rows.append([
+            f"2024-05-{1 + i // 8:02d}",
+            f"{(i % 8) * 3:02d}:00",
+            f"{rng.uniform(10, 14):.1f}",
+            f"{rng.uniform(30, 42):.1f}",
+            f"{rng.uniform(3, 5):.2f}",
+            f"{rng.uniform(0, 0.3):.2f}",
+            str(rng.randint(2, 7)),
+            f"{rng.uniform(0.5, 4):.1f}",
+        ])
+    return rows
+
+
+def report_paragraph(i):
+    return (
+        f"Leg {i}: the vessel maintained an average speed over ground of {11 + i % 3}.{i % 10} knots "
+        "under good weather conditions (wind force up to BF 4, significant wave height below 1.25 m). "
+        "Fuel consumption and speed are compared against the charterparty warranted figures, "
+        "excluding periods of adverse weather, current effects and slow steaming ordered by charterers."
+    )
+
+
+def chart_figures(count=CHARTS):
+    rng = random.Random(7)
+    figures = []
+    for i in range(count):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.plot(range(NOON_REPORTS), [rng.uniform(10, 14) for _ in range(NOON_REPORTS)], label='Speed')
+        ax.plot(range(NOON_REPORTS), [rng.uniform(3, 5) for _ in range(NOON_REPORTS)], label='Consumption')
+        ax.set_title(f"Chart {i + 1}")
+        ax.legend()
+        ax.grid(True)
+        figures.append(fig)
+    return figures
+
+
+def figure_bytes(fig, fmt):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=150)
+    return buffer.getvalue()
+
+
+_charts = {}
+
+
+def charts(fmt):
+    # Rendering the figures is not part of the benchmarks, it is done once per format:
+    if fmt not in _charts:
+        figures = chart_figures()
+        _charts[fmt] = [figure_bytes(fig, fmt) for fig in figures]
+        for fig in figures:
+            plt.close(fig)
+    return _charts[fmt]
+
+
+def new_pdf():
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font('Arial', '', 10)
+    return pdf
+
+
+def full_report():
+    pdf = new_pdf()
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, "Charterparty Performance Report", new_x='LMARGIN', new_y='NEXT', align='C')
+    pdf.set_font('Arial', '', 10)
+    for i in range(20):
+        pdf.multi_cell(0, 5, report_paragraph(i), new_x='LMARGIN', new_y='NEXT')
+    with pdf.table() as table:
+        table.row(COLUMNS)
+        for data_row in noon_report_rows():
+            table.row(data_row)
+    for svg in charts('svg'):
+        pdf.image(svg, w=pdf.epw)
+    pdf.cell(0, 10, "Page {nb}")
+    return pdf
+
+
+# ==================== BENCHMARK CASES ====================
+# Each case performs its setup, then returns the function to be timed.
+def bench_cell():
+    pdf = new_pdf()
+    rows = noon_report_rows()
+
+    def run():
+        for data_row in rows:
+            for value in data_row:
+                pdf.cell(pdf.epw / len(COLUMNS), 6, value, border=1)
+            pdf.ln()
+    return run
+
+
+def bench_multi_cell():
+    pdf = new_pdf()
+
+    def run():
+        for i in range(200):
+            pdf.multi_cell(0, 5, report_paragraph(i), new_x='LMARGIN', new_y='NEXT')
+    return run
+
+
+def bench_table():
+    pdf = new_pdf()
+    rows = noon_report_rows()
+
+    def run():
+        with pdf.table() as table:
+            table.row(COLUMNS)
+            for data_row in rows:
+                table.row(data_row)
+    return run
+
+
+def bench_get_string_width():
+    pdf = new_pdf()
+    texts = [value for data_row in noon_report_rows() for value in data_row]
+    texts += [report_paragraph(i) for i in range(100)]
+
+    def run():
+        for _ in range(10):
+            for text in texts:
+                pdf.get_string_width(text)
+    return run
+
+
+def bench_image_raster():
+    pdf = new_pdf()
+    images = charts('png')
+
+    def run():
+        for png in images:
+            pdf.image(io.BytesIO(png), w=pdf.epw)
+    return run
+
+
+def bench_image_vector():
+    pdf = new_pdf()
+    images = charts('svg')
+
+    def run():
+        for svg in images:
+            pdf.image(io.BytesIO(svg), w=pdf.epw)
+    return run
+
+
+def bench_text_columns():
+    pdf = new_pdf()
+
+    def run():
+        with pdf.text_columns(ncols=2, gutter=5) as cols:
+            for i in range(150):
+                cols.write(report_paragraph(i))
+                cols.ln()
+    return run
+
+
+def bench_output():
+    pdf = full_report()
+    return pdf.output
+
+
+def bench_output_linearize():
+    pdf = full_report()
+    return lambda: pdf.output(linearize=True)
+
+
+def bench_output_uncompressed():
+    pdf = full_report()
+    pdf.set_compression(False)
+    return pdf.output
+
+
+def bench_barcodes():
+    pdf = new_pdf()
+
+    def run():
+        for i in range(100):
+            y = 10 + (i % 25) * 11
+            if i and i % 25 == 0:
+                pdf.add_page()
+            pdf.code39(f"*VOY-{i:05d}*", x=10, y=y, w=1, h=8)
+            pdf.interleaved2of5(f"{9300000 + i:07d}", x=120, y=y, w=0.5, h=8)
+    return run
+
+
+CASES = {
+    'cell': bench_cell,
+    'multi_cell': bench_multi_cell,
+    'table': bench_table,
+    'get_string_width': bench_get_string_width,
+    'image_raster': bench_image_raster,
+    'image_vector': bench_image_vector,
+    'text_columns': bench_text_columns,
+    'output': bench_output,
+    'output_linearize': bench_output_linearize,
+    'output_uncompressed': bench_output_uncompressed,
+    'barcodes': bench_barcodes,
+}
+
+
+# ==================== MEASUREMENTS ====================
+def measure_time(case, repeat):
+    timings = []
+    for _ in range(repeat + 1):  # the first run is a warm-up
+        run = case()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return timings[1:]
+
+
+def measure_peak_memory(case):
+    # Measured in a separate run, as tracing memory allocations slows everything down:
+    run = case()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(names, repeat):
+    results, failures = {}, {}
+    for name in names:
+        try:
+            timings = measure_time(CASES[name], repeat)
+            peak_kb = measure_peak_memory(CASES[name]) / 1024
+        except Exception as e:
+            failures[name] = f"{type(e).__name__}: {e}"
+            print(f"{name:<22} FAILED {failures[name]}")
+            continue
+        results[name] = {
+            'median_s': statistics.median(timings),
+            'min_s': min(timings),
+            'peak_kb': peak_kb,
+        }
+        print(f"{name:<22} median {results[name]['median_s'] * 1000:9.1f} ms"
+              f"   min {results[name]['min_s'] * 1000:9.1f} ms"
+              f"   peak {results[name]['peak_kb']:10.0f} KB")
+    return results, failures
+
+
+def find_regressions(results, failures, baseline, tolerance):
+    regressions = []
+    for name, error in failures.items():
+        if name in baseline:
+            regressions.append(f"{name}: {error}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ('median_s', 'peak_kb'):
+            limit = baseline[name][metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(f"{name}: {metric} {result[metric]:.4g} > {limit:.4g} "
+                                   f"(baseline {baseline[name][metric]:.4g} + {tolerance:.0%})")
+    return regressions
+
+
+def profile(name, top):
+    run = CASES[name]()
+    profiler = cProfile.Profile()
+    profiler.runcall(run)
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('cases', nargs='*', help=f"cases to run, all by default: {', '.join(CASES)}")
+    parser.add_argument('--repeat', type=int, default=5, help="number of timed runs per case")
+    parser.add_argument('--save-baseline', metavar='PATH', help="save the results as a JSON baseline")
+    parser.add_argument('--baseline', metavar='PATH', help="compare the results to a JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed increase over the baseline before failing, 0.25 by default")
+    parser.add_argument('--profile', metavar='CASE', choices=list(CASES), help="print a cProfile report of a case")
+    parser.add_argument('--top', type=int, default=25, help="number of functions listed by --profile")
+    args = parser.parse_args(argv)
+    unknown_cases = set(args.cases) - set(CASES)
+    if unknown_cases:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown_cases))}")
+
+    if args.profile:
+        profile(args.profile, args.top)
+        return 0
+
+    results, failures = run_benchmarks(args.cases or list(CASES), args.repeat)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(results, failures, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
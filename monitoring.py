@@ -0,0 +1,54 @@
+"""
+Rolling good weather performance of every vessel, to follow hull & engine degradation.
+
+The good weather distance, steaming time and ME fuel of the noon reports are
+summed per day when the results of a voyage are saved (cf. VoyageStore), and
+the rolling sums over the last MONITORING_WINDOWS days are kept per vessel &
+day. Saving a voyage only recomputes the windows of the days it can change, from
+its first report to the end of the last window including its last one, so the
+trend lines are read from the precomputed windows without rescanning the history.
+
+    store.rolling_performance(imo, 30)      # day, good_speed & good_fo_day over the 30 days up to each day
+"""
+import pandas as pd
+
+from voyage_calculations import weather_columns
+from voyage_index import TIMESTAMP_COLUMN
+
+# Lengths of the rolling windows (days)
+MONITORING_WINDOWS = [30, 90]
+
+DAILY_COLUMNS = ['good_distance', 'good_time', 'good_fuel']
+
+
+def daily_good_weather(df):
+    """The good weather distance, time and fuel of classified noon reports, per day of their timestamps"""
+    if TIMESTAMP_COLUMN not in df.columns:
+        return pd.DataFrame(columns=DAILY_COLUMNS, index=pd.DatetimeIndex([], name='day'))
+    days = pd.to_datetime(df[TIMESTAMP_COLUMN], errors='coerce').dt.normalize().rename('day')
+    good = (df['day_status'] == 'GOOD WEATHER DAY') & days.notna()
+    return weather_columns(df[good])[DAILY_COLUMNS].fillna(0).groupby(days[good]).sum()
+
+
+def affected_days(first_day, last_day):
+    """The days whose windows include a day from `first_day` to `last_day`"""
+    return first_day, last_day + pd.Timedelta(days=max(MONITORING_WINDOWS) - 1)
+
+
+def rolling_windows(daily, first_day, last_day):
+    """
+    The rolling sums of every window length at the days of `daily` (the daily sums of a vessel,
+    from at least the longest window before `first_day`) from `first_day` to `last_day`
+    """
+    windows = []
+    for window in MONITORING_WINDOWS:
+        rolled = daily.sort_index().rolling(f'{window}D').sum()
+        rolled = rolled[(rolled.index >= first_day) & (rolled.index <= last_day)]
+        windows.append(rolled.assign(window=window))
+    return pd.concat(windows).reset_index()
+
+
+def window_performance(windows):
+    """Good weather speed & FO/day of rolling sums"""
+    time = windows['good_time'].where(windows['good_time'] > 0)
+    return windows.assign(good_speed=windows['good_distance'] / time, good_fo_day=windows['good_fuel'] / time * 24)
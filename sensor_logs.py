@@ -0,0 +1,223 @@
+"""
+Auto-logged sensor data of the vessels, resampled into noon report equivalent rows.
+
+Auto-loggers record a vessel every 1 to 15 minutes: millions of samples per
+vessel & year, where the calculations expect a noon report a day. Each sample
+(cf. SAMPLE_RATES) covers the time until the next sample of its vessel, up to
+MAX_SAMPLE_GAP_HOURS (longer gaps are logger outages, and are not counted), and
+is classified as good or bad weather at its own resolution, with the weather
+definitions of the voyage. The samples at sea are then summed per vessel, time
+bucket (an hour, or noon to noon) and weather class in one groupby: a bucket
+gives a good and a bad weather row, whose distance, time & fuel are exactly
+those of their samples, so the weather sums of the calculations are those of
+the samples (cf. voyage_calculations.weather_sums()). The rows keep the highest
+Beaufort number & wave height of their samples, so classifying them again with
+the same definitions gives the same class.
+
+CSV files are read in chunks of CHUNK_SIZE samples: only the partial sums of
+the buckets, and the last sample of each vessel, are kept from a chunk to the
+next. The samples of a vessel must be in chronological order across the chunks.
+Excel files cannot be read in chunks, and are read whole. read_voyage_file()
+tells noon report files from sensor logs, for the app and the workers alike.
+
+    python sensor_logs.py logger.csv noon_reports.csv                  # noon to noon rows
+    python sensor_logs.py logger.csv hourly.csv --interval hourly --max-beaufort 4
+"""
+import argparse
+import itertools
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from voyage_calculations import CONSUMERS, VESSEL_COLUMNS, good_weather, read_noon_reports, vessel_keys
+from voyage_index import TIMESTAMP_COLUMN
+
+# Columns of the samples logged as rates, and the noon report quantity they are integrated into (rate x hours x factor)
+SAMPLE_RATES = {
+    'speed_over_ground': ('distance_travelled_actual', 1.0),    # knots
+    'me_fuel_rate': ('me_fuel_consumed', 1 / 24),               # MT/day
+}
+# Consumption rate of a consumer & fuel grade (MT/day), e.g. me_vlsfo_rate
+RATE_COLUMN = re.compile(rf"({'|'.join(CONSUMERS)})_(\w+)_rate")
+
+# Lower wind speed (knots) of the Beaufort numbers 1 to 12, for samples logging the wind speed instead
+BEAUFORT_WIND_SPEEDS = [1, 4, 7, 11, 17, 22, 28, 34, 41, 48, 56, 64]
+
+# Slower samples are drifting, at anchor or alongside, and are left out as noon reports only cover sea passages
+MIN_STEAMING_SPEED = 3.0
+
+# Longer gaps between two samples of a vessel are logger outages
+MAX_SAMPLE_GAP_HOURS = 1.0
+
+HOURLY = 'hourly'
+NOON = 'noon'
+INTERVALS = [HOURLY, NOON]
+
+CHUNK_SIZE = 1_000_000
+
+
+def is_sensor_log(columns):
+    """Whether a file holds auto-logged samples rather than noon reports"""
+    return 'event_type' not in columns and {TIMESTAMP_COLUMN, 'speed_over_ground'} <= set(columns)
+
+
+def beaufort_numbers(wind_speeds):
+    """The Beaufort number of wind speeds in knots (NaN if unknown)"""
+    speeds = pd.to_numeric(wind_speeds, errors='coerce')
+    numbers = np.searchsorted(BEAUFORT_WIND_SPEEDS, speeds.to_numpy(), side='right')
+    return pd.Series(numbers, index=speeds.index, dtype=float).where(speeds.notna())
+
+
+def bucket_ends(timestamps, interval):
+    """The end of the interval of every timestamp: the next full hour, or the next noon"""
+    if interval == HOURLY:
+        return timestamps.dt.floor('h') + pd.Timedelta(hours=1)
+    return (timestamps - pd.Timedelta(hours=12)).dt.floor('D') + pd.Timedelta(hours=36)
+
+
+def sample_hours(samples):
+    """
+    Sorts the samples of every vessel by time, and adds the hours they cover until the next sample
+    of their vessel. Returns those samples, and the last sample of each vessel, whose next one is not known yet.
+    """
+    timestamps = pd.to_datetime(samples[TIMESTAMP_COLUMN], errors='coerce')
+    samples = samples.assign(**{TIMESTAMP_COLUMN: timestamps})[timestamps.notna()]
+    vessels = pd.factorize(vessel_keys(samples))[0]
+    times = samples[TIMESTAMP_COLUMN].to_numpy(dtype='datetime64[ns]').view('int64')
+    order = np.lexsort((times, vessels))
+    samples, vessels, times = samples.iloc[order].reset_index(drop=True), vessels[order], times[order]
+
+    last = np.append(vessels[1:] != vessels[:-1], True)
+    hours = np.append(np.diff(times) / 3.6e12, np.nan)
+    samples['hours'] = np.where((hours > 0) & (hours <= MAX_SAMPLE_GAP_HOURS), hours, np.nan)
+    return samples[~last], samples[last].drop(columns='hours')
+
+
+def vessel_column(columns):
+    """The column identifying the vessel of the samples, if any"""
+    return next((column for column in VESSEL_COLUMNS if column in columns), None)
+
+
+def bucket_sums(samples, weather_definitions, interval):
+    """
+    The distance, time and fuel of samples (cf. sample_hours()) per vessel, interval and weather class,
+    with the highest Beaufort number & wave height and the number of their samples
+    """
+    hours = samples['hours']
+    speeds = pd.to_numeric(samples['speed_over_ground'], errors='coerce')
+    weather = pd.DataFrame({
+        'beaufort_number': pd.to_numeric(samples['beaufort_number'], errors='coerce') if 'beaufort_number' in samples.columns
+        else beaufort_numbers(samples['wind_speed']),
+        'significant_wave_height': pd.to_numeric(samples['significant_wave_height'], errors='coerce'),
+    })
+    quantities = {'steaming_time_hrs': hours}
+    for column, (quantity, factor) in SAMPLE_RATES.items():
+        if column in samples.columns:
+            quantities[quantity] = pd.to_numeric(samples[column], errors='coerce') * hours * factor
+    for column in samples.columns:
+        match = RATE_COLUMN.fullmatch(str(column))
+        if match and match.group(2) != 'fuel':
+            quantities[f'{match.group(1)}_{match.group(2)}_consumed'] = \
+                pd.to_numeric(samples[column], errors='coerce') * hours / 24
+    rows = pd.DataFrame(quantities).join(weather).assign(samples=1)
+
+    at_sea = hours.notna() & (speeds >= MIN_STEAMING_SPEED)
+    keys = [bucket_ends(samples[TIMESTAMP_COLUMN], interval), good_weather(weather, weather_definitions).rename('good')]
+    column = vessel_column(samples.columns)
+    if column:
+        keys.insert(0, samples[column])
+    return rows[at_sea].groupby([key[at_sea] for key in keys]).agg(aggregations(rows.columns))
+
+
+def aggregations(columns):
+    """Quantities & sample counts are summed, the weather of the samples is kept at its worst"""
+    return {column: 'max' if column in ('beaufort_number', 'significant_wave_height') else 'sum' for column in columns}
+
+
+def resample_samples(chunks, weather_definitions=None, interval=NOON):
+    """
+    Resamples auto-logged samples into noon report equivalent rows: one good and one bad weather row
+    per vessel & interval, with the summed distance, time & fuel of the samples classified in each.
+    `chunks` is a DataFrame of samples, or an iterable of consecutive chunks of them (e.g. read_sensor_log()).
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown resampling interval: {interval}")
+    weather_definitions = weather_definitions or {}
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks.iloc[start:start + CHUNK_SIZE] for start in range(0, len(chunks), CHUNK_SIZE)]
+
+    partial_sums, carried = [], None
+    for chunk in chunks:
+        missing_columns = {TIMESTAMP_COLUMN, 'speed_over_ground', 'significant_wave_height'} - set(chunk.columns)
+        if not {'beaufort_number', 'wind_speed'} & set(chunk.columns):
+            missing_columns.add('beaufort_number')
+        if missing_columns:
+            raise ValueError(f"Missing sensor log columns: {', '.join(sorted(missing_columns))}")
+        if carried is not None:
+            chunk = pd.concat([carried, chunk], ignore_index=True)
+        samples, carried = sample_hours(chunk)
+        partial_sums.append(bucket_sums(samples, weather_definitions, interval))
+    if not partial_sums:
+        raise ValueError("The sensor log contains no samples")
+
+    # Buckets spanning several chunks are summed again
+    sums = pd.concat(partial_sums)
+    rows = sums.groupby(level=list(range(sums.index.nlevels))).agg(aggregations(sums.columns)).reset_index()
+    rows.insert(0, 'event_type', 'NOON AT SEA')
+    rows['day_status'] = np.where(rows.pop('good'), 'GOOD WEATHER DAY', 'BAD WEATHER DAY')
+    return rows
+
+
+def read_sensor_log(source, name=None, chunksize=CHUNK_SIZE):
+    """The samples of a CSV or Excel file, in chunks (CSV files are read a chunk at a time)"""
+    name = source if name is None else name
+    if name.endswith('.csv'):
+        return pd.read_csv(source, chunksize=chunksize)
+    return read_noon_reports(source, name)
+
+
+def as_noon_reports(rows, weather_definitions=None):
+    """
+    The noon reports of an uploaded file: `rows` is a DataFrame, or chunks of it (cf. read_sensor_log()).
+    Auto-logged samples are resampled noon to noon, other files must hold noon reports.
+    """
+    chunks = iter([rows] if isinstance(rows, pd.DataFrame) else rows)
+    first = next(chunks, None)
+    if first is not None and is_sensor_log(first.columns):
+        # Auto-logged samples are classified one by one, then summed into noon to noon rows
+        return resample_samples(itertools.chain([first], chunks), weather_definitions)
+    if first is None or 'event_type' not in first.columns:
+        raise ValueError("The uploaded file does not contain the required columns. Please check your data format.")
+    other_chunks = list(chunks)
+    return pd.concat([first, *other_chunks], ignore_index=True) if other_chunks else first
+
+
+def read_voyage_file(source, name=None, weather_definitions=None, chunksize=CHUNK_SIZE):
+    """
+    The noon reports of a CSV or Excel file: a path, or a file object and its name. Sensor logs are resampled
+    noon to noon, CSV ones a chunk at a time, so that only the rows of a chunk are held in memory at once.
+    """
+    return as_noon_reports(read_sensor_log(source, name, chunksize), weather_definitions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', help="CSV or Excel file of auto-logged samples")
+    parser.add_argument('output', help="CSV file of the resampled noon report equivalent rows")
+    parser.add_argument('--interval', choices=INTERVALS, default=NOON, help=f"resampling interval, {NOON} by default")
+    parser.add_argument('--max-beaufort', type=int, default=5, help="good weather Beaufort number, 5 by default")
+    parser.add_argument('--max-wave-height', type=float, default=2.0, help="good weather wave height (m), 2.0 by default")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f"samples read at a time, {CHUNK_SIZE} by default")
+    args = parser.parse_args(argv)
+
+    weather_definitions = {'max_beaufort': args.max_beaufort, 'max_wave_height': args.max_wave_height}
+    rows = resample_samples(read_sensor_log(args.log, chunksize=args.chunk_size), weather_definitions, args.interval)
+    rows.to_csv(args.output, index=False)
+    print(f"{rows['samples'].sum()} samples resampled into {len(rows)} rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
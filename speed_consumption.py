@@ -0,0 +1,112 @@
+"""
+Speed-consumption curves of the vessels, fitted on their good weather noon reports.
+
+Each vessel & loading condition (laden / ballast) gets an admiralty style curve
+
+    consumption per day = coefficient * speed ** exponent
+
+fitted by least squares on log(consumption) = log(coefficient) + exponent * log(speed).
+The normal equations of all the curves of the fleet are built with a single
+groupby, and solved as one batch. The fitted coefficients are saved in the
+voyage store, so the warranted consumption is scaled to the actual good
+weather speed of a voyage without refitting:
+
+    warranted consumption at speed = warranted_consumption * (speed / warranted_speed) ** exponent
+
+    python speed_consumption.py             # refits the curves of the vessels with results computed since their last fit
+    python speed_consumption.py --full      # refits the curves of the whole fleet
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from voyage_calculations import vessel_keys
+
+# Column of the loading condition of the noon reports, reports without one are fitted under ALL_CONDITIONS
+CONDITION_COLUMN = 'loading_condition'
+ALL_CONDITIONS = 'ALL'
+
+# Fewer good weather reports do not make a meaningful curve
+MIN_REPORTS = 5
+
+
+def curve_points(df):
+    """The speed and daily consumption of the good weather reports, with their vessel & loading condition"""
+    good = df[df['day_status'] == 'GOOD WEATHER DAY']
+    hours = good['steaming_time_hrs']
+    points = pd.DataFrame({
+        'imo': vessel_keys(good).astype(str),
+        'condition': good[CONDITION_COLUMN].fillna(ALL_CONDITIONS).str.upper() if CONDITION_COLUMN in good.columns
+        else ALL_CONDITIONS,
+        'speed': good['distance_travelled_actual'] / hours,
+        'consumption': good['me_fuel_consumed'] / hours * 24,
+    })
+    valid = (points['speed'] > 0) & (points['consumption'] > 0) & np.isfinite(points['speed']) & np.isfinite(points['consumption'])
+    return points[valid]
+
+
+def fit_curves(points):
+    """
+    Fits the curve of every (imo, condition) of `points` (cf. curve_points()).
+    Returns a DataFrame of their coefficient, exponent, number of reports and R².
+    """
+    x = np.log(points['speed'])
+    y = np.log(points['consumption'])
+    sums = pd.DataFrame({'n': 1.0, 'x': x, 'y': y, 'xx': x * x, 'xy': x * y, 'yy': y * y}) \
+        .groupby([points['imo'], points['condition']]).sum()
+    determinant = sums['n'] * sums['xx'] - sums['x'] ** 2
+    sums = sums[(sums['n'] >= MIN_REPORTS) & (determinant > 1e-12 * sums['n'] ** 2)]
+
+    # Normal equations of every curve, [[n, Σx], [Σx, Σx²]] · [log(coefficient), exponent] = [Σy, Σxy]
+    lhs = np.stack([sums[['n', 'x']].to_numpy(), sums[['x', 'xx']].to_numpy()], axis=1)
+    rhs = sums[['y', 'xy']].to_numpy()[:, :, np.newaxis]
+    solution = np.linalg.solve(lhs, rhs)[:, :, 0] if len(sums) else np.empty((0, 2))
+
+    covariance = sums['n'] * sums['xy'] - sums['x'] * sums['y']
+    variance_y = sums['n'] * sums['yy'] - sums['y'] ** 2
+    models = pd.DataFrame({
+        'coefficient': np.exp(solution[:, 0]),
+        'exponent': solution[:, 1],
+        'reports': sums['n'].astype(int),
+        'r_squared': (covariance ** 2 / ((sums['n'] * sums['xx'] - sums['x'] ** 2) * variance_y)).where(variance_y > 0),
+    }, index=sums.index)
+    return models.reset_index()
+
+
+def warranted_consumption_at(speed, cp_data, exponent):
+    """The warranted daily consumption, scaled from the warranted speed to `speed` along a fitted curve"""
+    warranted_speed = cp_data.get('warranted_speed', 13.0)
+    warranted_consumption = cp_data.get('warranted_consumption', 19.9)
+    return warranted_consumption * (speed / warranted_speed) ** exponent
+
+
+def refit_fleet(store, full=False):
+    """
+    Refits the curves of the vessels with results computed since their last fit, or of all of them if `full`,
+    from the noon reports of their saved voyages, and saves them. Returns the curves fitted, if any.
+    """
+    imos = None if full else store.vessels_to_refit()
+    if imos == []:
+        return None
+    points = [curve_points(df.assign(imo=imo)) for imo, df in store.saved_noon_reports(imos)]
+    models = fit_curves(pd.concat(points, ignore_index=True)) if points else None
+    store.save_speed_models(models, imos)
+    return models
+
+
+def main(argv=None):
+    from voyage_store import DEFAULT_PATH, VoyageStore
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=DEFAULT_PATH, help=f"voyage store, {DEFAULT_PATH} by default")
+    parser.add_argument('--full', action='store_true', help="refit all the vessels, not only those with new results")
+    args = parser.parse_args(argv)
+    models = refit_fleet(VoyageStore(args.store), args.full)
+    print("No curve refitted" if models is None else models.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import math
+
+import pandas as pd
+import pytest
+
+from emissions import cii_ratings, ets_exposure, is_eu_port
+
+
+@pytest.mark.parametrize('vessel_type, dwt, year, a, c, capacity, reduction, ratio, rating', [
+    ('Bulk Carrier', 60000, 2024, 4745, 0.622, 60000, 7, 0.90, 'B'),
+    # The capacity of the largest bulk carriers is capped
+    ('Bulk Carrier', 300000, 2025, 4745, 0.622, 279000, 9, 0.85, 'A'),
+    ('Oil Tanker', 110000, 2023, 5247, 0.610, 110000, 5, 1.00, 'C'),
+    ('Container Ship', 80000, 2026, 1984, 0.489, 80000, 11, 1.10, 'D'),
+    ('Gas Carrier', 70000, 2024, 14405e7, 2.071, 70000, 7, 1.50, 'E'),
+    ('Gas Carrier', 50000, 2024, 8104, 0.639, 50000, 7, 0.94, 'B'),
+])
+def test_cii_ratings(vessel_type, dwt, year, a, c, capacity, reduction, ratio, rating):
+    required = a * capacity ** -c * (1 - reduction / 100)
+    yearly = pd.DataFrame([{'type': vessel_type, 'dwt': dwt, 'year': str(year), 'total_distance': 10000.0,
+                            'co2_emissions': ratio * required * capacity * 10000.0 / 1e6}])
+    row = cii_ratings(yearly).iloc[0]
+    assert row['capacity'] == capacity
+    assert row['required_cii'] == pytest.approx(required)
+    assert row['cii_ratio'] == pytest.approx(ratio)
+    assert row['cii_rating'] == rating
+
+
+def test_cii_of_an_unknown_type_is_not_rated():
+    yearly = pd.DataFrame([{'type': 'Tug', 'dwt': 500, 'year': '2024', 'total_distance': 1000.0,
+                            'co2_emissions': 100.0}])
+    row = cii_ratings(yearly).iloc[0]
+    assert math.isnan(row['attained_cii'])
+    assert pd.isna(row['cii_rating'])
+
+
+def test_is_eu_port():
+    ports = pd.Series(['NLRTM', 'no svg', 'USNYC', None, 'DEHAM', 'NO'])
+    assert is_eu_port(ports).tolist() == [True, True, False, False, True, False]
+
+
+@pytest.mark.parametrize('from_port, to_port, cosp_date, share', [
+    ('NLRTM', 'DEHAM', '2024-03-01', 1.0 * 0.4),
+    ('NLRTM', 'USNYC', '2025-03-01', 0.5 * 0.7),
+    ('CNSHA', 'GRPIR', '2026-03-01', 0.5),
+    ('NLRTM', 'DEHAM', '2027-03-01', 1.0),
+    ('CNSHA', 'USNYC', '2024-03-01', 0.0),
+    # Before the scheme covered shipping
+    ('NLRTM', 'DEHAM', '2023-03-01', 0.0),
+])
+def test_ets_exposure(from_port, to_port, cosp_date, share):
+    voyages = pd.DataFrame([{'from_port': from_port, 'to_port': to_port, 'cosp_date': cosp_date,
+                             'co2_emissions': 1000.0}])
+    row = ets_exposure(voyages, eua_price=80.0).iloc[0]
+    assert row['ets_co2'] == pytest.approx(1000.0 * share)
+    assert row['ets_cost'] == pytest.approx(80.0 * 1000.0 * share)
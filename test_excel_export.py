@@ -0,0 +1,42 @@
+import openpyxl
+import pytest
+
+from excel_export import VoyageWorkbook
+from voyage_calculations import SUMMARY_METRICS, calculate_voyage
+
+VESSEL_DATA = {'name': 'MV Example', 'imo': '9300001'}
+VOYAGE_DATA = {'voyage_no': 'V001', 'from_port': 'NLRTM', 'to_port': 'USNYC', 'cosp_date': '2024-05-01'}
+EXCLUSION_PERIODS = [{'start_date': '2024-05-03', 'start_time': '06:00:00', 'end_date': '2024-05-03',
+                      'end_time': '18:00:00', 'reason': 'Drifting'}]
+
+
+def export(tmp_path, results, cp_data):
+    path = tmp_path / 'voyages.xlsx'
+    with VoyageWorkbook(str(path)) as workbook:
+        workbook.add_voyage(VESSEL_DATA, VOYAGE_DATA, cp_data, EXCLUSION_PERIODS, results)
+    return openpyxl.load_workbook(path, read_only=True)
+
+
+def test_voyage_is_written_on_every_sheet(tmp_path, make_noon_reports, weather_definitions):
+    cp_data = {'charterer': 'Alpha', 'warranted_speed': 12.5}
+    df = make_noon_reports()
+    results = calculate_voyage(df, cp_data, weather_definitions)
+    workbook = export(tmp_path, results, cp_data)
+
+    header, voyage = list(workbook['Voyage Summary'].values)
+    row = dict(zip(header, voyage))
+    assert (row['Vessel'], row['Voyage No'], row['Charterer']) == ('MV Example', 'V001', 'Alpha')
+    for metric, key, decimals in SUMMARY_METRICS:
+        assert row[metric] == pytest.approx(results[key] if decimals is None else round(results[key], decimals))
+    # Only the reports kept by the calculations
+    assert len(list(workbook['Noon Reports'].values)) == 1 + len(results['df'])
+    assert list(workbook['Exclusions'].values)[1][-1] == 'Drifting'
+
+
+def test_infinite_metrics_are_blank_cells(tmp_path, make_noon_reports, weather_definitions):
+    # No speed range below the warranted speed: the maximum time at warranted speed is infinite
+    cp_data = {'warranted_speed': 0.5, 'speed_tolerance_knots': 0.5}
+    results = calculate_voyage(make_noon_reports(), cp_data, weather_definitions)
+    assert results['max_time'] == float('inf')
+    header, voyage = list(export(tmp_path, results, cp_data)['Voyage Summary'].values)
+    assert dict(zip(header, voyage))["Max Time @ Warranted Spd (hrs)"] is None
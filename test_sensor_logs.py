@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sensor_logs import MIN_STEAMING_SPEED, as_noon_reports, beaufort_numbers, read_voyage_file, resample_samples
+from voyage_calculations import calculate_voyage
+from voyage_queue import InProcessQueue, Worker
+
+CP_DATA = {'warranted_speed': 12.5, 'warranted_consumption': 20.0}
+
+
+@pytest.fixture
+def samples():
+    """Two vessels logged every 10 minutes for 5 days, with a logger outage and a stop at anchor"""
+    rng = np.random.default_rng(0)
+    logs = []
+    for imo in ('111', '222'):
+        dates = pd.date_range('2024-01-01 00:05', periods=5 * 144, freq='10min')
+        speeds = rng.uniform(10, 15, len(dates))
+        speeds[300:330] = 0.5
+        log = pd.DataFrame({
+            'imo': imo,
+            'date': dates,
+            'speed_over_ground': speeds,
+            'me_fuel_rate': rng.uniform(18, 22, len(dates)),
+            'wind_speed': rng.uniform(0, 35, len(dates)),
+            'significant_wave_height': rng.uniform(0, 3, len(dates)),
+        })
+        logs.append(log.drop(index=range(500, 520)))
+    # Interleaved vessels, in chronological order
+    return pd.concat(logs).sort_values('date', kind='stable', ignore_index=True)
+
+
+def expected_sums(samples):
+    """Distance, time & fuel of every sample until the next one of its vessel, if logged within the hour"""
+    samples = samples.sort_values(['imo', 'date'])
+    hours = samples.groupby('imo')['date'].diff(-1).dt.total_seconds().abs() / 3600
+    at_sea = (hours <= 1) & (samples['speed_over_ground'] >= MIN_STEAMING_SPEED)
+    return {
+        'steaming_time_hrs': hours[at_sea].sum(),
+        'distance_travelled_actual': (samples['speed_over_ground'] * hours)[at_sea].sum(),
+        'me_fuel_consumed': (samples['me_fuel_rate'] * hours / 24)[at_sea].sum(),
+    }
+
+
+def test_resampled_rows_keep_the_sums_of_the_samples(samples, weather_definitions):
+    rows = resample_samples(samples, weather_definitions)
+    for column, value in expected_sums(samples).items():
+        assert rows[column].sum() == pytest.approx(value), column
+    assert set(rows['day_status']) == {'GOOD WEATHER DAY', 'BAD WEATHER DAY'}
+    # Classifying the rows again gives the class of their samples
+    assert calculate_voyage(rows, CP_DATA, weather_definitions)['df']['day_status'].tolist() == \
+        rows['day_status'].tolist()
+
+
+def test_chunks_give_the_rows_of_the_whole_log(samples, weather_definitions, tmp_path):
+    path = tmp_path / 'logger.csv'
+    samples.to_csv(path, index=False)
+    chunked = read_voyage_file(str(path), weather_definitions=weather_definitions, chunksize=137)
+    whole = resample_samples(pd.read_csv(path), weather_definitions)
+    pd.testing.assert_frame_equal(chunked, whole, check_exact=False)
+
+
+def test_beaufort_numbers():
+    speeds = pd.Series([0, 0.9, 1, 10.9, 11, 63.9, 64, 80, np.nan])
+    assert beaufort_numbers(speeds).tolist()[:-1] == [0, 0, 1, 3, 4, 11, 12, 12]
+    assert np.isnan(beaufort_numbers(speeds).iloc[-1])
+
+
+def test_noon_reports_are_returned_unchanged(make_noon_reports):
+    df = make_noon_reports()
+    assert as_noon_reports(df) is df
+    with pytest.raises(ValueError, match="required columns"):
+        as_noon_reports(df.drop(columns='event_type'))
+
+
+def test_worker_resamples_sensor_logs(samples, weather_definitions, tmp_path):
+    path = tmp_path / 'logger.csv'
+    samples.to_csv(path, index=False)
+    payload = {'file': str(path), 'rows': None, 'vessel_data': {}, 'voyage_data': {}, 'cp_data': CP_DATA,
+               'weather_definitions': weather_definitions, 'exclusion_periods': []}
+    metrics = Worker(InProcessQueue()).process(payload)['metrics']
+    assert metrics['total_time'] == pytest.approx(expected_sums(samples)['steaming_time_hrs'])
@@ -0,0 +1,33 @@
+import pytest
+
+from uncertainty import BOOTSTRAPPED_METRICS, bootstrap_intervals
+from voyage_calculations import calculate_voyage
+
+CP_DATA = {'warranted_speed': 12.5, 'warranted_consumption': 20.0}
+
+
+def test_intervals_contain_the_point_estimates(make_noon_reports, weather_definitions):
+    results = calculate_voyage(make_noon_reports(days=90), CP_DATA, weather_definitions)
+    intervals = bootstrap_intervals(results['df'], CP_DATA, resamples=2000, seed=0)
+    assert list(intervals.index) == BOOTSTRAPPED_METRICS
+    for metric in ('good_speed', 'good_fo_day', 'entire_voyage_good_weather_based'):
+        assert intervals.loc[metric, 'lower'] <= results[metric] <= intervals.loc[metric, 'upper'], metric
+    assert intervals.equals(bootstrap_intervals(results['df'], CP_DATA, resamples=2000, seed=0))
+
+
+def test_quarantined_reports_are_not_drawn(make_noon_reports, weather_definitions):
+    df = make_noon_reports(days=90)
+    # A distance typo on a good weather day
+    good_day = df.index[(df['event_type'] == 'NOON AT SEA') & (df['beaufort_number'] <= 4)
+                        & (df['significant_wave_height'] <= 2.0)][10]
+    df.loc[good_day, 'distance_travelled_actual'] *= 10
+    results = calculate_voyage(df, CP_DATA, weather_definitions, quarantine=True)
+    assert results['df'].loc[good_day, 'quarantined']
+    intervals = bootstrap_intervals(results['df'], CP_DATA, resamples=2000, seed=0)
+    assert intervals.loc['good_speed', 'lower'] <= results['good_speed'] <= intervals.loc['good_speed', 'upper']
+    assert intervals.loc['good_speed', 'upper'] < 14
+
+
+def test_no_good_weather_report(make_noon_reports):
+    results = calculate_voyage(make_noon_reports(), CP_DATA, {'max_beaufort': 0, 'max_wave_height': 0})
+    assert bootstrap_intervals(results['df'], CP_DATA, resamples=100).isna().all().all()
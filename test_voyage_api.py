@@ -0,0 +1,76 @@
+import json
+import math
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('httpx')
+from starlette.testclient import TestClient
+
+import voyage_api
+from voyage_calculations import SUMMARY_METRICS, calculate_voyage
+
+CP_DATA = {'warranted_speed': 12.5, 'warranted_consumption': 20.0}
+
+
+@pytest.fixture
+def client():
+    voyage_api.cache = voyage_api.ResponseCache()
+    return TestClient(voyage_api.app)
+
+
+@pytest.fixture
+def two_legs(make_noon_reports):
+    """Two passages of a vessel, the second one without any good weather report"""
+    first = make_noon_reports(seed=1, days=20)
+    second = make_noon_reports(seed=2, days=10, start='2024-08-01 12:00').assign(beaufort_number=7)
+    return pd.concat([first, second], ignore_index=True)
+
+
+def post_json(client, df, weather_definitions):
+    rows = json.loads(df.to_json(orient='records', date_format='iso'))
+    return client.post('/calculations', json={'noon_reports': rows, 'cp_data': CP_DATA,
+                                              'weather_definitions': weather_definitions})
+
+
+def test_legs_are_serialized_as_json(client, two_legs, weather_definitions):
+    response = post_json(client, two_legs, weather_definitions)
+    assert response.status_code == 200
+    legs = response.json()['legs']
+    expected = calculate_voyage(two_legs, CP_DATA, weather_definitions)['legs']
+    assert [leg['leg'] for leg in legs] == [1, 2]
+    assert [leg['imo'] for leg in legs] == ['9300001', '9300001']
+    for leg, (_, expected_leg) in zip(legs, expected.iterrows()):
+        for _, key, _ in SUMMARY_METRICS:
+            value = expected_leg[key]
+            assert leg[key] == (None if math.isnan(value) or math.isinf(value) else pytest.approx(value)), key
+
+
+def test_metrics_are_those_of_the_whole_file(client, two_legs, weather_definitions):
+    content = post_json(client, two_legs, weather_definitions).json()
+    results = calculate_voyage(two_legs, CP_DATA, weather_definitions)
+    for _, key, _ in SUMMARY_METRICS:
+        assert content['metrics'][key] == pytest.approx(results[key]), key
+    assert [row['metric'] for row in content['summary']] == [metric for metric, _, _ in SUMMARY_METRICS]
+
+
+def test_csv_request_and_cache(client, two_legs):
+    params = {'warranted_speed': 12.5, 'warranted_consumption': 20.0, 'max_beaufort': 4}
+    body = two_legs.to_csv(index=False)
+    first = client.post('/calculations', params=params, content=body, headers={'content-type': 'text/csv'})
+    second = client.post('/calculations', params=params, content=body, headers={'content-type': 'text/csv'})
+    assert first.status_code == 200
+    assert (first.headers['x-cache'], second.headers['x-cache']) == ('miss', 'hit')
+    assert first.json() == second.json()
+
+
+def test_bad_requests(client, two_legs):
+    missing = client.post('/calculations', json={'noon_reports': [{'event_type': 'NOON AT SEA'}]})
+    assert missing.status_code == 422
+    assert 'distance_travelled_actual' in missing.json()['error']
+    invalid = client.post('/calculations', params={'warranted_speed': 'fast'}, content=two_legs.to_csv(index=False),
+                          headers={'content-type': 'text/csv'})
+    assert invalid.status_code == 400
+    unsupported = client.post('/calculations', content=b'<xml/>', headers={'content-type': 'application/xml'})
+    assert unsupported.status_code == 415
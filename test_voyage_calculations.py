@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from voyage_calculations import CO2_FACTORS, SUMMARY_METRICS, calculate_voyage, flag_anomalies
+
+
+def leg_reports(distances):
+    """A leg of one vessel: a COSP with no steaming hours, then a noon report a day at about 12 knots"""
+    return pd.DataFrame({
+        'imo': '9000001',
+        'event_type': ['COSP'] + ['NOON AT SEA'] * (len(distances) - 1),
+        'distance_travelled_actual': distances,
+        'steaming_time_hrs': [0] + [24] * (len(distances) - 1),
+        'me_fuel_consumed': [0] + [30] * (len(distances) - 1),
+    })
+
+
+def test_flag_anomalies_leg_start_typo_only_flags_the_typo():
+    df = flag_anomalies(leg_reports([0, 288, 290, 2900, 286, 289, 291]))
+    assert df['anomaly'].notna().tolist() == [False, False, False, True, False, False, False]
+    assert df.loc[3, 'anomaly'] == 'speed off neighbours'
+
+
+def test_flag_anomalies_typo_of_the_first_report_of_a_leg():
+    df = flag_anomalies(leg_reports([0, 2880, 290, 288, 286, 289]))
+    assert df['anomaly'].notna().tolist() == [False, True, False, False, False, False]
+
+
+def test_flag_anomalies_missing_figures_and_hours():
+    df = leg_reports([0, 288, 290, np.nan, 286])
+    df.loc[2, 'steaming_time_hrs'] = 0
+    df.loc[4, 'steaming_time_hrs'] = 30
+    anomalies = flag_anomalies(df)['anomaly']
+    assert anomalies[2] == 'zero steaming hours'
+    assert anomalies[3] == 'missing figures'
+    assert anomalies[4] == 'too many steaming hours'
+
+
+def page_formulas(df, cp_data, weather_definitions):
+    """The figures of the Calculations page as they were computed before the vectorised performance_metrics()"""
+    df = df[df['event_type'].isin(['NOON AT SEA', 'COSP', 'EOSP'])]
+    good = (df['beaufort_number'] <= weather_definitions['max_beaufort']) & \
+           (df['significant_wave_height'] <= weather_definitions['max_wave_height'])
+    good_days, bad_days = df[good], df[~good]
+
+    total_distance = df['distance_travelled_actual'].sum()
+    total_time = df['steaming_time_hrs'].sum()
+    good_distance = good_days['distance_travelled_actual'].sum()
+    good_time = good_days['steaming_time_hrs'].sum()
+    good_fuel = good_days['me_fuel_consumed'].sum()
+    good_speed = good_distance / good_time if good_time else 0
+    good_fo_hr = good_fuel / good_time if good_time else 0
+    good_fo_day = good_fo_hr * 24
+    bad_distance = bad_days['distance_travelled_actual'].sum()
+    bad_time = bad_days['steaming_time_hrs'].sum()
+
+    warranted_speed = cp_data.get('warranted_speed', 13.0)
+    warranted_consumption = cp_data.get('warranted_consumption', 19.9)
+    fuel_tolerance_mt = warranted_consumption * (cp_data.get('fuel_tolerance_percent', 5.0) / 100)
+    speed_tolerance_knots = cp_data.get('speed_tolerance_knots', 0.5)
+
+    entire_voyage = (total_distance / good_speed) * (good_fo_day / 24) if good_speed else 0
+    adjusted_speed = good_speed
+    if good_speed > warranted_speed + speed_tolerance_knots:
+        adjusted_speed = warranted_speed + speed_tolerance_knots
+    elif good_speed < warranted_speed - speed_tolerance_knots:
+        adjusted_speed = warranted_speed - speed_tolerance_knots
+    max_warranted_cons = (total_distance / adjusted_speed) * ((warranted_consumption + fuel_tolerance_mt) / 24)
+    min_warranted_cons = (total_distance / adjusted_speed) * ((warranted_consumption - fuel_tolerance_mt) / 24)
+    time_at_good_spd = total_distance / adjusted_speed
+    max_time = total_distance / (warranted_speed - speed_tolerance_knots)
+    min_time = total_distance / (warranted_speed + speed_tolerance_knots)
+    return {
+        'total_distance': total_distance,
+        'total_time': total_time,
+        'voyage_avg_speed': total_distance / total_time if total_time else 0,
+        'good_distance': good_distance,
+        'good_time': good_time,
+        'good_speed': good_speed,
+        'good_fuel': good_fuel,
+        'good_fo_hr': good_fo_hr,
+        'good_fo_day': good_fo_day,
+        'bad_distance': bad_distance,
+        'bad_time': bad_time,
+        'bad_fuel': bad_days['me_fuel_consumed'].sum(),
+        'bad_speed': bad_distance / bad_time if bad_time else 0,
+        'total_fuel': df['me_fuel_consumed'].sum(),
+        'entire_voyage_good_weather_based': entire_voyage,
+        'max_warranted_cons': max_warranted_cons,
+        'min_warranted_cons': min_warranted_cons,
+        'fuel_overconsumption': max(entire_voyage - max_warranted_cons, 0),
+        'fuel_saving': max(min_warranted_cons - entire_voyage, 0),
+        'time_at_good_spd': time_at_good_spd,
+        'max_time': max_time,
+        'min_time': min_time,
+        'time_gained': max(max_time - time_at_good_spd, 0),
+        'time_lost': max(time_at_good_spd - min_time, 0),
+    }
+
+
+# The good weather speed of the test voyage is about 12.8 knots: above, within and below the warranted speed range
+@pytest.mark.parametrize('cp_data', [
+    {'warranted_speed': 11.0, 'warranted_consumption': 19.0},
+    {'warranted_speed': 13.0, 'warranted_consumption': 21.0, 'speed_tolerance_knots': 0.5},
+    {'warranted_speed': 14.0, 'warranted_consumption': 19.9, 'fuel_tolerance_percent': 3.0},
+])
+def test_performance_metrics_match_the_page_formulas(make_noon_reports, weather_definitions, cp_data):
+    df = make_noon_reports()
+    results = calculate_voyage(df, cp_data, weather_definitions)
+    for key, value in page_formulas(df, cp_data, weather_definitions).items():
+        assert results[key] == pytest.approx(value), key
+
+
+def test_calculate_legs_match_each_leg_computed_alone(make_noon_reports, weather_definitions):
+    cp_data = {'warranted_speed': 12.0, 'warranted_consumption': 20.0}
+    first, second = make_noon_reports(seed=1), make_noon_reports(seed=2, start='2024-08-01 12:00')
+    legs = calculate_voyage(pd.concat([first, second], ignore_index=True), cp_data, weather_definitions)['legs']
+    assert legs['leg'].tolist() == [1, 2]
+    for leg, df in zip(legs.itertuples(), [first, second]):
+        expected = calculate_voyage(df, cp_data, weather_definitions)
+        for _, key, _ in SUMMARY_METRICS:
+            assert getattr(leg, key) == pytest.approx(expected[key]), key
+
+
+def test_co2_of_the_fuel_grades():
+    df = pd.DataFrame({
+        'event_type': ['NOON AT SEA'] * 2,
+        'distance_travelled_actual': [300.0, 290.0],
+        'steaming_time_hrs': [24.0, 24.0],
+        'me_vlsfo_consumed': [20.0, 10.0],
+        'ae_mgo_consumed': [2.0, 1.0],
+        'beaufort_number': [3, 6],
+        'significant_wave_height': [1.0, 3.0],
+    })
+    results = calculate_voyage(df, {}, {'max_beaufort': 4, 'max_wave_height': 2.0})
+    assert results['total_fuel'] == pytest.approx(30.0)
+    assert results['co2_emissions'] == pytest.approx(30.0 * CO2_FACTORS['VLSFO'] + 3.0 * CO2_FACTORS['MGO'])
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from voyage_calculations import SUMMARY_METRICS, calculate_voyage
+from voyage_index import VoyageIndex, exclusion_windows, merge_windows
+
+CP_DATA = {'warranted_speed': 12.5, 'warranted_consumption': 20.0}
+
+
+def assert_metrics_equal(metrics, results):
+    for _, key, _ in SUMMARY_METRICS:
+        assert metrics[key] == pytest.approx(results[key]), key
+
+
+def test_window_metrics_match_calculate_voyage(make_noon_reports, weather_definitions):
+    df = make_noon_reports()
+    index = VoyageIndex(calculate_voyage(df, CP_DATA, weather_definitions)['df'])
+    start, end = pd.Timestamp('2024-05-10 12:00'), pd.Timestamp('2024-06-05 12:00')
+    window = df[(df['date'] >= start) & (df['date'] <= end)]
+    assert_metrics_equal(index.metrics(CP_DATA, start, end), calculate_voyage(window, CP_DATA, weather_definitions))
+
+
+def test_exclusions_match_calculate_voyage_without_their_reports(make_noon_reports, weather_definitions):
+    df = make_noon_reports()
+    index = VoyageIndex(calculate_voyage(df, CP_DATA, weather_definitions)['df'])
+    # Overlapping periods, the second one running past the end of the window
+    exclusions = exclusion_windows([
+        {'start_date': '2024-05-05', 'start_time': '00:00:00', 'end_date': '2024-05-09', 'end_time': '00:00:00'},
+        {'start_date': '2024-05-07', 'start_time': '00:00:00', 'end_date': '2024-05-12', 'end_time': '12:00:00'},
+    ])
+    end = pd.Timestamp('2024-05-11 12:00')
+    kept = df[(df['date'] <= end) & ~df['date'].between('2024-05-05', '2024-05-12 12:00')]
+    assert_metrics_equal(index.metrics(CP_DATA, end=end, exclusions=exclusions),
+                         calculate_voyage(kept, CP_DATA, weather_definitions))
+
+
+def test_empty_window(make_noon_reports, weather_definitions):
+    index = VoyageIndex(calculate_voyage(make_noon_reports(), CP_DATA, weather_definitions)['df'])
+    sums = index.window_sums('2025-01-01', '2024-01-01')
+    assert (sums == 0).all()
+
+
+def test_merge_windows():
+    assert merge_windows([(5, 8), (1, 3), (2, 4), (8, 9)]) == [[1, 4], [5, 9]]
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from voyage_calculations import calculate_voyage
+from voyage_queue import DONE, FAILED, CalculationJobs, InProcessQueue, JobFailed, SQLiteQueue, Worker
+from voyage_store import VoyageStore
+
+CP_DATA = {'warranted_speed': 12.5, 'warranted_consumption': 20.0}
+
+
+@pytest.fixture(params=['in_process', 'sqlite'])
+def queue(request, tmp_path):
+    return InProcessQueue() if request.param == 'in_process' else SQLiteQueue(str(tmp_path / 'cp_jobs.db'))
+
+
+def test_worker_computes_queued_voyages(queue, make_noon_reports, weather_definitions, tmp_path):
+    jobs = CalculationJobs(queue)
+    df = make_noon_reports()
+    path = tmp_path / 'V001.csv'
+    df.to_csv(path, index=False)
+    rows = json.loads(make_noon_reports(seed=1).to_json(orient='records', date_format='iso'))
+    from_file = jobs.submit(file=str(path), vessel_data={'imo': '9300001'}, voyage_data={'voyage_no': 'V001'},
+                            cp_data=CP_DATA, weather_definitions=weather_definitions)
+    from_rows = jobs.submit(rows=rows, cp_data=CP_DATA, weather_definitions=weather_definitions)
+    failing = jobs.submit(rows=[{'event_type': 'NOON AT SEA'}], cp_data=CP_DATA)
+
+    store = VoyageStore(str(tmp_path / 'cp_performance.db'))
+    assert Worker(queue, store).run_once(timeout=0) == 3
+    assert (jobs.status(from_file), jobs.status(from_rows), jobs.status(failing)) == (DONE, DONE, FAILED)
+
+    result = jobs.result(from_file)
+    expected = calculate_voyage(df, CP_DATA, weather_definitions)
+    assert result['metrics']['good_speed'] == pytest.approx(expected['good_speed'])
+    assert store.load_voyage('9300001', 'V001') is not None
+    assert jobs.result(from_rows)['voyage_id'] is None
+    with pytest.raises(JobFailed):
+        jobs.result(failing)
+    store.close()
+
+
+def test_submit_needs_a_file_or_rows(queue):
+    with pytest.raises(ValueError):
+        CalculationJobs(queue).submit(file='V001.csv', rows=[])
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from voyage_calculations import calculate_voyage
+from voyage_store import FLEET_AGGREGATES, VoyageStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = VoyageStore(str(tmp_path / 'cp_performance.db'))
+    yield store
+    store.close()
+
+
+def aggregate_tables(store):
+    tables = {}
+    for table, keys, _, _ in FLEET_AGGREGATES:
+        tables[table] = pd.read_sql_query(f"SELECT * FROM {table}", store.connection).sort_values(keys,
+                                                                                                ignore_index=True)
+    return tables
+
+
+def save(store, make_noon_reports, weather_definitions, imo, voyage_no, charterer, cosp_date, seed, results=True):
+    cp_data = {'charterer': charterer, 'warranted_speed': 12.5, 'warranted_consumption': 20.0}
+    df = make_noon_reports(seed=seed, imo=imo, start=f'{cosp_date} 12:00')
+    return store.save_voyage(
+        {'imo': imo, 'name': f'MV {imo}', 'type': 'Bulk Carrier', 'dwt': 60000},
+        {'voyage_no': voyage_no, 'from_port': 'NLRTM', 'to_port': 'USNYC', 'cosp_date': cosp_date},
+        cp_data, weather_definitions, [],
+        calculate_voyage(df, cp_data, weather_definitions) if results else None)
+
+
+def test_incremental_aggregates_match_a_full_recompute(store, make_noon_reports, weather_definitions):
+    voyages = [
+        ('9300001', 'V001', 'Alpha', '2024-01-10'),
+        ('9300001', 'V002', 'Beta', '2024-01-25'),
+        ('9300001', 'V003', 'Alpha', '2024-03-02'),
+        ('9300002', 'V001', 'Beta', '2024-01-12'),
+        ('9300002', 'V002', 'Gamma', '2025-02-20'),
+    ]
+    for seed, voyage in enumerate(voyages):
+        save(store, make_noon_reports, weather_definitions, *voyage, seed)
+    # Saved again: moved to another charterer, month & year, with other results
+    save(store, make_noon_reports, weather_definitions, '9300001', 'V002', 'Gamma', '2025-07-01', seed=10)
+    # Saved without results first, then computed
+    save(store, make_noon_reports, weather_definitions, '9300002', 'V003', 'Alpha', '2024-03-15', seed=11,
+         results=False)
+    save(store, make_noon_reports, weather_definitions, '9300002', 'V003', 'Alpha', '2024-03-15', seed=11)
+
+    incremental = aggregate_tables(store)
+    store.rebuild_aggregates()
+    rebuilt = aggregate_tables(store)
+    for table, _, _, _ in FLEET_AGGREGATES:
+        pd.testing.assert_frame_equal(incremental[table], rebuilt[table], check_dtype=False, rtol=1e-9)
+    # Beta only kept the voyage of 9300002, Gamma got the moved one
+    charterers = rebuilt['fleet_charterer_totals'].set_index('charterer')['voyages']
+    assert charterers.to_dict() == {'Alpha': 3, 'Beta': 1, 'Gamma': 2}
+
+
+def test_saved_voyage_is_reloaded(store, make_noon_reports, weather_definitions):
+    voyage_id = save(store, make_noon_reports, weather_definitions, '9300001', 'V001', 'Alpha', '2024-01-10', 0)
+    loaded = store.load_voyage('9300001', 'V001')
+    assert loaded is not None
+    assert store.list_voyages(imo='9300001')['id'].tolist() == [voyage_id]
@@ -0,0 +1,76 @@
+"""
+Bootstrap confidence intervals of the CP performance figures of a voyage.
+
+The good weather figures rest on the good weather noon reports only, often a
+handful of them. Those reports are resampled with replacement thousands of
+times: each resample is one row of a (resamples x reports) matrix of counts,
+the good weather sums of all the resamples are a single matrix product, and
+the metrics of all of them are computed at once by performance_metrics(), as
+for the legs of a file. The other reports (bad weather, totals) are kept as they are.
+
+    intervals = bootstrap_intervals(ss.calculation_results['df'], ss.cp_data)
+    summary_with_intervals(ss.calculation_results['summary'], intervals)
+"""
+import numpy as np
+import pandas as pd
+
+from voyage_calculations import SUMMARY_METRICS, SUMMED_COLUMNS, performance_metrics, weather_columns
+
+# Metrics given with a confidence interval
+BOOTSTRAPPED_METRICS = ['good_speed', 'good_fo_day', 'entire_voyage_good_weather_based', 'fuel_overconsumption',
+                        'fuel_saving', 'time_lost', 'time_gained']
+
+DEFAULT_RESAMPLES = 5000
+DEFAULT_CONFIDENCE = 0.95
+
+# Resamples are drawn in blocks of at most this many (resample, report) counts, to bound the memory used
+BLOCK_SIZE = 2_000_000
+
+
+def bootstrap_intervals(df, cp_data, resamples=DEFAULT_RESAMPLES, confidence=DEFAULT_CONFIDENCE, seed=None):
+    """
+    Confidence intervals of the BOOTSTRAPPED_METRICS of classified noon reports
+    (cf. voyage_calculations.prepare_noon_reports()), as a DataFrame indexed by metric
+    with its lower and upper bounds. The bounds are NaN without good weather reports.
+    """
+    good_columns = [f'good_{name}' for name in SUMMED_COLUMNS.values()]
+    sums = weather_columns(df)[[f'{weather}_{name}' for weather in ('total', 'good', 'bad')
+                                for name in SUMMED_COLUMNS.values()]].fillna(0)
+    good = df['day_status'] == 'GOOD WEATHER DAY'
+    if 'quarantined' in df.columns:
+        # Quarantined reports are left out of the sums, cf. weather_columns()
+        good &= ~df['quarantined'].astype(bool)
+    good = good.to_numpy()
+    values = sums.loc[good, good_columns].to_numpy()
+    totals = sums.sum()
+    if not len(values):
+        return pd.DataFrame(np.nan, index=BOOTSTRAPPED_METRICS, columns=['lower', 'upper'])
+
+    rng = np.random.default_rng(seed)
+    reports = len(values)
+    block = max(1, BLOCK_SIZE // reports)
+    good_sums = []
+    for start in range(0, resamples, block):
+        size = min(block, resamples - start)
+        # Number of times each report is drawn, in every resample of the block
+        draws = rng.integers(reports, size=(size, reports)) + np.arange(size)[:, np.newaxis] * reports
+        counts = np.bincount(draws.ravel(), minlength=size * reports).reshape(size, reports)
+        good_sums.append(counts @ values)
+    resampled = pd.DataFrame(np.repeat(totals.to_numpy()[np.newaxis, :], resamples, axis=0), columns=totals.index)
+    resampled[good_columns] = np.concatenate(good_sums)
+
+    metrics = performance_metrics(resampled, cp_data)[BOOTSTRAPPED_METRICS].to_numpy()
+    tail = (1 - confidence) / 2 * 100
+    lower, upper = np.nanpercentile(metrics, [tail, 100 - tail], axis=0)
+    return pd.DataFrame({'lower': lower, 'upper': upper}, index=BOOTSTRAPPED_METRICS)
+
+
+def summary_with_intervals(summary, intervals):
+    """The Metric / Value summary table, with the bounds of the bootstrapped metrics in Lower & Upper columns"""
+    decimals = {metric: decimals for metric, _, decimals in SUMMARY_METRICS}
+    bounds = intervals.rename(index={key: metric for metric, key, _ in SUMMARY_METRICS})
+    summary = summary.merge(bounds, how='left', left_on='Metric', right_index=True)
+    for column, name in (('lower', 'Lower'), ('upper', 'Upper')):
+        summary[name] = [value if pd.isna(value) or decimals[metric] is None else round(value, decimals[metric])
+                         for metric, value in zip(summary['Metric'], summary.pop(column))]
+    return summary
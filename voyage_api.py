@@ -0,0 +1,273 @@
+"""
+REST/JSON service of the charterparty performance calculation, for other systems.
+
+    POST /calculations     noon reports & CP terms -> summary metrics, of the file, of each of its legs, of each fuel grade, and the anomalous noon reports
+    GET  /metrics          request latency per route
+    GET  /health
+
+The noon reports are posted as one of:
+
+  * application/json: {"noon_reports": [{...}, ...], "cp_data": {...}, "weather_definitions": {...}}
+  * text/csv, or application/vnd.apache.arrow.stream (an Arrow IPC stream, requires pyarrow):
+    the CP terms & weather definitions are then given as query parameters,
+    e.g. /calculations?warranted_speed=13&warranted_consumption=19.9&max_beaufort=4
+
+Responses are cached on a hash of the request content, the calculations run
+in a thread pool so that the event loop keeps serving other requests.
+
+    uvicorn voyage_api:app        # or: python voyage_api.py --port 8000
+
+and, in-process:
+
+    from starlette.testclient import TestClient
+    client = TestClient(voyage_api.app)
+    client.post("/calculations", json={"noon_reports": rows, "cp_data": {"warranted_speed": 13.0}}).json()
+"""
+import argparse
+import collections
+import hashlib
+import io
+import json
+import math
+import statistics
+import sys
+import time
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+from voyage_calculations import SUMMARY_METRICS, calculate_voyage, consumption_columns, widen_consumption
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
+# Query parameters of the CSV & Arrow requests, and their types
+CP_PARAMS = {
+    'warranted_speed': float,
+    'warranted_consumption': float,
+    'fuel_tolerance_percent': float,
+    'speed_tolerance_knots': float,
+}
+WEATHER_PARAMS = {
+    'max_beaufort': int,
+    'max_wave_height': float,
+}
+
+
+class BadRequest(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ==================== CACHE & METRICS ====================
+class ResponseCache:
+    """An LRU cache of response contents, keyed by a hash of the request contents"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.responses = collections.OrderedDict()
+
+    @staticmethod
+    def key(content_type, body, query_params):
+        digest = hashlib.sha256(content_type.encode())
+        digest.update(b'\0')
+        digest.update(body)
+        digest.update(b'\0')
+        digest.update(json.dumps(sorted(query_params.items())).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        content = self.responses.get(key)
+        if content is not None:
+            self.responses.move_to_end(key)
+        return content
+
+    def put(self, key, content):
+        self.responses[key] = content
+        if len(self.responses) > self.max_size:
+            self.responses.popitem(last=False)
+
+
+class LatencyMetrics:
+    """Request latencies per route, over the last `window` requests of each"""
+
+    def __init__(self, window=1000):
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self.counts = collections.Counter()
+        self.errors = collections.Counter()
+
+    def record(self, route, status_code, seconds):
+        self.latencies[route].append(seconds)
+        self.counts[route] += 1
+        if status_code >= 500:
+            self.errors[route] += 1
+
+    def summary(self):
+        routes = {}
+        for route, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            routes[route] = {
+                'requests': self.counts[route],
+                'server_errors': self.errors[route],
+                'mean_ms': statistics.fmean(ordered) * 1000,
+                'p50_ms': ordered[len(ordered) // 2] * 1000,
+                'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+                'max_ms': ordered[-1] * 1000,
+            }
+        return routes
+
+
+class LatencyMiddleware:
+    """Records the latency of every HTTP request, and returns it in a Server-Timing header"""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                headers = MutableHeaders(scope=message)
+                headers.append('Server-Timing', f"app;dur={(time.perf_counter() - start) * 1000:.2f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            self.metrics.record(f"{scope['method']} {scope['path']}", status_code, time.perf_counter() - start)
+
+
+# ==================== CALCULATIONS ====================
+def query_values(query_params, types):
+    values = {}
+    for name, value_type in types.items():
+        if name in query_params:
+            try:
+                values[name] = value_type(query_params[name])
+            except ValueError:
+                raise BadRequest(f"Invalid value for {name}: {query_params[name]}") from None
+    return values
+
+
+def parse_calculation_request(content_type, body, query_params):
+    """Returns the noon reports, CP terms and weather definitions of a request"""
+    if content_type == 'application/json':
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise BadRequest(f"Invalid JSON: {e}") from None
+        if not isinstance(payload, dict) or not isinstance(payload.get('noon_reports'), list):
+            raise BadRequest("The JSON body must have a noon_reports list")
+        return (pd.DataFrame(payload['noon_reports']), payload.get('cp_data') or {},
+                payload.get('weather_definitions') or {})
+    if content_type == 'text/csv':
+        df = pd.read_csv(io.BytesIO(body))
+    elif content_type == ARROW_STREAM:
+        if pyarrow is None:
+            raise BadRequest("Arrow requests require pyarrow to be installed", 415)
+        df = pyarrow.ipc.open_stream(body).read_pandas()
+    else:
+        raise BadRequest(f"Unsupported content type: {content_type}", 415)
+    return df, query_values(query_params, CP_PARAMS), query_values(query_params, WEATHER_PARAMS)
+
+
+def json_number(value):
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def calculate(content_type, body, query_params):
+    df, cp_data, weather_definitions = parse_calculation_request(content_type, body, query_params)
+    df = widen_consumption(df)
+    missing_columns = {'event_type', 'distance_travelled_actual', 'steaming_time_hrs',
+                       'beaufort_number', 'significant_wave_height'} - set(df.columns)
+    # The ME fuel may also be given per grade (e.g. me_vlsfo_consumed)
+    if 'me_fuel_consumed' not in df.columns and 'me' not in [consumer for consumer, _ in consumption_columns(df).values()]:
+        missing_columns.add('me_fuel_consumed')
+    if missing_columns:
+        raise BadRequest(f"Missing noon report columns: {', '.join(sorted(missing_columns))}", 422)
+    results = calculate_voyage(df, cp_data, weather_definitions)
+    return {
+        'metrics': {key: json_number(results[key]) for _, key, _ in SUMMARY_METRICS},
+        'summary': [{'metric': metric, 'value': json_number(value)}
+                    for metric, value in results['summary'].itertuples(index=False)],
+        'legs': [{key: json_number(value) if isinstance(value, float) else value for key, value in leg.items()}
+                 for leg in results['legs'].astype(object).to_dict('records')],
+        'fuel_grades': [{key: json_number(value) if isinstance(value, float) else value for key, value in grade.items()}
+                        for grade in results['fuel_grades'].astype(object).to_dict('records')],
+        'anomalies': [{'report': int(report), 'anomaly': anomaly}
+                      for report, anomaly in results['df']['anomaly'].dropna().items()],
+    }
+
+
+# ==================== APPLICATION ====================
+cache = ResponseCache()
+metrics = LatencyMetrics()
+
+
+async def post_calculations(request):
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    body = await request.body()
+    query_params = dict(request.query_params)
+    key = ResponseCache.key(content_type, body, query_params)
+    content = cache.get(key)
+    if content is not None:
+        return JSONResponse(content, headers={'X-Cache': 'hit'})
+    try:
+        content = await run_in_threadpool(calculate, content_type, body, query_params)
+    except BadRequest as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+    except (ValueError, KeyError, ZeroDivisionError) as e:
+        return JSONResponse({'error': f"{type(e).__name__}: {e}"}, status_code=422)
+    cache.put(key, content)
+    return JSONResponse(content, headers={'X-Cache': 'miss'})
+
+
+async def get_metrics(request):
+    return JSONResponse(metrics.summary())
+
+
+async def get_health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+app = Starlette(routes=[
+    Route('/calculations', post_calculations, methods=['POST']),
+    Route('/metrics', get_metrics, methods=['GET']),
+    Route('/health', get_health, methods=['GET']),
+])
+app.add_middleware(LatencyMiddleware, metrics=metrics)
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+    uvicorn.run(app, host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
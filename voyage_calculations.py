@@ -0,0 +1,478 @@
+"""
+Charterparty performance calculations of one voyage, outside of Streamlit.
+
+This is the logic of the Calculations page (cf. 2.Calculations Page.py),
+so that the same figures can be computed from the CLI or in batch runs.
+
+Besides `me_fuel_consumed`, the noon reports may carry the consumption of each
+consumer & fuel grade, either in the wide layout (one column per pair, e.g.
+`me_vlsfo_consumed`, `ae_mgo_consumed`, `boiler_hsfo_consumed`) or in the long
+layout (one row per report, consumer & grade, cf. LONG_CONSUMPTION_COLUMNS).
+They are summed per weather class along with the distance and time, and each
+fuel grade warranted by the CP (cp_data['fuel_grade_warranties'], MT/day) gets
+its own bounds and over/under-consumption. The CO2 emitted by all the fuel is
+computed from the same sums (cf. emissions.py for the CII and EU ETS figures).
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Events of the noon reports kept for the performance calculations
+PERFORMANCE_EVENTS = ['NOON AT SEA', 'COSP', 'EOSP']
+
+# Columns identifying the vessel of a noon report, in files covering several vessels
+VESSEL_COLUMNS = ['imo', 'vessel_name']
+
+# Noon report columns summed by the calculations, and their name in the metrics
+SUMMED_COLUMNS = {
+    'distance_travelled_actual': 'distance',
+    'steaming_time_hrs': 'time',
+    'me_fuel_consumed': 'fuel',
+}
+
+# Consumption columns of a consumer & fuel grade, in the wide layout
+CONSUMERS = ['me', 'ae', 'boiler']
+CONSUMPTION_COLUMN = re.compile(rf"({'|'.join(CONSUMERS)})_(\w+)_consumed")
+# Key of their sums in the metrics, e.g. 'good_me_vlsfo'
+CONSUMPTION_KEY = re.compile(rf"total_({'|'.join(CONSUMERS)})_(\w+)")
+
+# Grade of the fuel not reported per grade (me_fuel_consumed)
+DEFAULT_FUEL_GRADE = 'VLSFO'
+
+# CO2 emission factors (t CO2 / t fuel) of the fuel grades, of the IMO guidelines (MEPC.364(79));
+# grades missing here are counted with the factor of DEFAULT_FUEL_GRADE
+CO2_FACTORS = {
+    'HFO': 3.114,
+    'HSFO': 3.114,
+    'IFO': 3.114,
+    'VLSFO': 3.151,
+    'ULSFO': 3.151,
+    'LFO': 3.151,
+    'MGO': 3.206,
+    'LSMGO': 3.206,
+    'MDO': 3.206,
+    'LNG': 2.750,
+    'LPG': 3.000,
+    'METHANOL': 1.375,
+    'ETHANOL': 1.913,
+}
+
+# Anomaly checks of the noon reports (cf. flag_anomalies()):
+# a report steaming longer than a day plus a time zone change,
+MAX_REPORT_HOURS = 26
+# an implied speed off the median of the five reports centred on it by more than this fraction and this many knots,
+SPEED_DEVIATION = 0.5
+MIN_SPEED_DEVIATION_KNOTS = 3.0
+# when at least this many of those have a speed (a single typo cannot move the median of three),
+MIN_SPEED_NEIGHBOURS = 3
+# a fuel/hour rate more than this many robust standard deviations (MAD) from the median of the vessel,
+MAX_FUEL_RATE_ZSCORE = 5.0
+# and steaming hours off the COSP to EOSP span by more than this many hours
+SPAN_TOLERANCE_HOURS = 6.0
+
+# Columns of the long layout: consumer, fuel grade and quantity consumed, the other columns repeating the report
+LONG_CONSUMPTION_COLUMNS = ['consumer', 'fuel_grade', 'fuel_consumed']
+
+# Rows of the summary table: (metric, key in the calculation results, decimals or None if not rounded)
+SUMMARY_METRICS = [
+    ("Total Distance (nm)", 'total_distance', None),
+    ("Total Steaming Time (hrs)", 'total_time', None),
+    ("Voyage Avg Speed (knots)", 'voyage_avg_speed', 2),
+    ("Good Wx Distance (nm)", 'good_distance', None),
+    ("Good Wx Time (hrs)", 'good_time', None),
+    ("Good Wx Speed (knots)", 'good_speed', 2),
+    ("Good Wx FO Cons (MT)", 'good_fuel', 2),
+    ("Good Wx FO Rate (MT/hr)", 'good_fo_hr', 3),
+    ("Good Wx FO Rate (MT/day)", 'good_fo_day', 3),
+    ("Bad Wx Distance (nm)", 'bad_distance', None),
+    ("Bad Wx Time (hrs)", 'bad_time', None),
+    ("Bad Wx FO Cons (MT)", 'bad_fuel', 2),
+    ("Bad Wx Speed (knots)", 'bad_speed', 2),
+    ("Total ME Fuel (MT)", 'total_fuel', 2),
+    ("Entire Voyage Cons (MT) via Good Wx Perf", 'entire_voyage_good_weather_based', 2),
+    ("Max Warranted FO (MT)", 'max_warranted_cons', 2),
+    ("Min Warranted FO (MT)", 'min_warranted_cons', 2),
+    ("Fuel Overconsumption (MT)", 'fuel_overconsumption', 2),
+    ("Fuel Saving (MT)", 'fuel_saving', 2),
+    ("Time @ Good Wx Speed (hrs)", 'time_at_good_spd', 2),
+    ("Max Time @ Warranted Spd (hrs)", 'max_time', 2),
+    ("Min Time @ Warranted Spd (hrs)", 'min_time', 2),
+    ("Time Gained (hrs)", 'time_gained', 2),
+    ("Time Lost (hrs)", 'time_lost', 2),
+    ("CO2 Emissions (MT)", 'co2_emissions', 2),
+]
+
+
+def read_noon_reports(source, name=None):
+    """Reads the noon reports of a CSV or Excel file: a path, or a file object and its name"""
+    name = source if name is None else name
+    if name.endswith('.csv'):
+        return pd.read_csv(source)
+    return pd.read_excel(source)
+
+
+def consumption_columns(df):
+    """The (consumer, fuel grade) of each consumption column of the wide layout"""
+    columns = {}
+    for column in df.columns:
+        match = CONSUMPTION_COLUMN.fullmatch(str(column))
+        if match and match.group(2) != 'fuel':
+            columns[column] = match.groups()
+    return columns
+
+
+def widen_consumption(df):
+    """
+    Turns noon reports in the long consumption layout into one row per report, with a
+    <consumer>_<grade>_consumed column per consumer & fuel grade. Other reports are returned unchanged.
+    """
+    if not set(LONG_CONSUMPTION_COLUMNS) <= set(df.columns):
+        return df
+    consumer, grade, consumed = LONG_CONSUMPTION_COLUMNS
+    report_columns = [column for column in df.columns if column not in LONG_CONSUMPTION_COLUMNS]
+    # The rows of a report repeat all its other columns
+    report = df.groupby(report_columns, sort=False, dropna=False).ngroup()
+    names = (df[consumer].astype('string').str.strip().str.lower() + '_'
+             + df[grade].astype('string').str.strip().str.lower() + '_consumed')
+    wide = pd.to_numeric(df[consumed], errors='coerce').groupby([report, names]).sum(min_count=1).unstack()
+    reports = df.loc[~report.duplicated(), report_columns].reset_index(drop=True)
+    wide = wide.reindex(range(len(reports))).reset_index(drop=True)
+    wide.columns.name = None
+    return pd.concat([reports, wide], axis=1)
+
+
+def prepare_noon_reports(df, weather_definitions=None):
+    """Keeps the noon reports used by the calculations and classifies them as good or bad weather days"""
+    # Filter relevant rows based on the uploaded data
+    df = widen_consumption(df)
+    df = df[df['event_type'].isin(PERFORMANCE_EVENTS)].copy()
+
+    # Ensure numeric types for calculations
+    df['distance_travelled_actual'] = pd.to_numeric(df['distance_travelled_actual'], errors='coerce')
+    df['steaming_time_hrs'] = pd.to_numeric(df['steaming_time_hrs'], errors='coerce')
+    consumption = consumption_columns(df)
+    for column in consumption:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    if 'me_fuel_consumed' in df.columns:
+        df['me_fuel_consumed'] = pd.to_numeric(df['me_fuel_consumed'], errors='coerce')
+    else:
+        # The ME fuel of the CP terms is that of all the grades burnt by the ME
+        me_columns = [column for column, (consumer, _) in consumption.items() if consumer == 'me']
+        df['me_fuel_consumed'] = df[me_columns].sum(axis=1, min_count=1)
+
+    # Apply weather definitions to categorize days
+    if weather_definitions is not None and 'beaufort_number' in df.columns and 'significant_wave_height' in df.columns:
+        df['day_status'] = good_weather(df, weather_definitions).map({True: 'GOOD WEATHER DAY', False: 'BAD WEATHER DAY'})
+    return df
+
+
+def good_weather(df, weather_definitions):
+    """Whether the Beaufort number & wave height of every row are within the good weather definitions"""
+    return ((df['beaufort_number'] <= weather_definitions.get('max_beaufort', 5)) &
+            (df['significant_wave_height'] <= weather_definitions.get('max_wave_height', 2.0)))
+
+
+def segment_legs(df):
+    """
+    Numbers the legs of the noon reports, in a 'leg' column.
+
+    A leg starts at a COSP and ends at the following EOSP, the noon reports of a
+    vessel being in chronological order. Reports before the first COSP or after
+    an EOSP belong to no leg. The reports of a vessel without any COSP all
+    belong to a single leg, as in files covering a single passage.
+    """
+    vessels = vessel_keys(df)
+    cosp = df['event_type'] == 'COSP'
+    eosp = df['event_type'] == 'EOSP'
+    leg = cosp.groupby(vessels).cumsum()
+    leg = leg.where(cosp.groupby(vessels).transform('any'), 1)
+    after_eosp = (eosp.groupby([vessels, leg]).cumsum() - eosp) > 0
+    df['leg'] = leg.where((leg > 0) & ~after_eosp).astype('Int64')
+    return df
+
+
+def vessel_keys(df):
+    """The vessel of every noon report, for files covering several vessels"""
+    for column in VESSEL_COLUMNS:
+        if column in df.columns:
+            return df[column]
+    return pd.Series(0, index=df.index)
+
+
+def weather_columns(df):
+    """
+    Distance, time and fuel of every noon report, and its consumption per consumer & fuel grade,
+    in total and in good and bad weather (or NaN)
+    """
+    # Quarantined reports (cf. calculate_voyage()) are left out of every sum
+    kept = ~df['quarantined'].astype(bool) if 'quarantined' in df.columns else pd.Series(True, index=df.index)
+    good = (df['day_status'] == 'GOOD WEATHER DAY') & kept
+    bad = (df['day_status'] == 'BAD WEATHER DAY') & kept
+    summed = dict(SUMMED_COLUMNS)
+    summed.update({column: f'{consumer}_{grade}' for column, (consumer, grade) in consumption_columns(df).items()})
+    columns = {}
+    for column, name in summed.items():
+        columns[f'total_{name}'] = df[column].where(kept)
+        columns[f'good_{name}'] = df[column].where(good)
+        columns[f'bad_{name}'] = df[column].where(bad)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def weather_sums(df, keys):
+    """
+    Distance, time, fuel and consumption per consumer & fuel grade, in total, in good and in bad weather,
+    per group of `keys` in a single groupby
+    """
+    sums = weather_columns(df)
+    if not keys:
+        return sums.sum().to_frame().T
+    return sums.groupby([df[key] for key in keys], sort=False).sum()
+
+
+def row_medians(values):
+    """The median of the non-NaN values of every row of a 2D array (NaN if none), without np.nanmedian's overhead"""
+    ordered = np.sort(values, axis=1)
+    counts = (~np.isnan(values)).sum(axis=1)
+    low = np.take_along_axis(ordered, ((counts - 1) // 2).clip(min=0)[:, np.newaxis], axis=1)[:, 0]
+    high = np.take_along_axis(ordered, (counts // 2).clip(max=values.shape[1] - 1)[:, np.newaxis], axis=1)[:, 0]
+    return np.where(counts > 0, (low + high) / 2, np.nan)
+
+
+def flag_anomalies(df):
+    """
+    Checks every noon report against its neighbours and the other reports of its vessel, in an 'anomaly'
+    column giving the failed checks (or NA): missing figures, zero or too many steaming hours, an implied
+    speed off those of the neighbouring reports (e.g. a distance typo) and a fuel/hour rate far from
+    that of the vessel (e.g. fuel reported in litres).
+    """
+    # The vessel keys are factorized once for all the groupbys
+    vessels = pd.factorize(vessel_keys(df))[0]
+    distance, hours, fuel = df['distance_travelled_actual'], df['steaming_time_hrs'], df['me_fuel_consumed']
+    speed = (distance / hours).where(hours > 0)
+    fuel_rate = (fuel / hours).where(hours > 0)
+
+    # Median speed of the report and the two before and after it, within the vessel. The report itself is in the
+    # window so that, at a leg start whose COSP has no speed, a typo next to a valid report cannot drag its median
+    vessel_speeds = speed.groupby(vessels)
+    window_speeds = np.column_stack([vessel_speeds.shift(offset).to_numpy() for offset in (-2, -1, 0, 1, 2)])
+    neighbour_speed = pd.Series(row_medians(window_speeds), index=df.index).where(
+        (~np.isnan(window_speeds)).sum(axis=1) >= MIN_SPEED_NEIGHBOURS)
+    speed_deviation = (speed - neighbour_speed).abs()
+
+    # Robust z-score of the fuel rate: distance to the median of the vessel, in MADs
+    fuel_rate_median = fuel_rate.groupby(vessels).transform('median')
+    fuel_rate_mad = (fuel_rate - fuel_rate_median).abs().groupby(vessels).transform('median')
+    fuel_rate_zscore = 0.6745 * (fuel_rate - fuel_rate_median).abs() / fuel_rate_mad.where(fuel_rate_mad > 0)
+
+    checks = pd.DataFrame({
+        'missing figures': distance.isna() | hours.isna() | fuel.isna(),
+        'zero steaming hours': (hours <= 0) & ((distance > 0) | (fuel > 0)),
+        'too many steaming hours': hours > MAX_REPORT_HOURS,
+        'speed off neighbours': (distance > 0) & (speed_deviation > SPEED_DEVIATION * neighbour_speed)
+                                & (speed_deviation > MIN_SPEED_DEVIATION_KNOTS),
+        'fuel rate outlier': fuel_rate_zscore > MAX_FUEL_RATE_ZSCORE,
+    }).fillna(False)
+    # The descriptions are only built for the failed reports, a few in a fleet
+    failed = checks[checks.any(axis=1)]
+    anomaly = pd.Series('', index=failed.index, dtype=object)
+    for check, failed_check in failed.items():
+        anomaly += np.where(failed_check, f'{check}; ', '')
+    df['anomaly'] = anomaly.str.rstrip('; ').reindex(df.index)
+    return df
+
+
+def steaming_span_check(df, voyage_data):
+    """
+    The steaming hours of the noon reports against the COSP to EOSP span of the Voyage Details,
+    as (steaming hours, span hours), or None when they agree or the span is not known
+    """
+    if not voyage_data.get('cosp_date') or not voyage_data.get('eosp_date'):
+        return None
+    cosp = pd.Timestamp(f"{voyage_data['cosp_date']} {voyage_data.get('cosp_time') or '00:00'}")
+    eosp = pd.Timestamp(f"{voyage_data['eosp_date']} {voyage_data.get('eosp_time') or '00:00'}")
+    span_hours = (eosp - cosp) / pd.Timedelta(hours=1)
+    kept = ~df['quarantined'].astype(bool) if 'quarantined' in df.columns else slice(None)
+    steaming_hours = df.loc[kept, 'steaming_time_hrs'].sum()
+    if span_hours <= 0 or abs(steaming_hours - span_hours) <= SPAN_TOLERANCE_HOURS:
+        return None
+    return float(steaming_hours), span_hours
+
+
+def fuel_grades(columns):
+    """The consumers & fuel grades of the sums or metrics `columns`, as {grade: [consumer, ...]}"""
+    grades = {}
+    for column in columns:
+        match = CONSUMPTION_KEY.fullmatch(str(column))
+        if match:
+            grades.setdefault(match.group(2), []).append(match.group(1))
+    return grades
+
+
+def co2_factor(grade):
+    """t CO2 emitted per t of fuel of a grade"""
+    return CO2_FACTORS.get(grade.upper(), CO2_FACTORS[DEFAULT_FUEL_GRADE])
+
+
+def ratio(numerator, denominator):
+    """numerator / denominator, or 0 where the denominator is 0"""
+    return (numerator / denominator).where(denominator != 0, 0)
+
+
+def performance_metrics(sums, cp_data):
+    """
+    Computes the CP performance metrics of every row of `sums` (cf. weather_sums()),
+    as whole columns: one voyage or all the legs of a file are computed at once.
+    """
+    metrics = sums.copy()
+
+    # =========================
+    # Total Metrics
+    # =========================
+    metrics['voyage_avg_speed'] = ratio(sums['total_distance'], sums['total_time'])
+
+    # =========================
+    # Good and Bad Weather Segmentation
+    # =========================
+    metrics['good_speed'] = ratio(sums['good_distance'], sums['good_time'])
+    metrics['good_fo_hr'] = ratio(sums['good_fuel'], sums['good_time'])
+    metrics['good_fo_day'] = metrics['good_fo_hr'] * 24
+    metrics['bad_speed'] = ratio(sums['bad_distance'], sums['bad_time'])
+
+    # CP parameters
+    warranted_speed = cp_data.get('warranted_speed', 13.0)
+    warranted_consumption = cp_data.get('warranted_consumption', 19.9)
+    fuel_tolerance_percent = cp_data.get('fuel_tolerance_percent', 5.0)
+    speed_tolerance_knots = cp_data.get('speed_tolerance_knots', 0.5)
+
+    # =========================
+    # Warranted Calculations
+    # =========================
+    fuel_tolerance_mt = warranted_consumption * (fuel_tolerance_percent / 100)
+    warranted_plus_tol = warranted_consumption + fuel_tolerance_mt
+    warranted_minus_tol = warranted_consumption - fuel_tolerance_mt
+
+    # Entire Voyage Consumption Using Good Weather Consumption
+    entire_voyage = ratio(sums['total_distance'], metrics['good_speed']) * (metrics['good_fo_day'] / 24)
+    metrics['entire_voyage_good_weather_based'] = entire_voyage
+
+    # Maximum and Minimum Warranted Fuel, at the good weather speed kept within the speed tolerance
+    adjusted_speed = metrics['good_speed'].clip(warranted_speed - speed_tolerance_knots,
+                                                warranted_speed + speed_tolerance_knots)
+    metrics['max_warranted_cons'] = (sums['total_distance'] / adjusted_speed) * (warranted_plus_tol / 24)
+    metrics['min_warranted_cons'] = (sums['total_distance'] / adjusted_speed) * (warranted_minus_tol / 24)
+
+    # Overconsumption and Saving
+    metrics['fuel_overconsumption'] = (entire_voyage - metrics['max_warranted_cons']).clip(lower=0)
+    metrics['fuel_saving'] = (metrics['min_warranted_cons'] - entire_voyage).clip(lower=0)
+
+    # Time Estimates
+    metrics['time_at_good_spd'] = sums['total_distance'] / adjusted_speed
+    metrics['max_time'] = sums['total_distance'] / (warranted_speed - speed_tolerance_knots)
+    metrics['min_time'] = sums['total_distance'] / (warranted_speed + speed_tolerance_knots)
+    metrics['time_gained'] = (metrics['max_time'] - metrics['time_at_good_spd']).clip(lower=0)
+    metrics['time_lost'] = (metrics['time_at_good_spd'] - metrics['min_time']).clip(lower=0)
+
+    # =========================
+    # Fuel Grades
+    # =========================
+    # Every consumer burning a grade counts against its warranty, at the same speed & tolerance as the ME fuel
+    grade_warranties = cp_data.get('fuel_grade_warranties') or {}
+    for grade, consumers in fuel_grades(sums.columns).items():
+        for weather in ('total', 'good', 'bad'):
+            metrics[f'{grade}_{weather}_fuel'] = sums[[f'{weather}_{consumer}_{grade}' for consumer in consumers]].sum(axis=1)
+        metrics[f'{grade}_good_fo_day'] = ratio(metrics[f'{grade}_good_fuel'], sums['good_time']) * 24
+        grade_entire_voyage = ratio(sums['total_distance'], metrics['good_speed']) * (metrics[f'{grade}_good_fo_day'] / 24)
+        metrics[f'{grade}_entire_voyage'] = grade_entire_voyage
+        if grade in grade_warranties:
+            grade_tolerance_mt = grade_warranties[grade] * (fuel_tolerance_percent / 100)
+            metrics[f'{grade}_max_warranted_cons'] = (sums['total_distance'] / adjusted_speed) * (
+                (grade_warranties[grade] + grade_tolerance_mt) / 24)
+            metrics[f'{grade}_min_warranted_cons'] = (sums['total_distance'] / adjusted_speed) * (
+                (grade_warranties[grade] - grade_tolerance_mt) / 24)
+            metrics[f'{grade}_overconsumption'] = (grade_entire_voyage - metrics[f'{grade}_max_warranted_cons']).clip(lower=0)
+            metrics[f'{grade}_saving'] = (metrics[f'{grade}_min_warranted_cons'] - grade_entire_voyage).clip(lower=0)
+
+    # =========================
+    # Emissions
+    # =========================
+    # CO2 of all the consumers, the ME fuel being of the default grade when it is not reported per grade
+    grades = fuel_grades(sums.columns)
+    metrics['co2_emissions'] = 0.0
+    for grade in grades:
+        metrics['co2_emissions'] += metrics[f'{grade}_total_fuel'] * co2_factor(grade)
+    if not any('me' in consumers for consumers in grades.values()):
+        metrics['co2_emissions'] += sums['total_fuel'] * co2_factor(DEFAULT_FUEL_GRADE)
+    return metrics
+
+
+def calculate_legs(df, cp_data):
+    """The metrics of every leg of classified & segmented noon reports, one row per (vessel,) leg"""
+    keys = [column for column in VESSEL_COLUMNS if column in df.columns][:1] + ['leg']
+    legs = df[df['leg'].notna()]
+    return performance_metrics(weather_sums(legs, keys), cp_data).reset_index()
+
+
+def calculate_voyage(df, cp_data, weather_definitions=None, quarantine=False):
+    """
+    Computes the performance of a voyage against its charterparty terms.
+
+    `df` holds the raw noon reports of the voyage. The result is the dict stored
+    in `ss.calculation_results` by the Calculations page: the classified noon reports
+    under 'df', the summary table under 'summary', the metrics of each leg of the
+    file under 'legs', and every metric of the whole file under its own key.
+    The reports failing the anomaly checks are flagged, and left out of the
+    calculations if `quarantine` is set.
+    """
+    df = flag_anomalies(segment_legs(prepare_noon_reports(df, weather_definitions)))
+    df['quarantined'] = df['anomaly'].notna() if quarantine else False
+    results = performance_metrics(weather_sums(df, []), cp_data).iloc[0].to_dict()
+    results['df'] = df
+    results['legs'] = calculate_legs(df, cp_data)
+    results['summary'] = summary_table(results)
+    results['consumption'] = consumption_table(results)
+    results['fuel_grades'] = fuel_grade_table(results, cp_data)
+    return results
+
+
+def summary_value(results, key, decimals):
+    value = results[key]
+    return value if decimals is None else round(value, decimals)
+
+
+def summary_table(results):
+    """The Metric / Value table of the calculation results, as displayed and exported"""
+    return pd.DataFrame({
+        "Metric": [metric for metric, _, _ in SUMMARY_METRICS],
+        "Value": [summary_value(results, key, decimals) for _, key, decimals in SUMMARY_METRICS],
+    })
+
+
+def consumption_table(results):
+    """The consumption of each consumer & fuel grade of the calculation results, in total and in good and bad weather"""
+    rows = [(consumer.upper(), grade.upper(), results[f'total_{consumer}_{grade}'], results[f'good_{consumer}_{grade}'],
+             results[f'bad_{consumer}_{grade}'])
+            for grade, consumers in fuel_grades(results).items() for consumer in consumers]
+    return pd.DataFrame(rows, columns=["Consumer", "Fuel Grade", "Total (MT)", "Good Wx (MT)", "Bad Wx (MT)"])
+
+
+def fuel_grade_table(results, cp_data):
+    """The performance of each fuel grade of the calculation results, against its warranty if the CP has one"""
+    grade_warranties = cp_data.get('fuel_grade_warranties') or {}
+    rows = []
+    for grade in fuel_grades(results):
+        rows.append({
+            "Fuel Grade": grade.upper(),
+            "Total Cons (MT)": results[f'{grade}_total_fuel'],
+            "Good Wx FO Rate (MT/day)": results[f'{grade}_good_fo_day'],
+            "Entire Voyage Cons (MT) via Good Wx Perf": results[f'{grade}_entire_voyage'],
+            "Warranted (MT/day)": grade_warranties.get(grade),
+            "Max Warranted FO (MT)": results.get(f'{grade}_max_warranted_cons'),
+            "Min Warranted FO (MT)": results.get(f'{grade}_min_warranted_cons'),
+            "Overconsumption (MT)": results.get(f'{grade}_overconsumption'),
+            "Saving (MT)": results.get(f'{grade}_saving'),
+        })
+    return pd.DataFrame(rows, columns=["Fuel Grade", "Total Cons (MT)", "Good Wx FO Rate (MT/day)",
+                                       "Entire Voyage Cons (MT) via Good Wx Perf", "Warranted (MT/day)",
+                                       "Max Warranted FO (MT)", "Min Warranted FO (MT)", "Overconsumption (MT)",
+                                       "Saving (MT)"])
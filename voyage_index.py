@@ -0,0 +1,79 @@
+"""
+Prefix-sum index of the noon reports of a voyage, for metrics over time windows.
+
+The cumulative distance, steaming time and ME fuel, in total and in good and
+bad weather, are kept over the sorted report timestamps: the sums over any
+window take two binary searches and a subtraction, so what-if questions (the
+figures between two dates, or with an exclusion period toggled) are answered
+without filtering & summing the noon reports again.
+
+    index = VoyageIndex(ss.calculation_results['df'])
+    index.window_sums(start, end)
+    index.metrics(ss.cp_data, exclusions=[(start, end), ...])
+"""
+import numpy as np
+import pandas as pd
+
+from voyage_calculations import performance_metrics, weather_columns
+
+# Column of the noon report timestamps
+TIMESTAMP_COLUMN = 'date'
+
+
+def exclusion_windows(exclusion_periods):
+    """The (start, end) timestamps of the exclusion periods of the input page"""
+    return [(pd.Timestamp(f"{period['start_date']} {period['start_time']}"),
+             pd.Timestamp(f"{period['end_date']} {period['end_time']}"))
+            for period in exclusion_periods]
+
+
+def merge_windows(windows):
+    """Merges overlapping windows, so that no report is subtracted twice"""
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class VoyageIndex:
+    """
+    Cumulative sums of classified noon reports (cf. voyage_calculations.prepare_noon_reports()),
+    over their timestamps. A window includes the reports timestamped from its start to its end,
+    both included. Reports without a valid timestamp are left out of the index.
+    """
+
+    def __init__(self, df, timestamp_column=TIMESTAMP_COLUMN):
+        timestamps = pd.to_datetime(df[timestamp_column], errors='coerce')
+        order = np.argsort(timestamps.to_numpy(), kind='stable')
+        valid = timestamps.notna().to_numpy()[order]
+        order = order[valid]
+        sums = weather_columns(df.iloc[order])
+        self.columns = list(sums.columns)
+        self.timestamps = timestamps.to_numpy()[order]
+        # One leading row of zeros, so that the sums up to position i are cumulative[i]:
+        self.cumulative = np.zeros((len(order) + 1, len(self.columns)))
+        np.cumsum(sums.fillna(0).to_numpy(), axis=0, out=self.cumulative[1:])
+
+    def _position(self, timestamp, side):
+        return np.searchsorted(self.timestamps, np.datetime64(pd.Timestamp(timestamp)), side=side)
+
+    def window_sums(self, start=None, end=None):
+        """Distance, time and fuel in total, in good and in bad weather, of the reports from `start` to `end`"""
+        first = 0 if start is None else self._position(start, 'left')
+        last = len(self.timestamps) if end is None else self._position(end, 'right')
+        return pd.Series(self.cumulative[max(last, first)] - self.cumulative[first], index=self.columns)
+
+    def metrics(self, cp_data, start=None, end=None, exclusions=()):
+        """The CP performance metrics of the reports from `start` to `end`, without those of the `exclusions` windows"""
+        sums = self.window_sums(start, end)
+        for excluded_start, excluded_end in merge_windows(exclusions):
+            if start is not None:
+                excluded_start = max(pd.Timestamp(excluded_start), pd.Timestamp(start))
+            if end is not None:
+                excluded_end = min(pd.Timestamp(excluded_end), pd.Timestamp(end))
+            sums -= self.window_sums(excluded_start, excluded_end)
+        return performance_metrics(sums.to_frame().T, cp_data).iloc[0]
+
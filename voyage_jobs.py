@@ -0,0 +1,66 @@
+"""
+Background runs of the Calculations page pipeline on an uploaded file.
+
+Reading, classifying and computing the noon reports, then writing the Excel
+report, runs in a thread of a shared executor: the Streamlit script thread
+only starts the job, keeps it in `st.session_state`, and polls its progress
+on each rerun, so the page keeps responding while a large file is processed.
+Files of auto-logged samples (cf. sensor_logs.py) are resampled into noon to
+noon rows first, CSV ones a chunk at a time: the uploaded bytes are held in
+memory by Streamlit anyway, but the samples parsed from them only a chunk at
+a time.
+"""
+import copy
+import io
+
+from excel_export import VoyageWorkbook
+from sensor_logs import read_voyage_file
+from voyage_calculations import PERFORMANCE_EVENTS, calculate_voyage
+
+
+class VoyageJob:
+    """
+    The processing of an uploaded file.
+
+    The inputs of the voyage are copied when the job starts, so that editing
+    the forms while it runs does not change its results.
+    `stage` and `progress` (from 0 to 1) are updated by the job thread,
+    and only ever read by the Streamlit script.
+    """
+
+    def __init__(self, executor, file_name, data, vessel_data, voyage_data, cp_data, weather_definitions,
+                 exclusion_periods, quarantine=False):
+        self.file_name = file_name
+        self.quarantine = quarantine
+        self.stage, self.progress = "Queued", 0.0
+        inputs = copy.deepcopy((vessel_data, voyage_data, cp_data, weather_definitions, exclusion_periods))
+        self.future = executor.submit(self._run, data, *inputs)
+
+    def _step(self, stage, progress):
+        self.stage, self.progress = stage, progress
+
+    def _run(self, data, vessel_data, voyage_data, cp_data, weather_definitions, exclusion_periods):
+        self._step("Reading file", 0.1)
+        raw_df = read_voyage_file(io.BytesIO(data), self.file_name, weather_definitions)
+
+        self._step(f"Computing performance of {raw_df['event_type'].isin(PERFORMANCE_EVENTS).sum()} noon reports", 0.5)
+        results = calculate_voyage(raw_df, cp_data, weather_definitions, self.quarantine)
+
+        self._step("Writing Excel report", 0.8)
+        excel = io.BytesIO()
+        with VoyageWorkbook(excel) as workbook:
+            workbook.add_voyage(vessel_data, voyage_data, cp_data, exclusion_periods, results)
+
+        self._step("Done", 1.0)
+        return {'raw_df': raw_df, 'results': results, 'excel': excel.getvalue()}
+
+    def done(self):
+        return self.future.done()
+
+    def error(self):
+        """The exception raised by the job, if it failed"""
+        return self.future.exception() if self.future.done() else None
+
+    def outcome(self):
+        """The uploaded data, the calculation results and the Excel report, once the job is done"""
+        return self.future.result()
@@ -0,0 +1,333 @@
+"""
+Job queue and workers for the charterparty performance calculations.
+
+Voyage calculations are submitted from the app or from scripts, and run by
+workers outside of the Streamlit process:
+
+    jobs = CalculationJobs(SQLiteQueue("cp_jobs.db"))
+    job_id = jobs.submit(file="noon_reports/V001.xlsx", vessel_data=..., voyage_data=..., cp_data=...)
+    jobs.status(job_id)   # 'queued', 'running', 'done' or 'failed'
+    jobs.result(job_id)   # {'voyage_id': ..., 'metrics': {...}}
+
+The queue is pluggable: SQLiteQueue is shared by processes on the same host,
+InProcessQueue by threads of a single process (scripts, local runs).
+Workers claim queued jobs in batches, and keep the files they parsed in an
+LRU cache, as jobs submitted together often share their noon report files.
+Files of auto-logged samples are resampled noon to noon, as in the app.
+
+    python voyage_queue.py worker --processes 4          # serve the jobs of cp_jobs.db
+    python voyage_queue.py submit voyages.json           # manifest of excel_export.py
+    python voyage_queue.py status JOB_ID
+"""
+import argparse
+import collections
+import copy
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from sensor_logs import as_noon_reports, read_voyage_file
+from voyage_calculations import SUMMARY_METRICS, calculate_voyage
+from voyage_store import DEFAULT_PATH as DEFAULT_STORE_PATH, VoyageStore, as_float
+
+DEFAULT_QUEUE_PATH = os.environ.get('CP_JOBS_DB', 'cp_jobs.db')
+# Where the files uploaded in the app are kept for the workers
+DEFAULT_UPLOADS_DIR = os.environ.get('CP_UPLOADS_DIR', 'uploads')
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class JobFailed(Exception):
+    """Raised by CalculationJobs.result() for a job whose calculation failed"""
+
+
+# ==================== QUEUES ====================
+class InProcessQueue:
+    """A queue shared by the threads of a single process"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.pending = collections.deque()
+        self.condition = threading.Condition()
+
+    def put(self, job_id, payload):
+        with self.condition:
+            # Copied as the SQLite queue serializes it: the dicts submitted may be edited afterwards
+            self.jobs[job_id] = {'status': QUEUED, 'payload': copy.deepcopy(payload), 'result': None, 'error': None}
+            self.pending.append(job_id)
+            self.condition.notify()
+
+    def claim(self, max_jobs, timeout):
+        """Returns up to `max_jobs` (job_id, payload) pairs, waiting up to `timeout` seconds for a first one"""
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+            claimed = []
+            while self.pending and len(claimed) < max_jobs:
+                job_id = self.pending.popleft()
+                self.jobs[job_id]['status'] = RUNNING
+                claimed.append((job_id, self.jobs[job_id]['payload']))
+            return claimed
+
+    def finish(self, outcomes):
+        """Records the (job_id, result, error) outcomes of claimed jobs"""
+        with self.condition:
+            for job_id, result, error in outcomes:
+                self.jobs[job_id].update(status=FAILED if error else DONE, result=result, error=error)
+            self.condition.notify_all()
+
+    def get(self, job_id):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return None if job is None else {key: job[key] for key in ('status', 'result', 'error')}
+
+
+class SQLiteQueue:
+    """
+    A queue stored in SQLite, shared by the processes of a host.
+
+    A job claimed by a worker that died is claimed again once its lease expires.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease=600):
+        self.lease = lease
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                submitted_at REAL NOT NULL,
+                claimed_at REAL,
+                finished_at REAL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at);
+        """)
+
+    def put(self, job_id, payload):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO jobs (id, status, submitted_at, payload) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, time.time(), json.dumps(payload, default=str)))
+
+    def claim(self, max_jobs, timeout):
+        """Returns up to `max_jobs` (job_id, payload) pairs, polling up to `timeout` seconds for a first one"""
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.time()
+            with self.lock, self.connection:
+                rows = self.connection.execute(
+                    "UPDATE jobs SET status = ?, claimed_at = ? WHERE id IN ("
+                    " SELECT id FROM jobs WHERE status = ? OR (status = ? AND claimed_at < ?)"
+                    " ORDER BY submitted_at LIMIT ?) RETURNING id, payload",
+                    (RUNNING, now, QUEUED, RUNNING, now - self.lease, max_jobs)).fetchall()
+            if rows or time.monotonic() >= deadline:
+                return [(job_id, json.loads(payload)) for job_id, payload in rows]
+            time.sleep(0.2)
+
+    def finish(self, outcomes):
+        """Records the (job_id, result, error) outcomes of claimed jobs, in a single transaction"""
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+                [(FAILED if error else DONE, now, None if error else json.dumps(result), error, job_id)
+                 for job_id, result, error in outcomes])
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.connection.execute("SELECT status, result, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        status, result, error = row
+        return {'status': status, 'result': result and json.loads(result), 'error': error}
+
+
+# ==================== JOB API ====================
+class CalculationJobs:
+    """Submission of voyage calculations to a queue, and retrieval of their results"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def submit(self, file=None, rows=None, vessel_data=None, voyage_data=None, cp_data=None,
+               weather_definitions=None, exclusion_periods=None, quarantine=False):
+        """
+        Queues the calculation of a voyage, whose noon reports are either a CSV or Excel
+        `file` readable by the workers, or a list of `rows` dicts. Anomalous noon reports are left
+        out of the figures if `quarantine` is set. Returns the id of the job.
+        """
+        if (file is None) == (rows is None):
+            raise ValueError("The noon reports of a voyage are given either as a file or as rows")
+        job_id = uuid.uuid4().hex
+        self.queue.put(job_id, {
+            'file': file and os.path.abspath(file),
+            'rows': rows,
+            'vessel_data': vessel_data or {},
+            'voyage_data': voyage_data or {},
+            'cp_data': cp_data or {},
+            'weather_definitions': weather_definitions or {},
+            'exclusion_periods': exclusion_periods or [],
+            'quarantine': quarantine,
+        })
+        return job_id
+
+    def submit_upload(self, file_name, data, uploads_dir=DEFAULT_UPLOADS_DIR, **inputs):
+        """Queues the calculation of an uploaded file, which is first written where the workers can read it"""
+        os.makedirs(uploads_dir, exist_ok=True)
+        path = os.path.join(uploads_dir, f"{uuid.uuid4().hex}-{os.path.basename(file_name)}")
+        with open(path, 'wb') as upload_file:
+            upload_file.write(data)
+        return self.submit(file=path, **inputs)
+
+    def status(self, job_id):
+        job = self.queue.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job: {job_id}")
+        return job['status']
+
+    def result(self, job_id, timeout=None):
+        """Waits for a job to finish, and returns its result"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.queue.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job: {job_id}")
+            if job['status'] == DONE:
+                return job['result']
+            if job['status'] == FAILED:
+                raise JobFailed(job['error'])
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} is still {job['status']}")
+            time.sleep(0.1)
+
+
+# ==================== WORKERS ====================
+class Worker:
+    """
+    Runs the jobs of a queue, by batches of up to `batch_size` jobs.
+
+    The results are saved in `store` when one is given, the voyages being
+    then saved under their IMO & voyage numbers.
+    """
+
+    def __init__(self, queue, store=None, batch_size=20, cache_size=32):
+        self.queue = queue
+        self.store = store
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._parsed_files = collections.OrderedDict()
+
+    def read_file(self, path, weather_definitions=None):
+        """
+        Parses a noon report file, or returns it from the cache if it has not changed since.
+        Sensor logs are resampled with the weather definitions of the job, which are part of the cache key.
+        """
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, json.dumps(weather_definitions, sort_keys=True, default=str))
+        if key in self._parsed_files:
+            self._parsed_files.move_to_end(key)
+        else:
+            self._parsed_files[key] = read_voyage_file(path, weather_definitions=weather_definitions)
+            if len(self._parsed_files) > self.cache_size:
+                self._parsed_files.popitem(last=False)
+        return self._parsed_files[key]
+
+    def process(self, payload):
+        weather_definitions = payload['weather_definitions']
+        df = (self.read_file(payload['file'], weather_definitions) if payload['file']
+              else as_noon_reports(pd.DataFrame(payload['rows']), weather_definitions))
+        results = calculate_voyage(df, payload['cp_data'], weather_definitions, payload.get('quarantine', False))
+        voyage_id = None
+        if self.store is not None and payload['vessel_data'].get('imo') and payload['voyage_data'].get('voyage_no'):
+            voyage_id = self.store.save_voyage(payload['vessel_data'], payload['voyage_data'], payload['cp_data'],
+                                               payload['weather_definitions'], payload['exclusion_periods'], results)
+        return {'voyage_id': voyage_id, 'metrics': {key: as_float(results[key]) for _, key, _ in SUMMARY_METRICS}}
+
+    def run_once(self, timeout=1.0):
+        """Runs a batch of jobs, if any is queued within `timeout` seconds. Returns the number of jobs run."""
+        batch = self.queue.claim(self.batch_size, timeout)
+        outcomes = []
+        for job_id, payload in batch:
+            try:
+                outcomes.append((job_id, self.process(payload), None))
+            except Exception as e:
+                outcomes.append((job_id, None, f"{type(e).__name__}: {e}"))
+        if outcomes:
+            self.queue.finish(outcomes)
+        return len(outcomes)
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            self.run_once()
+
+
+def start_worker_threads(queue, count=2, store=None, batch_size=20):
+    """Starts workers in threads of the current process, they stop once the returned event is set"""
+    stop_event = threading.Event()
+    for i in range(count):
+        worker = Worker(queue, store, batch_size)
+        threading.Thread(target=worker.run, args=(stop_event,), name=f"voyage-worker-{i}", daemon=True).start()
+    return stop_event
+
+
+def run_worker_process(queue_path, store_path, batch_size):
+    worker = Worker(SQLiteQueue(queue_path), VoyageStore(store_path), batch_size)
+    worker.run(threading.Event())
+
+
+# ==================== CLI ====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queue', default=DEFAULT_QUEUE_PATH, help=f"SQLite queue, {DEFAULT_QUEUE_PATH} by default")
+    commands = parser.add_subparsers(dest='command', required=True)
+    worker_parser = commands.add_parser('worker', help="run workers until interrupted")
+    worker_parser.add_argument('--processes', type=int, default=os.cpu_count(), help="number of worker processes")
+    worker_parser.add_argument('--batch-size', type=int, default=20, help="jobs claimed at once by a worker")
+    worker_parser.add_argument('--store', default=DEFAULT_STORE_PATH, help="voyage store where results are saved")
+    submit_parser = commands.add_parser('submit', help="queue the voyages of a JSON manifest")
+    submit_parser.add_argument('manifest')
+    status_parser = commands.add_parser('status', help="print the status and result of jobs")
+    status_parser.add_argument('job_ids', nargs='+')
+    args = parser.parse_args(argv)
+
+    queue = SQLiteQueue(args.queue)
+    if args.command == 'worker':
+        processes = [multiprocessing.Process(target=run_worker_process, args=(args.queue, args.store, args.batch_size))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+    elif args.command == 'submit':
+        jobs = CalculationJobs(queue)
+        with open(args.manifest) as manifest_file:
+            voyages = json.load(manifest_file)
+        base_dir = os.path.dirname(os.path.abspath(args.manifest))
+        for voyage in voyages:
+            print(jobs.submit(file=os.path.join(base_dir, voyage['file']),
+                              **{key: voyage.get(key) for key in ('vessel_data', 'voyage_data', 'cp_data',
+                                                                  'weather_definitions', 'exclusion_periods')}))
+    else:
+        for job_id in args.job_ids:
+            print(job_id, json.dumps(queue.get(job_id)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
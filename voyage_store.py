@@ -0,0 +1,544 @@
+"""
+Local SQLite store of vessels, voyages, charterparty terms and computed voyage results.
+
+The input forms and the results of the Calculations page are saved here,
+so that a voyage entered in a past session is reloaded by an indexed lookup
+on (IMO, voyage number) instead of being re-entered and recomputed from its raw file.
+
+The fleet dashboard reads pre-aggregated tables (per vessel, per charterer and
+per vessel & month of COSP), which are updated incrementally every time the
+results of a voyage are saved, rather than aggregating every voyage on each rerun.
+
+The rolling good weather performance of every vessel (cf. monitoring.py) is
+kept the same way: the daily sums of the saved noon reports, and the windows
+of the days that the saved voyage can change.
+
+The database path defaults to cp_performance.db, and can be set with the
+CP_PERFORMANCE_DB environment variable.
+"""
+import datetime
+import io
+import json
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from monitoring import (DAILY_COLUMNS, MONITORING_WINDOWS, affected_days, daily_good_weather, rolling_windows,
+                        window_performance)
+from voyage_calculations import (SUMMARY_METRICS, calculate_legs, consumption_columns, consumption_table,
+                                 fuel_grade_table, performance_metrics, summary_table, weather_sums)
+
+DEFAULT_PATH = os.environ.get('CP_PERFORMANCE_DB', 'cp_performance.db')
+
+RESULT_KEYS = [key for _, key, _ in SUMMARY_METRICS]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS vessels (
+    imo TEXT PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    dwt REAL,
+    grt REAL,
+    built INTEGER
+);
+CREATE TABLE IF NOT EXISTS voyages (
+    id INTEGER PRIMARY KEY,
+    imo TEXT NOT NULL REFERENCES vessels (imo),
+    voyage_no TEXT NOT NULL,
+    from_port TEXT,
+    to_port TEXT,
+    cosp_date TEXT,
+    cosp_time TEXT,
+    eosp_date TEXT,
+    eosp_time TEXT,
+    weather_definitions TEXT,
+    exclusion_periods TEXT,
+    UNIQUE (imo, voyage_no)
+);
+CREATE INDEX IF NOT EXISTS voyages_voyage_no ON voyages (voyage_no);
+CREATE INDEX IF NOT EXISTS voyages_cosp_date ON voyages (cosp_date);
+CREATE TABLE IF NOT EXISTS charterparties (
+    voyage_id INTEGER PRIMARY KEY REFERENCES voyages (id) ON DELETE CASCADE,
+    charterer TEXT,
+    cp_date TEXT,
+    warranted_speed REAL,
+    warranted_consumption REAL,
+    fuel_tolerance_percent REAL,
+    speed_tolerance_knots REAL,
+    fuel_grade_warranties TEXT
+);
+CREATE INDEX IF NOT EXISTS charterparties_charterer ON charterparties (charterer);
+CREATE TABLE IF NOT EXISTS calculation_results (
+    voyage_id INTEGER PRIMARY KEY REFERENCES voyages (id) ON DELETE CASCADE,
+    computed_at TEXT NOT NULL,
+    {', '.join(f'{key} REAL' for key in RESULT_KEYS)},
+    noon_reports TEXT
+);
+"""
+
+SCHEMA += """
+CREATE TABLE IF NOT EXISTS speed_consumption_models (
+    imo TEXT NOT NULL,
+    condition TEXT NOT NULL,
+    coefficient REAL NOT NULL,
+    exponent REAL NOT NULL,
+    reports INTEGER NOT NULL,
+    r_squared REAL,
+    fitted_at TEXT NOT NULL,
+    PRIMARY KEY (imo, condition)
+);
+
+-- Last refit of each vessel, with or without enough reports for a curve
+CREATE TABLE IF NOT EXISTS speed_consumption_fits (
+    imo TEXT PRIMARY KEY,
+    fitted_at TEXT NOT NULL
+);
+"""
+
+SCHEMA += """
+CREATE TABLE IF NOT EXISTS bunker_prices (
+    port TEXT NOT NULL,
+    fuel_grade TEXT NOT NULL,
+    date TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (port, fuel_grade, date)
+);
+"""
+
+SCHEMA += f"""
+CREATE TABLE IF NOT EXISTS voyage_daily_performance (
+    voyage_id INTEGER NOT NULL REFERENCES voyages (id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    {', '.join(f'{column} REAL NOT NULL' for column in DAILY_COLUMNS)},
+    PRIMARY KEY (voyage_id, day)
+);
+CREATE INDEX IF NOT EXISTS voyage_daily_performance_day ON voyage_daily_performance (day);
+CREATE TABLE IF NOT EXISTS vessel_rolling_performance (
+    imo TEXT NOT NULL,
+    window INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    {', '.join(f'{column} REAL NOT NULL' for column in DAILY_COLUMNS)},
+    PRIMARY KEY (imo, window, day)
+);
+"""
+
+# Tables of the fleet dashboard: (table, key columns, their expressions, results summed)
+FLEET_AGGREGATES = [
+    ('fleet_vessel_totals', ['imo'], ['voyages.imo'],
+     ['total_distance', 'total_time', 'total_fuel', 'good_distance', 'good_time',
+      'fuel_overconsumption', 'fuel_saving', 'time_lost', 'time_gained']),
+    ('fleet_charterer_totals', ['charterer'], ["COALESCE(charterparties.charterer, '')"],
+     ['fuel_overconsumption', 'fuel_saving', 'time_lost', 'time_gained']),
+    ('fleet_monthly_speed', ['imo', 'month'], ['voyages.imo', "COALESCE(substr(voyages.cosp_date, 1, 7), '')"],
+     ['good_distance', 'good_time', 'total_distance', 'total_time']),
+    ('fleet_yearly_emissions', ['imo', 'year'], ['voyages.imo', "COALESCE(substr(voyages.cosp_date, 1, 4), '')"],
+     ['co2_emissions', 'total_distance']),
+]
+# Version of the schema, for databases created before the fleet aggregates (1), the fuel grade warranties (2)
+# the emissions (3) or the rolling performance (4):
+SCHEMA_VERSION = 4
+
+SCHEMA += "".join(
+    f"CREATE TABLE IF NOT EXISTS {table} ("
+    f"{', '.join(f'{key} TEXT NOT NULL' for key in keys)}, voyages INTEGER NOT NULL,"
+    f" {', '.join(f'{column} REAL NOT NULL' for column in columns)}, PRIMARY KEY ({', '.join(keys)}));\n"
+    for table, keys, _, columns in FLEET_AGGREGATES
+)
+
+RESULTS_JOIN = ("calculation_results JOIN voyages ON voyages.id = calculation_results.voyage_id"
+                " LEFT JOIN charterparties ON charterparties.voyage_id = voyages.id")
+
+
+def add_to_aggregate_sql(table, keys, key_expressions, columns):
+    """Adds the results of a voyage to an aggregate table, or removes them when :sign is -1"""
+    return (
+        f"INSERT INTO {table} ({', '.join(keys)}, voyages, {', '.join(columns)})"
+        f" SELECT {', '.join(key_expressions)}, :sign, {', '.join(f':sign * COALESCE({column}, 0)' for column in columns)}"
+        f" FROM {RESULTS_JOIN} WHERE calculation_results.voyage_id = :voyage_id"
+        f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET voyages = voyages + excluded.voyages,"
+        f" {', '.join(f'{column} = {column} + excluded.{column}' for column in columns)}"
+    )
+
+
+def rebuild_aggregate_sql(table, keys, key_expressions, columns):
+    return (
+        f"INSERT INTO {table} ({', '.join(keys)}, voyages, {', '.join(columns)})"
+        f" SELECT {', '.join(key_expressions)}, COUNT(*), {', '.join(f'SUM(COALESCE({column}, 0))' for column in columns)}"
+        f" FROM {RESULTS_JOIN} GROUP BY {', '.join(key_expressions)}"
+    )
+
+
+CP_KEYS = ['charterer', 'cp_date', 'warranted_speed', 'warranted_consumption',
+           'fuel_tolerance_percent', 'speed_tolerance_knots']
+
+
+def iso(value):
+    """Dates & times of the input forms are stored as ISO 8601 strings"""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def as_float(value):
+    return None if value is None else float(value)
+
+
+class VoyageStore:
+    """
+    A SQLite database of voyages, keyed by (IMO, voyage number).
+
+    The dicts saved & loaded are those of the session state: vessel_data,
+    voyage_data, cp_data, weather_definitions, exclusion_periods and calculation_results.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        # Streamlit runs each session in its own thread, the connection is shared between them,
+        # and every transaction & query holds the lock:
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if path != ':memory:':
+            self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            self._migrate(version)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _columns(self, table):
+        return {row['name'] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+
+    def _migrate(self, version):
+        """Adds the columns of the later schema versions, and computes what the saved voyages lack"""
+        if 'fuel_grade_warranties' not in self._columns('charterparties'):
+            self.connection.execute("ALTER TABLE charterparties ADD COLUMN fuel_grade_warranties TEXT")
+        # Results added to SUMMARY_METRICS since are computed again from the saved noon reports
+        new_keys = [key for key in RESULT_KEYS if key not in self._columns('calculation_results')]
+        if new_keys:
+            with self.lock, self.connection:
+                for key in new_keys:
+                    self.connection.execute(f"ALTER TABLE calculation_results ADD COLUMN {key} REAL")
+                for row in self.connection.execute(
+                        f"SELECT calculation_results.voyage_id, noon_reports, {', '.join(CP_KEYS)}, fuel_grade_warranties"
+                        " FROM calculation_results LEFT JOIN charterparties USING (voyage_id)").fetchall():
+                    cp_data = {key: row[key] for key in CP_KEYS if row[key] is not None}
+                    cp_data['fuel_grade_warranties'] = json.loads(row['fuel_grade_warranties'] or '{}')
+                    df = pd.read_json(io.StringIO(row['noon_reports']), orient='split')
+                    metrics = performance_metrics(weather_sums(df, []), cp_data).iloc[0]
+                    self.connection.execute(
+                        f"UPDATE calculation_results SET {', '.join(f'{key} = ?' for key in new_keys)} WHERE voyage_id = ?",
+                        [as_float(metrics[key]) for key in new_keys] + [row['voyage_id']])
+        if version < 3:
+            self.rebuild_aggregates()
+        if version < 4:
+            self.rebuild_monitoring()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def save_voyage(self, vessel_data, voyage_data, cp_data, weather_definitions, exclusion_periods, results=None):
+        """Inserts or updates a voyage, and its results when given. Returns the id of the voyage."""
+        imo, voyage_no = vessel_data.get('imo'), voyage_data.get('voyage_no')
+        if not imo or not voyage_no:
+            raise ValueError("A voyage is saved under the IMO number of its vessel and its voyage number")
+        with self.lock, self.connection:
+            # The aggregates are keyed by vessel, charterer & COSP month, which may all change here:
+            previous = self.connection.execute(
+                "SELECT id FROM voyages WHERE imo = ? AND voyage_no = ?", (imo, voyage_no)).fetchone()
+            if previous is not None:
+                self._add_to_aggregates(previous[0], -1)
+            self.connection.execute(
+                "INSERT INTO vessels (imo, name, type, dwt, grt, built) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (imo) DO UPDATE SET name = excluded.name, type = excluded.type,"
+                " dwt = excluded.dwt, grt = excluded.grt, built = excluded.built",
+                (imo, vessel_data.get('name'), vessel_data.get('type'), vessel_data.get('dwt'),
+                 vessel_data.get('grt'), vessel_data.get('built')))
+            voyage_id = self.connection.execute(
+                "INSERT INTO voyages (imo, voyage_no, from_port, to_port, cosp_date, cosp_time, eosp_date, eosp_time,"
+                " weather_definitions, exclusion_periods) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (imo, voyage_no) DO UPDATE SET from_port = excluded.from_port, to_port = excluded.to_port,"
+                " cosp_date = excluded.cosp_date, cosp_time = excluded.cosp_time, eosp_date = excluded.eosp_date,"
+                " eosp_time = excluded.eosp_time, weather_definitions = excluded.weather_definitions,"
+                " exclusion_periods = excluded.exclusion_periods"
+                " RETURNING id",
+                (imo, voyage_no, voyage_data.get('from_port'), voyage_data.get('to_port'),
+                 iso(voyage_data.get('cosp_date')), iso(voyage_data.get('cosp_time')),
+                 iso(voyage_data.get('eosp_date')), iso(voyage_data.get('eosp_time')),
+                 json.dumps(weather_definitions), json.dumps(exclusion_periods))).fetchone()[0]
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO charterparties (voyage_id, {', '.join(CP_KEYS)}, fuel_grade_warranties)"
+                f" VALUES (?, {', '.join('?' for _ in CP_KEYS)}, ?)",
+                [voyage_id] + [iso(cp_data.get(key)) for key in CP_KEYS]
+                + [json.dumps(cp_data.get('fuel_grade_warranties') or {})])
+            if results is not None:
+                self._save_results(voyage_id, results)
+                self._save_daily_performance(imo, voyage_id, results['df'])
+            self._add_to_aggregates(voyage_id, 1)
+        return voyage_id
+
+    def _add_to_aggregates(self, voyage_id, sign):
+        for table, keys, key_expressions, columns in FLEET_AGGREGATES:
+            self.connection.execute(add_to_aggregate_sql(table, keys, key_expressions, columns),
+                                    {'sign': sign, 'voyage_id': voyage_id})
+            if sign < 0:
+                self.connection.execute(f"DELETE FROM {table} WHERE voyages <= 0")
+
+    def rebuild_aggregates(self):
+        """Recomputes the fleet aggregates from all the saved results"""
+        with self.lock, self.connection:
+            for table, keys, key_expressions, columns in FLEET_AGGREGATES:
+                self.connection.execute(f"DELETE FROM {table}")
+                self.connection.execute(rebuild_aggregate_sql(table, keys, key_expressions, columns))
+
+    def _save_daily_performance(self, imo, voyage_id, df):
+        """Replaces the daily sums of a voyage, and recomputes the windows of the days they change"""
+        previous_days = self.connection.execute(
+            "SELECT MIN(day), MAX(day) FROM voyage_daily_performance WHERE voyage_id = ?", (voyage_id,)).fetchone()
+        self.connection.execute("DELETE FROM voyage_daily_performance WHERE voyage_id = ?", (voyage_id,))
+        daily = daily_good_weather(df)
+        self.connection.executemany(
+            f"INSERT INTO voyage_daily_performance (voyage_id, day, {', '.join(DAILY_COLUMNS)})"
+            f" VALUES (?, ?, {', '.join('?' for _ in DAILY_COLUMNS)})",
+            [(voyage_id, day.date().isoformat(), *map(float, row)) for day, row in zip(daily.index, daily.to_numpy())])
+        days = [pd.Timestamp(day) for day in previous_days if day is not None] + list(daily.index[[0, -1]] if len(daily) else [])
+        if days:
+            self._update_windows(imo, min(days), max(days))
+
+    def _update_windows(self, imo, first_day, last_day):
+        """Recomputes the rolling windows of a vessel that include a day from `first_day` to `last_day`"""
+        first_day, last_day = affected_days(first_day, last_day)
+        daily = pd.read_sql_query(
+            f"SELECT day, {', '.join(f'SUM({column}) AS {column}' for column in DAILY_COLUMNS)}"
+            " FROM voyage_daily_performance JOIN voyages ON voyages.id = voyage_daily_performance.voyage_id"
+            " WHERE imo = ? AND day BETWEEN ? AND ? GROUP BY day", self.connection,
+            params=(imo, (first_day - pd.Timedelta(days=max(MONITORING_WINDOWS) - 1)).date().isoformat(),
+                    last_day.date().isoformat()), parse_dates=['day'], index_col='day')
+        self.connection.execute("DELETE FROM vessel_rolling_performance WHERE imo = ? AND day BETWEEN ? AND ?",
+                                (imo, first_day.date().isoformat(), last_day.date().isoformat()))
+        windows = rolling_windows(daily, first_day, last_day)
+        self.connection.executemany(
+            f"INSERT INTO vessel_rolling_performance (imo, window, day, {', '.join(DAILY_COLUMNS)})"
+            f" VALUES (?, ?, ?, {', '.join('?' for _ in DAILY_COLUMNS)})",
+            [(imo, int(row.window), row.day.date().isoformat(), *(float(getattr(row, column)) for column in DAILY_COLUMNS))
+             for row in windows.itertuples()])
+
+    def rebuild_monitoring(self):
+        """Recomputes the daily sums & rolling windows of all the vessels from the saved noon reports"""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM voyage_daily_performance")
+            self.connection.execute("DELETE FROM vessel_rolling_performance")
+            for row in self.connection.execute(
+                    "SELECT voyage_id, imo, noon_reports FROM calculation_results"
+                    " JOIN voyages ON voyages.id = calculation_results.voyage_id").fetchall():
+                df = pd.read_json(io.StringIO(row['noon_reports']), orient='split')
+                self._save_daily_performance(row['imo'], row['voyage_id'], df)
+
+    def rolling_performance(self, imo, window):
+        """The good weather speed & FO/day of a vessel over the `window` days up to each day of its reports"""
+        with self.lock:
+            windows = pd.read_sql_query(
+                f"SELECT day, {', '.join(DAILY_COLUMNS)} FROM vessel_rolling_performance"
+                " WHERE imo = ? AND window = ? ORDER BY day", self.connection, params=(imo, window), parse_dates=['day'])
+        return window_performance(windows)
+
+    def _save_results(self, voyage_id, results):
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO calculation_results (voyage_id, computed_at, {', '.join(RESULT_KEYS)}, noon_reports)"
+            f" VALUES (?, ?, {', '.join('?' for _ in RESULT_KEYS)}, ?)",
+            [voyage_id, datetime.datetime.now().isoformat(timespec='seconds')]
+            + [as_float(results[key]) for key in RESULT_KEYS]
+            + [results['df'].to_json(orient='split', date_format='iso')])
+
+    def load_voyage(self, imo, voyage_no):
+        """Returns the session state dicts of a saved voyage, or None if it is not in the store"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM voyages JOIN vessels USING (imo) LEFT JOIN charterparties ON charterparties.voyage_id = voyages.id"
+                " WHERE imo = ? AND voyage_no = ?", (imo, voyage_no)).fetchone()
+        if row is None:
+            return None
+        voyage = {
+            'vessel_data': {key: row[key] for key in ('imo', 'name', 'type', 'dwt', 'grt', 'built') if row[key] is not None},
+            'voyage_data': {
+                'voyage_no': row['voyage_no'],
+                'from_port': row['from_port'],
+                'to_port': row['to_port'],
+            },
+            'cp_data': {key: row[key] for key in CP_KEYS if row[key] is not None},
+            'weather_definitions': json.loads(row['weather_definitions']),
+            'exclusion_periods': json.loads(row['exclusion_periods']),
+        }
+        for key in ('cosp_date', 'eosp_date'):
+            if row[key]:
+                voyage['voyage_data'][key] = datetime.date.fromisoformat(row[key])
+        for key in ('cosp_time', 'eosp_time'):
+            if row[key]:
+                voyage['voyage_data'][key] = datetime.time.fromisoformat(row[key])
+        if 'cp_date' in voyage['cp_data']:
+            voyage['cp_data']['cp_date'] = datetime.date.fromisoformat(voyage['cp_data']['cp_date'])
+        if row['fuel_grade_warranties']:
+            voyage['cp_data']['fuel_grade_warranties'] = json.loads(row['fuel_grade_warranties'])
+        results = self.load_results(row['id'])
+        if results is not None:
+            if 'leg' in results['df'].columns:
+                results['legs'] = calculate_legs(results['df'], voyage['cp_data'])
+            # The consumption per consumer & fuel grade is not kept in the results table
+            if consumption_columns(results['df']):
+                metrics = performance_metrics(weather_sums(results['df'], []), voyage['cp_data']).iloc[0]
+                results.update((key, value) for key, value in metrics.items() if key not in results)
+            results['consumption'] = consumption_table(results)
+            results['fuel_grades'] = fuel_grade_table(results, voyage['cp_data'])
+            voyage['calculation_results'] = results
+        return voyage
+
+    def load_results(self, voyage_id):
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM calculation_results WHERE voyage_id = ?", (voyage_id,)).fetchone()
+        if row is None:
+            return None
+        results = {key: row[key] for key in RESULT_KEYS}
+        results['df'] = pd.read_json(io.StringIO(row['noon_reports']), orient='split')
+        results['summary'] = summary_table(results)
+        return results
+
+    def saved_noon_reports(self, imos=None):
+        """Yields the IMO number & classified noon reports of every voyage with saved results, or of some vessels"""
+        where = f" WHERE voyages.imo IN ({', '.join('?' for _ in imos)})" if imos is not None else ""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT imo, noon_reports FROM calculation_results JOIN voyages ON voyages.id = calculation_results.voyage_id"
+                + where, list(imos or [])).fetchall()
+        for imo, noon_reports in rows:
+            yield imo, pd.read_json(io.StringIO(noon_reports), orient='split')
+
+    def vessels_to_refit(self):
+        """The vessels with results computed since their speed-consumption curves were last fitted"""
+        with self.lock:
+            return [row[0] for row in self.connection.execute(
+                "SELECT voyages.imo FROM calculation_results JOIN voyages ON voyages.id = calculation_results.voyage_id"
+                " LEFT JOIN speed_consumption_fits ON speed_consumption_fits.imo = voyages.imo"
+                " GROUP BY voyages.imo HAVING speed_consumption_fits.fitted_at IS NULL"
+                " OR MAX(computed_at) >= speed_consumption_fits.fitted_at")]
+
+    def save_speed_models(self, models, imos=None):
+        """
+        Replaces the speed-consumption curves of the vessels refitted, or of the whole fleet if `imos`
+        is None, by those fitted (cf. speed_consumption.fit_curves())
+        """
+        fitted_at = datetime.datetime.now().isoformat(timespec='seconds')
+        with self.lock, self.connection:
+            if imos is None:
+                imos = [row[0] for row in self.connection.execute(
+                    "SELECT DISTINCT imo FROM voyages JOIN calculation_results ON calculation_results.voyage_id = voyages.id")]
+                self.connection.execute("DELETE FROM speed_consumption_models")
+            else:
+                self.connection.executemany("DELETE FROM speed_consumption_models WHERE imo = ?", [(imo,) for imo in imos])
+            if models is not None:
+                self.connection.executemany(
+                    "INSERT INTO speed_consumption_models (imo, condition, coefficient, exponent, reports, r_squared,"
+                    " fitted_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(row.imo, row.condition, row.coefficient, row.exponent, int(row.reports),
+                      None if pd.isna(row.r_squared) else row.r_squared, fitted_at)
+                     for row in models.itertuples()])
+            self.connection.executemany("INSERT OR REPLACE INTO speed_consumption_fits (imo, fitted_at) VALUES (?, ?)",
+                                        [(str(imo), fitted_at) for imo in imos])
+
+    def speed_models(self, imo):
+        """The speed-consumption curves of a vessel, one per loading condition"""
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT condition, coefficient, exponent, reports, r_squared, fitted_at"
+                " FROM speed_consumption_models WHERE imo = ? ORDER BY condition", self.connection, params=(imo,))
+
+    def yearly_emissions(self):
+        """CO2 emitted & distance sailed per vessel and year of COSP, with the type & capacity of the vessels"""
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT imo, vessels.name AS vessel, vessels.type, vessels.dwt, vessels.grt, year, voyages,"
+                " co2_emissions, total_distance FROM fleet_yearly_emissions JOIN vessels USING (imo) ORDER BY imo, year",
+                self.connection)
+
+    def voyage_emissions(self):
+        """CO2 emitted by each computed voyage, with its ports & COSP date"""
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT voyages.imo, vessels.name AS vessel, voyage_no, from_port, to_port, cosp_date, co2_emissions"
+                " FROM calculation_results JOIN voyages ON voyages.id = calculation_results.voyage_id JOIN vessels USING (imo)"
+                " ORDER BY cosp_date, voyage_no", self.connection)
+
+    def save_bunker_prices(self, prices):
+        """Inserts or updates bunker prices (cf. bunker_prices.normalize_prices())"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO bunker_prices (port, fuel_grade, date, price) VALUES (?, ?, ?, ?)",
+                [(row.port, row.fuel_grade, row.date.date().isoformat(), float(row.price))
+                 for row in prices.itertuples()])
+
+    def bunker_prices(self):
+        with self.lock:
+            return pd.read_sql_query("SELECT port, fuel_grade, date, price FROM bunker_prices", self.connection)
+
+    def voyage_claims(self):
+        """The fuel deviations of the computed voyages, with the port & date at which their fuel is priced"""
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT voyages.imo, vessels.name AS vessel, voyage_no, charterer, from_port AS port, cosp_date AS date,"
+                " fuel_overconsumption, fuel_saving FROM calculation_results"
+                " JOIN voyages ON voyages.id = calculation_results.voyage_id JOIN vessels USING (imo)"
+                " LEFT JOIN charterparties ON charterparties.voyage_id = voyages.id"
+                " ORDER BY cosp_date, voyage_no", self.connection)
+
+    def list_voyages(self, imo=None, cosp_from=None, cosp_to=None):
+        """The saved voyages, optionally of a single vessel and within a range of COSP dates"""
+        conditions, params = [], []
+        if imo:
+            conditions.append("voyages.imo = ?")
+            params.append(imo)
+        if cosp_from:
+            conditions.append("cosp_date >= ?")
+            params.append(iso(cosp_from))
+        if cosp_to:
+            conditions.append("cosp_date <= ?")
+            params.append(iso(cosp_to))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT voyages.id, voyages.imo, vessels.name AS vessel, voyage_no, from_port, to_port, cosp_date,"
+                " charterer, calculation_results.computed_at FROM voyages JOIN vessels USING (imo)"
+                " LEFT JOIN charterparties ON charterparties.voyage_id = voyages.id"
+                f" LEFT JOIN calculation_results ON calculation_results.voyage_id = voyages.id{where}"
+                " ORDER BY cosp_date DESC, voyage_no", self.connection, params=params)
+
+    def vessel_aggregates(self):
+        """Computed voyages, distance, fuel and CP deviations per vessel"""
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT imo, vessels.name AS vessel, voyages, total_distance, total_fuel,"
+                " fuel_overconsumption, fuel_saving, time_lost, time_gained,"
+                " good_distance / NULLIF(good_time, 0) AS good_speed"
+                " FROM fleet_vessel_totals JOIN vessels USING (imo) ORDER BY fuel_overconsumption DESC",
+                self.connection)
+
+    def charterer_aggregates(self):
+        """Computed voyages and CP deviations per charterer"""
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT charterer, voyages, time_lost, time_gained, fuel_overconsumption, fuel_saving"
+                " FROM fleet_charterer_totals ORDER BY time_lost DESC",
+                self.connection)
+
+    def good_speed_trend(self, imos=None):
+        """Good weather speed per month of COSP, of the whole fleet or per vessel for the IMO numbers given"""
+        if not imos:
+            query, params = ("SELECT month, SUM(good_distance) / NULLIF(SUM(good_time), 0) AS good_speed"
+                             " FROM fleet_monthly_speed WHERE month != '' GROUP BY month ORDER BY month"), []
+        else:
+            query, params = ("SELECT month, imo, vessels.name AS vessel, good_distance / NULLIF(good_time, 0) AS good_speed"
+                             " FROM fleet_monthly_speed JOIN vessels USING (imo)"
+                             f" WHERE month != '' AND imo IN ({', '.join('?' for _ in imos)}) ORDER BY month"), list(imos)
+        with self.lock:
+            return pd.read_sql_query(query, self.connection, params=params)